@@ -0,0 +1,221 @@
+"""
+Command line entry point for maintenance tasks.
+
+Usage (from the backend directory):
+    python -m app.cli import-books catalog.csv --checkpoint catalog.checkpoint
+    python -m app.cli precompute-recommendations --workers 8
+    python -m app.cli build-catalog-snapshot --path /var/lib/shelfsense/catalog.snapshot
+    python -m app.cli run-jobs --concurrency 4
+    DATABASE_URL=sqlite:///bench.db python -m app.cli init-db
+    DATABASE_URL=sqlite:///bench.db python -m app.cli seed --users 10000 --books 100000
+    python -m app.cli calibrate-bcrypt --target-ms 250
+    python -m app.cli merge-duplicate-books --dry-run
+    python -m app.cli rebuild-user-stats
+"""
+import argparse
+import json
+import logging
+import sys
+
+
+def _import_books(args: argparse.Namespace) -> None:
+    from . import models
+    from .services import book_import
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "jsonl")
+    with open(args.path, encoding="utf-8", newline="") as stream:
+        stats = book_import.import_books(
+            models.engine, stream, fmt, batch_size=args.batch_size, checkpoint_path=args.checkpoint
+        )
+    json.dump(stats.to_dict(), sys.stdout, indent=2)
+    print()
+
+
+def _precompute_recommendations(args: argparse.Namespace) -> None:
+    from . import models
+    from .services import recommendation_precompute
+
+    with models.SessionLocal() as db:
+        stats = recommendation_precompute.precompute_recommendations(
+            db,
+            workers=args.workers or recommendation_precompute.DEFAULT_WORKERS,
+            chunk_size=args.chunk_size, k=args.k, full=args.full
+        )
+    json.dump(stats.to_dict(), sys.stdout, indent=2, default=str)
+    print()
+
+
+def _build_catalog_snapshot(args: argparse.Namespace) -> None:
+    from . import models
+    from .services import catalog_snapshot
+
+    path = args.path or catalog_snapshot.CATALOG_SNAPSHOT_PATH
+    if not path:
+        sys.exit("Pass --path or set CATALOG_SNAPSHOT_PATH")
+    with models.SessionLocal() as db:
+        summary = catalog_snapshot.build_snapshot(db, path)
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+
+
+def _run_jobs(args: argparse.Namespace) -> None:
+    import asyncio
+
+    from .services import job_queue
+
+    async def run() -> None:
+        runner = job_queue.JobRunner(max_concurrency=args.concurrency)
+        runner.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+def _init_db(args: argparse.Namespace) -> None:
+    from . import models
+
+    models.create_schema()
+    print(f"Created the schema on {models.engine.url.render_as_string(hide_password=True)}")
+
+
+def _seed(args: argparse.Namespace) -> None:
+    from . import models
+    from .seed import SeedSpec, seed_database
+
+    spec = SeedSpec(
+        users=args.users, books=args.books, library_per_user=args.library_per_user,
+        recommendations_per_user=args.recommendations_per_user, tag=args.tag, seed=args.seed,
+    )
+    with models.SessionLocal() as db:
+        summary = seed_database(db, spec)
+    json.dump(summary.to_dict(), sys.stdout, indent=2)
+    print()
+
+
+def _rebuild_user_stats(args: argparse.Namespace) -> None:
+    from uuid import UUID
+
+    from . import models
+    from .services import user_stats
+
+    user_ids = [UUID(user_id) for user_id in args.user_id] if args.user_id else None
+    with models.SessionLocal() as db:
+        rebuilt = user_stats.rebuild_user_stats(db, user_ids, chunk_size=args.chunk_size)
+    json.dump({"users": rebuilt}, sys.stdout, indent=2)
+    print()
+
+
+def _calibrate_bcrypt(args: argparse.Namespace) -> None:
+    from .services import password_cost
+
+    target_ms = args.target_ms or password_cost.BCRYPT_TARGET_MS
+    rounds = password_cost.calibrate_rounds(
+        target_ms / 1000,
+        min_rounds=args.min_rounds or password_cost.BCRYPT_MIN_ROUNDS,
+        max_rounds=args.max_rounds or password_cost.BCRYPT_MAX_ROUNDS,
+    )
+    json.dump({
+        "rounds": rounds,
+        "target_ms": target_ms,
+        "measured_ms": round(password_cost.measure_hash_seconds(rounds) * 1000, 1),
+    }, sys.stdout, indent=2)
+    print()
+    print(f"Set BCRYPT_ROUNDS={rounds} in the API's environment", file=sys.stderr)
+
+
+def _merge_duplicate_books(args: argparse.Namespace) -> None:
+    from . import models
+    from .services import book_duplicates
+
+    threshold = args.threshold or book_duplicates.BOOK_DUPLICATE_SIMILARITY
+    with models.SessionLocal() as db:
+        stats = book_duplicates.merge_duplicate_books(db, threshold=threshold, dry_run=args.dry_run)
+    json.dump(stats.to_dict(), sys.stdout, indent=2)
+    print()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="ShelfSense maintenance commands")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subcommands.add_parser("import-books", help="Bulk-import a CSV/JSONL book catalog")
+    import_parser.add_argument("path", help="Path to the catalog file")
+    import_parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension")
+    import_parser.add_argument("--batch-size", type=int, default=10_000)
+    import_parser.add_argument("--checkpoint", help="Checkpoint file used to resume an interrupted import")
+    import_parser.set_defaults(handler=_import_books)
+
+    precompute_parser = subcommands.add_parser(
+        "precompute-recommendations", help="Score users whose preferences, library or ratings changed"
+    )
+    precompute_parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    precompute_parser.add_argument("--chunk-size", type=int, default=1_000, help="Users per worker task")
+    precompute_parser.add_argument("--k", type=int, default=20, help="Recommendations per user")
+    precompute_parser.add_argument("--full", action="store_true", help="Ignore the high-water mark, rescore everyone")
+    precompute_parser.set_defaults(handler=_precompute_recommendations)
+
+    snapshot_parser = subcommands.add_parser(
+        "build-catalog-snapshot", help="Write the memory-mapped catalog snapshot the API workers share"
+    )
+    snapshot_parser.add_argument("--path", help="Defaults to CATALOG_SNAPSHOT_PATH")
+    snapshot_parser.set_defaults(handler=_build_catalog_snapshot)
+
+    jobs_parser = subcommands.add_parser(
+        "run-jobs", help="Run queued background jobs (use with JOB_RUNNER_IN_PROCESS=false on the API)"
+    )
+    jobs_parser.add_argument("--concurrency", type=int, default=2, help="Jobs run at the same time")
+    jobs_parser.set_defaults(handler=_run_jobs)
+
+    init_parser = subcommands.add_parser(
+        "init-db", help="Create all tables and indexes on an empty database (SQLite or a throwaway Postgres)"
+    )
+    init_parser.set_defaults(handler=_init_db)
+
+    seed_parser = subcommands.add_parser("seed", help="Insert a synthetic, realistically skewed dataset")
+    seed_parser.add_argument("--users", type=int, default=1_000)
+    seed_parser.add_argument("--books", type=int, default=10_000)
+    seed_parser.add_argument("--library-per-user", type=int, default=25, help="Mean library size")
+    seed_parser.add_argument("--recommendations-per-user", type=int, default=20, help="Mean recommendations per user")
+    seed_parser.add_argument("--tag", default="seed", help="Users are <tag>-<n>@example.com")
+    seed_parser.add_argument("--seed", type=int, default=42, help="Random seed; the same seed gives the same data")
+    seed_parser.set_defaults(handler=_seed)
+
+    stats_parser = subcommands.add_parser(
+        "rebuild-user-stats", help="Recompute the per-user reading statistics from the source tables"
+    )
+    stats_parser.add_argument("--user-id", action="append", help="Only this user (repeatable; default: everyone)")
+    stats_parser.add_argument("--chunk-size", type=int, default=1_000, help="Users per transaction")
+    stats_parser.set_defaults(handler=_rebuild_user_stats)
+
+    calibrate_parser = subcommands.add_parser(
+        "calibrate-bcrypt", help="Pick the bcrypt work factor for this machine (run it on the production hardware)"
+    )
+    calibrate_parser.add_argument("--target-ms", type=float, default=None, help="Budget per hash (default: BCRYPT_TARGET_MS)")
+    calibrate_parser.add_argument("--min-rounds", type=int, default=None, help="Default: BCRYPT_MIN_ROUNDS")
+    calibrate_parser.add_argument("--max-rounds", type=int, default=None, help="Default: BCRYPT_MAX_ROUNDS")
+    calibrate_parser.set_defaults(handler=_calibrate_bcrypt)
+
+    merge_parser = subcommands.add_parser(
+        "merge-duplicate-books", help="Merge near-duplicate books, moving their library entries and recommendations"
+    )
+    merge_parser.add_argument("--threshold", type=float, default=None, help="Default: BOOK_DUPLICATE_SIMILARITY")
+    merge_parser.add_argument("--dry-run", action="store_true", help="Only count the duplicate clusters")
+    merge_parser.set_defaults(handler=_merge_duplicate_books)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
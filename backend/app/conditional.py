@@ -0,0 +1,89 @@
+# Conditional requests: weak ETags, If-None-Match -> 304 and If-Match -> 412
+import hashlib
+from datetime import datetime
+from typing import Annotated, Any
+
+from fastapi import Header, HTTPException, Response, status
+
+# Responses are per user and must be revalidated before reuse; browsers may
+# keep them, shared caches may not
+CACHE_CONTROL = "private, no-cache"
+
+
+def weak_etag(*parts: Any) -> str:
+    """
+    A weak ETag naming one version of a resource, e.g. weak_etag("preferences", id, updated_at).
+
+    Weak because the same version may be serialized differently (key order,
+    compression); it says "semantically equivalent", which is all the version
+    columns can promise.
+    """
+    text = "|".join(value.isoformat() if isinstance(value, datetime) else str(value) for value in parts)
+    return f'W/"{hashlib.blake2b(text.encode(), digest_size=12).hexdigest()}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(header: str, etag: str | None) -> bool:
+    """
+    Whether an If-None-Match / If-Match header value lists `etag` (None: the resource does not exist).
+
+    Tags are compared weakly (W/ prefixes ignored). Strictly, If-Match calls for
+    the strong comparison, but our tags are derived from version columns rather
+    than from the bytes sent, so the weak match is exactly as safe here.
+    """
+    if etag is None:
+        return False
+    if header.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(tag) for tag in header.split(",")}
+
+
+def etag_headers(etag: str) -> dict[str, str]:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+class ConditionalRequest:
+    """The validators a client sent with a request (see conditional_request())."""
+
+    def __init__(self, if_none_match: str | None = None, if_match: str | None = None) -> None:
+        self.if_none_match = if_none_match
+        self.if_match = if_match
+
+    def not_modified(self, etag: str) -> Response | None:
+        """
+        A bodiless 304 response if the client already holds version `etag`, else None.
+
+        Call it before loading or serializing the full representation.
+        """
+        if self.if_none_match is not None and etag_matches(self.if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag))
+        return None
+
+    def check_if_match(self, etag: str | None) -> None:
+        """
+        Reject a write based on a stale copy (lost-update protection).
+
+        Args:
+            etag: The current version of the resource, or None if it does not exist.
+
+        Raises:
+            HTTPException(412): If the request has If-Match and it does not list `etag`.
+        """
+        if self.if_match is not None and not etag_matches(self.if_match, etag):
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="The resource was modified since it was read",
+                headers=etag_headers(etag) if etag else None,
+            )
+
+
+def conditional_request(
+    if_none_match: Annotated[str | None, Header()] = None,
+    if_match: Annotated[str | None, Header()] = None,
+) -> ConditionalRequest:
+    """FastAPI dependency exposing the request's If-None-Match and If-Match headers."""
+    return ConditionalRequest(if_none_match=if_none_match, if_match=if_match)
@@ -0,0 +1,77 @@
+# Column types and SQL functions that work on PostgreSQL (production) and SQLite (tests, benchmarks)
+from datetime import timezone
+
+from sqlalchemy import JSON, DateTime, Text, TypeDecorator, Uuid
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.sql import functions
+from sqlalchemy.sql.expression import FunctionElement
+
+# Native uuid on Postgres, 32 hex characters on SQLite
+GUID = Uuid(as_uuid=True)
+
+# jsonb on Postgres, JSON text elsewhere
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
+# Full-text document; the column only exists on Postgres (see postgresql_only())
+SearchVector = TSVECTOR().with_variant(Text(), "sqlite")
+
+
+class Timestamp(TypeDecorator):
+    """
+    timestamptz on Postgres; on SQLite, UTC stored without an offset.
+
+    Values always come back timezone-aware (UTC), whatever the backend, so
+    comparisons and serialized output do not depend on the database.
+    """
+
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None and dialect.name != "postgresql":
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value
+
+
+class new_uuid(FunctionElement):
+    """A random UUID generated by the database, for primary key server defaults."""
+
+    type = GUID
+    inherit_cache = True
+
+
+@compiles(new_uuid)
+def _new_uuid_postgresql(element, compiler, **kw):
+    return "uuid_generate_v4()"
+
+
+@compiles(new_uuid, "sqlite")
+def _new_uuid_sqlite(element, compiler, **kw):
+    # Same 32-hex-digit form the Uuid type stores on SQLite
+    return "lower(hex(randomblob(16)))"
+
+
+@compiles(functions.now, "sqlite")
+def _now_sqlite(element, compiler, **kw):
+    # CURRENT_TIMESTAMP only has whole seconds, too coarse for updated_at versions (ETags, high-water marks)
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
+def postgresql_only(column):
+    """Mark a column as existing only on Postgres: other dialects leave it out of CREATE TABLE."""
+    column.info["postgresql_only"] = True
+    return column
+
+
+@compiles(CreateColumn)
+def _create_column(element, compiler, **kw):
+    if element.element.info.get("postgresql_only") and compiler.dialect.name != "postgresql":
+        return None
+    return compiler.visit_create_column(element, **kw)
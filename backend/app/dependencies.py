@@ -1,9 +1,15 @@
+import os
+import secrets
+from uuid import UUID
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from .models import SessionLocal, User
+from .models import AsyncSessionLocal, SessionLocal, User
 from .services.auth_service import SECRET_KEY, ALGORITHM
+from .services.principal_cache import Principal, principal_cache
 
 # Dependency to get a database session
 # Yields a SQLAlchemy session and ensures it is closed after use
@@ -14,29 +20,95 @@ def get_db():
     finally:
         db.close()
 
+# Async dependency to get a database session
+# Yields an AsyncSession bound to the async engine and closes it after use
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
-):
-    """
-    Decode JWT token and return the corresponding User.
-    Raises 401 if invalid token or user not found.
-    """
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+# When enabled, read-only routes authenticate purely from the signed JWT claims
+# and skip the users table entirely (a deleted user keeps read access until the token expires)
+TRUST_TOKEN_CLAIMS_FOR_READS = os.getenv("TRUST_TOKEN_CLAIMS_FOR_READS", "false").lower() == "true"
+
+def _decode_claims(token: str) -> tuple[UUID, str | None]:
+    """Decode the JWT and return its `sub` (as a UUID) and `email` claims, raising 401 on any problem."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise credentials_exception
-    return user
+            raise _credentials_exception()
+        return UUID(user_id), payload.get("email")
+    except (JWTError, ValueError):
+        raise _credentials_exception()
+
+def get_current_user(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme)
+) -> Principal:
+    """
+    Decode JWT token and return the corresponding user as a Principal.
+    The users table is only queried on a principal cache miss.
+    Raises 401 if invalid token or user not found.
+    """
+    user_id, _ = _decode_claims(token)
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise _credentials_exception()
+        principal = Principal(id=user.id, email=user.email)
+        principal_cache.set(user_id, principal)
+    return principal
+
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(oauth2_scheme)
+) -> Principal:
+    """
+    Async variant of get_current_user() that queries through the AsyncSession.
+    Raises 401 if invalid token or user not found.
+    """
+    user_id, _ = _decode_claims(token)
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        result = await db.execute(select(User.id, User.email).where(User.id == user_id))
+        row = result.first()
+        if not row:
+            raise _credentials_exception()
+        principal = Principal(id=row.id, email=row.email)
+        principal_cache.set(user_id, principal)
+    return principal
+
+async def get_current_user_readonly(
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(oauth2_scheme)
+) -> Principal:
+    """
+    Principal for read-only routes.
+    Trusts the signed token claims when TRUST_TOKEN_CLAIMS_FOR_READS is enabled,
+    otherwise behaves like get_current_user_async().
+    """
+    if TRUST_TOKEN_CLAIMS_FOR_READS:
+        user_id, email = _decode_claims(token)
+        return Principal(id=user_id, email=email)
+    return await get_current_user_async(db, token)
+
+# Shared secret for operator-only endpoints (/admin/*); unset disables them entirely
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN")
+
+def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    """
+    Allow the request only if it carries the X-Admin-Token header matching ADMIN_API_TOKEN.
+    Raises 403 otherwise.
+    """
+    if not ADMIN_API_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_API_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
@@ -1,13 +1,45 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 
 # Import the router for user preferences
-from .routers import preferences, auth  # Import the new auth router
+from .routers import preferences, auth, users, library, recommendations, books, admin, jobs, ai  # Import the new auth router
+from .metrics import REGISTRY, MetricsMiddleware
+from .models import async_engine, engine
+from .services import book_duplicates, health_service, job_queue, review_templates
+from .services.password_hasher import HashingQueueFull, password_hasher
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application startup/shutdown logic.
+    Code before `yield` runs at startup, code after it runs at shutdown.
+    """
+    # Open pooled connections up front so early requests don't pay for connection setup
+    await health_service.warm_pools()
+    # Index the catalog for duplicate checks on POST /books before taking traffic
+    if book_duplicates.BOOK_DUPLICATE_INDEX_AT_STARTUP:
+        await run_in_threadpool(book_duplicates.warm_duplicate_index)
+    # Create the review-template backend now, so a misconfigured one fails startup, not the first request
+    review_templates.get_review_template_service()
+    # Run queued background jobs (recommendation refreshes) in this process
+    if job_queue.JOB_RUNNER_IN_PROCESS:
+        job_queue.job_runner.start()
+    yield
+    await job_queue.job_runner.stop()
+    # Stop the password hashing worker threads
+    password_hasher.shutdown()
+    # Close pooled database connections
+    await async_engine.dispose()
+    engine.dispose()
 
 # Create the FastAPI application instance
 # You can add metadata like title, version, etc. here
 # e.g., app = FastAPI(title="ShelfSense API", version="0.1.0")
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 # This is needed to allow requests from your frontend (running on a different origin)
@@ -20,33 +52,69 @@ app.add_middleware(
     allow_headers=["*"],     # Allow all headers in requests
 )
 
+# Record latency, status and database cost of every request
+# (added last so it wraps all other middleware)
+app.add_middleware(MetricsMiddleware)
+
 # Include the preferences router in the application
 # All routes defined in the preferences router will now be available
 # under the prefix specified in the router (e.g., /users)
 app.include_router(preferences.router)
 app.include_router(auth.router)  # Include the auth router
+app.include_router(users.router)
+app.include_router(library.router)
+app.include_router(recommendations.router)
+app.include_router(books.router)
+app.include_router(admin.router)
+app.include_router(jobs.router)
+app.include_router(ai.router)
+
+# Fail fast with 503 when the password hashing queue is saturated,
+# so clients back off instead of piling up behind slow bcrypt calls
+@app.exception_handler(HashingQueueFull)
+async def hashing_queue_full_handler(request: Request, exc: HashingQueueFull):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Authentication service is busy, please retry"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 # You can add other routers here as the application grows
 # from .routers import another_router
 # app.include_router(another_router.router)
 
-# Optional: Add a root endpoint for basic health check or welcome message
+# Root endpoint: welcome message plus a (cached) database health check
 @app.get("/")
 async def read_root():
     """
     Root endpoint providing a simple welcome message.
+    Returns 503 when the database is unreachable, so container health checks fail.
     """
-    return {"message": "Welcome to ShelfSense API"}
+    healthy, _ = await health_service.check_database()
+    content = {"message": "Welcome to ShelfSense API", "database": "ok" if healthy else "unavailable"}
+    return JSONResponse(status_code=200 if healthy else 503, content=content)
+
+@app.get("/health")
+async def read_health():
+    """
+    Detailed health check with database status and connection pool statistics.
+    """
+    healthy, error = await health_service.check_database()
+    content = {
+        "status": "ok" if healthy else "unavailable",
+        "database": {"healthy": healthy, "error": error},
+        "pool": {
+            "sync": health_service.pool_stats(engine),
+            "async": health_service.pool_stats(async_engine.sync_engine),
+            "checkout_wait": health_service.checkout_wait_stats(),
+        },
+    }
+    return JSONResponse(status_code=200 if healthy else 503, content=content)
 
-# If you have database initialization or other startup/shutdown logic,
-# you can add event handlers:
-# @app.on_event("startup")
-# async def startup_event():
-#     # Initialize database, etc.
-#     pass
-#
-# @app.on_event("shutdown")
-# async def shutdown_event():
-#     # Clean up resources, etc.
-#     pass
 
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """
+    Prometheus scrape endpoint with the metrics of this worker process.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
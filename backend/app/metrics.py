@@ -0,0 +1,288 @@
+# Lightweight, always-on request and database metrics exposed in Prometheus text format
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Requests slower than this are logged with their cost breakdown (0 disables the log)
+METRICS_SLOW_REQUEST_MS = float(os.getenv("METRICS_SLOW_REQUEST_MS", "0"))
+
+# Fixed bucket upper bounds shared by all latency histograms (seconds)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bucket upper bounds for "queries per request"
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    """Render a Prometheus label set such as {method="GET",le="0.1"}."""
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Cumulative fixed-bucket histogram; observe() is a bisect plus three increments."""
+
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        # One slot per bucket plus the implicit +Inf bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class HistogramFamily:
+    """A histogram metric with one child histogram per label combination."""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._children: dict[tuple, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> Histogram:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.buckets))
+        return child
+
+    def totals(self) -> dict[tuple, tuple[int, float]]:
+        """(observation count, sum of observed values) per label combination."""
+        return {values: (child.count, child.sum) for values, child in list(self._children.items())}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, child.counts):
+                cumulative += count
+                bucket_labels = _format_labels(self.label_names, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            inf_labels = _format_labels(self.label_names, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf_labels} {child.count}")
+            labels = _format_labels(self.label_names, values)
+            lines.append(f"{self.name}_sum{labels} {child.sum}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class CounterFamily:
+    """A monotonically increasing counter with labels."""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *values, amount: float = 1) -> None:
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for values, total in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, values)} {total}")
+        return lines
+
+
+class GaugeCallback:
+    """A gauge whose value is read from a callback at scrape time."""
+
+    def __init__(self, name: str, help_text: str, callback: Callable[[], float]):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {self.callback()}"]
+
+
+class MetricsRegistry:
+    """Holds every metric of this worker process and renders them for /metrics."""
+
+    def __init__(self):
+        self._metrics: list = []
+
+    def histogram(self, name: str, help_text: str, label_names: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> HistogramFamily:
+        metric = HistogramFamily(name, help_text, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: tuple = ()) -> CounterFamily:
+        metric = CounterFamily(name, help_text, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help_text: str, callback: Callable[[], float]) -> GaugeCallback:
+        metric = GaugeCallback(name, help_text, callback)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Metrics are per worker process; Prometheus aggregates across workers
+REGISTRY = MetricsRegistry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    "shelfsense_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+REQUESTS_TOTAL = REGISTRY.counter(
+    "shelfsense_requests_total", "HTTP requests by route and status code", ("method", "route", "status")
+)
+REQUEST_QUERIES = REGISTRY.histogram(
+    "shelfsense_request_db_queries", "Database statements executed per request", ("method", "route"), QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_TIME = REGISTRY.histogram(
+    "shelfsense_request_db_seconds", "Total database time per request", ("method", "route")
+)
+POOL_WAIT = REGISTRY.histogram(
+    "shelfsense_db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection"
+)
+PASSWORD_HASH_TIME = REGISTRY.histogram(
+    "shelfsense_password_hash_seconds",
+    "Duration of bcrypt calls by operation (hash, verify) and work factor (rounds)",
+    ("operation", "rounds"),
+)
+
+
+class RequestMetrics:
+    """Per-request cost accumulator; the only object allocated per request."""
+
+    __slots__ = ("query_count", "db_seconds", "pool_wait_seconds", "hash_seconds")
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.hash_seconds = 0.0
+
+
+# The metrics of the request currently being handled (None outside requests)
+current_request: ContextVar[Optional[RequestMetrics]] = ContextVar("current_request", default=None)
+
+
+def record_pool_wait(seconds: float) -> None:
+    POOL_WAIT.labels().observe(seconds)
+    request_metrics = current_request.get()
+    if request_metrics is not None:
+        request_metrics.pool_wait_seconds += seconds
+
+
+def record_password_hash(seconds: float, operation: str = "hash", rounds: int | None = None) -> None:
+    PASSWORD_HASH_TIME.labels(operation, "unknown" if rounds is None else str(rounds)).observe(seconds)
+    request_metrics = current_request.get()
+    if request_metrics is not None:
+        request_metrics.hash_seconds += seconds
+
+
+class _TimedCheckoutMixin:
+    """Pool mixin that measures how long each connection checkout waits."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            record_pool_wait(time.perf_counter() - started)
+
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started_at"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    request_metrics = current_request.get()
+    if request_metrics is not None:
+        request_metrics.query_count += 1
+        request_metrics.db_seconds += time.perf_counter() - conn.info.pop("query_started_at", time.perf_counter())
+
+
+def instrument_engine(engine) -> None:
+    """Attach the query timing hooks to a (sync) Engine."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, status and DB cost per route.
+
+    Routes are labelled by their path template (e.g. /users/me/library/{entry_id}/review)
+    so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_metrics = RequestMetrics()
+        token = current_request.set(request_metrics)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            route = scope.get("route")
+            route_label = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            REQUEST_DURATION.labels(method, route_label).observe(elapsed)
+            REQUESTS_TOTAL.inc(method, route_label, status_code)
+            REQUEST_QUERIES.labels(method, route_label).observe(request_metrics.query_count)
+            REQUEST_DB_TIME.labels(method, route_label).observe(request_metrics.db_seconds)
+            if METRICS_SLOW_REQUEST_MS and elapsed * 1000 >= METRICS_SLOW_REQUEST_MS:
+                logger.warning(
+                    "Slow request %s %s: %.1f ms (status=%s queries=%d db=%.1f ms pool_wait=%.1f ms bcrypt=%.1f ms)",
+                    method, route_label, elapsed * 1000, status_code, request_metrics.query_count,
+                    request_metrics.db_seconds * 1000, request_metrics.pool_wait_seconds * 1000,
+                    request_metrics.hash_seconds * 1000,
+                )
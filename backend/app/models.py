@@ -1,57 +1,177 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import logging
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import Column, String, DateTime, Text, Integer, ForeignKey, Numeric, Date, func
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Computed, String, Text, Integer, ForeignKey, Numeric, Date, Index, UniqueConstraint, event, func, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
+
+from .db_types import GUID, JSONDocument, SearchVector, Timestamp, new_uuid, postgresql_only
+from .metrics import TimedAsyncAdaptedQueuePool, TimedQueuePool, instrument_engine
 
 Base = declarative_base()
 
 # Read the database URL from environment variables
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise RuntimeError("DATABASE_URL environment variable is not set.")
+# Without one the app runs on a private in-memory SQLite database (handy for tests and
+# benchmarks, never what you want in production), e.g. DATABASE_URL=sqlite:///shelfsense.db
+# for a file or postgresql://... for the real thing
+DATABASE_URL = os.getenv("DATABASE_URL") or "sqlite:///:memory:"
+if not os.getenv("DATABASE_URL"):
+    logging.getLogger(__name__).warning("DATABASE_URL is not set; using an in-memory SQLite database")
+
+_IS_POSTGRES = make_url(DATABASE_URL).get_backend_name() == "postgresql"
+_IS_SQLITE = make_url(DATABASE_URL).get_backend_name() == "sqlite"
+
+# Tables live in the "shelfsense" schema on Postgres; SQLite has no schemas, so
+# there the schema is mapped away and the tables live in the main database
+SCHEMA = "shelfsense"
+_EXECUTION_OPTIONS = {} if _IS_POSTGRES else {"schema_translate_map": {SCHEMA: None}}
+
+# Connection pool settings (override via environment)
+# Each engine (sync and async) gets its own pool of this size per worker process.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds to wait for a free connection before failing the request
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Connections older than this many seconds are replaced, so restarts/failovers heal quietly
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Test each connection on checkout so stale ones are replaced instead of failing a request
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+def _pool_options(poolclass) -> dict:
+    """Engine keyword arguments for the configured queue pool (Postgres only)."""
+    if not _IS_POSTGRES:
+        return {"pool_pre_ping": DB_POOL_PRE_PING, "execution_options": _EXECUTION_OPTIONS}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+def _sqlite_url(url: str) -> str:
+    """
+    Turn an in-memory SQLite URL into a named, shared-cache one, so the sync and the
+    async engine (and all their connections) see the same in-memory database.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or parsed.database not in (None, "", ":memory:"):
+        return url
+    return parsed.set(database="file:shelfsense?mode=memory&cache=shared", query={"uri": "true"}).render_as_string()
+
+def _configure_sqlite(dbapi_connection, connection_record) -> None:
+    """Per-connection SQLite settings: enforce foreign keys (ON DELETE CASCADE) and wait on locks."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys = ON")
+    cursor.execute("PRAGMA busy_timeout = 5000")
+    # Readers no longer block the writer; not available for in-memory databases
+    cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.close()
 
 # Create the SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
+# On Postgres the queue pool is swapped for a subclass that times connection checkouts
+engine = create_engine(_sqlite_url(DATABASE_URL), **_pool_options(TimedQueuePool))
+# Count and time every statement for the per-request metrics
+instrument_engine(engine)
 
 # Create a configured "SessionLocal" class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _to_async_url(url: str) -> str:
+    """Swap the sync DB driver in a URL for its asyncio counterpart."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "postgresql":
+        return parsed.set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+    if parsed.get_backend_name() == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    return url
+
+# The async engine talks to the same database through an asyncio driver (asyncpg),
+# so async endpoints can await queries instead of blocking the event loop.
+# ASYNC_DATABASE_URL can override the URL derived from DATABASE_URL.
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _to_async_url(_sqlite_url(DATABASE_URL))
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_pool_options(TimedAsyncAdaptedQueuePool))
+instrument_engine(async_engine.sync_engine)
+
+if _IS_SQLITE:
+    for _engine in (engine, async_engine.sync_engine):
+        event.listen(_engine, "connect", _configure_sqlite)
+
+# Async counterpart of SessionLocal
+# expire_on_commit=False keeps loaded attributes usable after commit without extra awaits
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 class User(Base):
     __tablename__ = 'users'
     __table_args__ = {'schema': 'shelfsense'}
 
-    id = Column(UUID(as_uuid=True), primary_key=True, server_default=func.uuid_generate_v4())
+    id = Column(GUID, primary_key=True, server_default=new_uuid())
     email = Column(String(254), nullable=False, unique=True)
     username = Column(String(255), nullable=False)
     password_hash = Column(String(60), nullable=False)
-    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    created_at = Column(Timestamp, nullable=False, server_default=func.now())
+    updated_at = Column(Timestamp, nullable=False, server_default=func.now(), onupdate=func.now())
+
+    # passive_deletes: the database removes these rows (ON DELETE CASCADE) when the user goes
+    preferences = relationship('UserPreference', back_populates='user', uselist=False, passive_deletes=True)
+    library_entries = relationship('UserLibraryEntry', back_populates='user', passive_deletes=True)
+    recommendations = relationship('Recommendation', back_populates='user', passive_deletes=True)
+    recommendation_ratings = relationship('RecommendationRating', back_populates='user', passive_deletes=True)
+
+# Expression behind Book.search_vector; must match the generated column in the migration
+BOOK_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(author, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+# Canonical genre dictionary (see app/services/genres.py and db/migrations/008_genre_taxonomy.sql)
+class Genre(Base):
+    __tablename__ = 'genres'
+    __table_args__ = {'schema': 'shelfsense'}
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False, unique=True)
+    created_at = Column(Timestamp, nullable=False, server_default=func.now())
+
+# Normalized spelling (genre_key()) -> canonical genre, e.g. 'scifi' -> Science Fiction
+class GenreAlias(Base):
+    __tablename__ = 'genre_aliases'
+    __table_args__ = {'schema': 'shelfsense'}
 
-    preferences = relationship('UserPreference', back_populates='user', uselist=False)
-    library_entries = relationship('UserLibraryEntry', back_populates='user')
-    recommendations = relationship('Recommendation', back_populates='user')
-    recommendation_ratings = relationship('RecommendationRating', back_populates='user')
+    key = Column(String(100), primary_key=True)
+    genre_id = Column(Integer, ForeignKey('shelfsense.genres.id', ondelete='CASCADE'), nullable=False)
 
 class Book(Base):
     __tablename__ = 'books'
     __table_args__ = {'schema': 'shelfsense'}
 
-    id = Column(UUID(as_uuid=True), primary_key=True, server_default=func.uuid_generate_v4())
+    id = Column(GUID, primary_key=True, server_default=new_uuid())
     title = Column(String(255), nullable=False)
     author = Column(String(255), nullable=False)
     isbn = Column(String(13), nullable=True)
+    # Canonical genre; `genre` repeats its name so reads need no join
+    genre_id = Column(Integer, ForeignKey('shelfsense.genres.id'), nullable=True)
     genre = Column(Text, nullable=True)
     description = Column(Text, nullable=True)
     publication_date = Column(Date, nullable=True)
     page_count = Column(Integer, nullable=True)
-    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    created_at = Column(Timestamp, nullable=False, server_default=func.now())
+    updated_at = Column(Timestamp, nullable=False, server_default=func.now(), onupdate=func.now())
+    # Weighted full-text document maintained by the database (see db/migrations/001_books_search.sql)
+    search_vector = deferred(postgresql_only(Column(SearchVector, Computed(BOOK_SEARCH_VECTOR_SQL, persisted=True))))
+
+    # Do not read server-generated values back after INSERT: that would name
+    # search_vector in RETURNING, and the column only exists on Postgres
+    __mapper_args__ = {'eager_defaults': False}
 
     library_entries = relationship('UserLibraryEntry', back_populates='book')
     recommendations = relationship('Recommendation', back_populates='recommended_book')
@@ -60,64 +180,171 @@ class UserPreference(Base):
     __tablename__ = 'user_preferences'
     __table_args__ = {'schema': 'shelfsense'}
 
-    id = Column(UUID(as_uuid=True), primary_key=True, server_default=func.uuid_generate_v4())
-    user_id = Column(UUID(as_uuid=True), ForeignKey('shelfsense.users.id', ondelete='CASCADE'), nullable=False, unique=True)
+    id = Column(GUID, primary_key=True, server_default=new_uuid())
+    user_id = Column(GUID, ForeignKey('shelfsense.users.id', ondelete='CASCADE'), nullable=False, unique=True)
     preferences_text = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    created_at = Column(Timestamp, nullable=False, server_default=func.now())
+    updated_at = Column(Timestamp, nullable=False, server_default=func.now(), onupdate=func.now())
 
     user = relationship('User', back_populates='preferences')
 
 class UserLibraryEntry(Base):
     __tablename__ = 'user_library_entries'
-    __table_args__ = {'schema': 'shelfsense'}
+    __table_args__ = (
+        UniqueConstraint('user_id', 'book_id', name='uq_user_library_entries_user_book'),
+        {'schema': 'shelfsense'},
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, server_default=func.uuid_generate_v4())
-    user_id = Column(UUID(as_uuid=True), ForeignKey('shelfsense.users.id', ondelete='CASCADE'), nullable=False)
-    book_id = Column(UUID(as_uuid=True), ForeignKey('shelfsense.books.id', ondelete='RESTRICT'), nullable=False)
-    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    id = Column(GUID, primary_key=True, server_default=new_uuid())
+    user_id = Column(GUID, ForeignKey('shelfsense.users.id', ondelete='CASCADE'), nullable=False)
+    book_id = Column(GUID, ForeignKey('shelfsense.books.id', ondelete='RESTRICT'), nullable=False)
+    created_at = Column(Timestamp, nullable=False, server_default=func.now())
+    updated_at = Column(Timestamp, nullable=False, server_default=func.now(), onupdate=func.now())
 
     user = relationship('User', back_populates='library_entries')
-    book = relationship('Book', back_populates='library_entries')
-    review = relationship('Review', back_populates='library_entry', uselist=False)
+    # raise_on_sql: list queries must load these explicitly (joins/selectinload), never one row at a time
+    book = relationship('Book', back_populates='library_entries', lazy='raise_on_sql')
+    review = relationship('Review', back_populates='library_entry', uselist=False, lazy='raise_on_sql')
 
 class Review(Base):
     __tablename__ = 'reviews'
     __table_args__ = {'schema': 'shelfsense'}
 
-    id = Column(UUID(as_uuid=True), primary_key=True, server_default=func.uuid_generate_v4())
-    user_library_entry_id = Column(UUID(as_uuid=True), ForeignKey('shelfsense.user_library_entries.id', ondelete='CASCADE'), nullable=False, unique=True)
+    id = Column(GUID, primary_key=True, server_default=new_uuid())
+    user_library_entry_id = Column(GUID, ForeignKey('shelfsense.user_library_entries.id', ondelete='CASCADE'), nullable=False, unique=True)
     review_text = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    created_at = Column(Timestamp, nullable=False, server_default=func.now())
+    updated_at = Column(Timestamp, nullable=False, server_default=func.now(), onupdate=func.now())
 
     library_entry = relationship('UserLibraryEntry', back_populates='review')
 
 class Recommendation(Base):
     __tablename__ = 'recommendations'
-    __table_args__ = {'schema': 'shelfsense'}
+    __table_args__ = (
+        UniqueConstraint('user_id', 'recommended_book_id', name='uq_recommendations_user_book'),
+        {'schema': 'shelfsense'},
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, server_default=func.uuid_generate_v4())
-    user_id = Column(UUID(as_uuid=True), ForeignKey('shelfsense.users.id', ondelete='CASCADE'), nullable=False)
-    recommended_book_id = Column(UUID(as_uuid=True), ForeignKey('shelfsense.books.id', ondelete='RESTRICT'), nullable=False)
-    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    id = Column(GUID, primary_key=True, server_default=new_uuid())
+    user_id = Column(GUID, ForeignKey('shelfsense.users.id', ondelete='CASCADE'), nullable=False)
+    recommended_book_id = Column(GUID, ForeignKey('shelfsense.books.id', ondelete='RESTRICT'), nullable=False)
+    created_at = Column(Timestamp, nullable=False, server_default=func.now())
+    updated_at = Column(Timestamp, nullable=False, server_default=func.now(), onupdate=func.now())
 
     user = relationship('User', back_populates='recommendations')
-    recommended_book = relationship('Book', back_populates='recommendations')
-    rating = relationship('RecommendationRating', back_populates='recommendation', uselist=False)
+    recommended_book = relationship('Book', back_populates='recommendations', lazy='raise_on_sql')
+    rating = relationship('RecommendationRating', back_populates='recommendation', uselist=False, lazy='raise_on_sql')
 
 class RecommendationRating(Base):
     __tablename__ = 'recommendation_ratings'
     __table_args__ = {'schema': 'shelfsense'}
 
-    id = Column(UUID(as_uuid=True), primary_key=True, server_default=func.uuid_generate_v4())
-    recommendation_id = Column(UUID(as_uuid=True), ForeignKey('shelfsense.recommendations.id', ondelete='CASCADE'), nullable=False, unique=True)
-    user_id = Column(UUID(as_uuid=True), ForeignKey('shelfsense.users.id', ondelete='CASCADE'), nullable=False)
+    id = Column(GUID, primary_key=True, server_default=new_uuid())
+    recommendation_id = Column(GUID, ForeignKey('shelfsense.recommendations.id', ondelete='CASCADE'), nullable=False, unique=True)
+    user_id = Column(GUID, ForeignKey('shelfsense.users.id', ondelete='CASCADE'), nullable=False)
     rating = Column(Numeric(2, 1), nullable=False)
-    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    created_at = Column(Timestamp, nullable=False, server_default=func.now())
+    updated_at = Column(Timestamp, nullable=False, server_default=func.now(), onupdate=func.now())
 
     recommendation = relationship('Recommendation', back_populates='rating')
     user = relationship('User', back_populates='recommendation_ratings')
+
+# High-water mark of an incremental batch job (see db/migrations/004_recommendation_precompute.sql)
+class JobWatermark(Base):
+    __tablename__ = 'job_watermarks'
+    __table_args__ = {'schema': 'shelfsense'}
+
+    job_name = Column(String(100), primary_key=True)
+    high_water = Column(Timestamp, nullable=False)
+    created_at = Column(Timestamp, nullable=False, server_default=func.now())
+    updated_at = Column(Timestamp, nullable=False, server_default=func.now(), onupdate=func.now())
+
+# Background job, e.g. a recommendation refresh (see db/migrations/005_jobs.sql)
+JOB_ACTIVE_STATUSES = ('queued', 'running')
+# Predicate of the partial unique index, as a literal: ON CONFLICT can only match the
+# index when the predicate is identical text, not bound parameters
+JOB_ACTIVE_SQL = "status IN ('queued', 'running')"
+
+class Job(Base):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # One active job per user and kind, so duplicate requests coalesce
+        Index(
+            'uq_jobs_active_per_user', 'kind', 'user_id', unique=True,
+            postgresql_where=text(JOB_ACTIVE_SQL),
+            sqlite_where=text(JOB_ACTIVE_SQL),
+        ),
+        {'schema': 'shelfsense'},
+    )
+
+    id = Column(GUID, primary_key=True, server_default=new_uuid())
+    kind = Column(String(50), nullable=False)
+    user_id = Column(GUID, ForeignKey('shelfsense.users.id', ondelete='CASCADE'), nullable=False)
+    status = Column(String(20), nullable=False, server_default='queued')
+    attempts = Column(Integer, nullable=False, server_default='0')
+    result = Column(JSONDocument, nullable=True)
+    error = Column(Text, nullable=True)
+    started_at = Column(Timestamp, nullable=True)
+    finished_at = Column(Timestamp, nullable=True)
+    created_at = Column(Timestamp, nullable=False, server_default=func.now())
+    updated_at = Column(Timestamp, nullable=False, server_default=func.now(), onupdate=func.now())
+
+# Per-user reading statistics, kept up to date by the writes that change them
+# (see app/services/user_stats.py and db/migrations/007_user_stats.sql)
+class UserStats(Base):
+    __tablename__ = 'user_stats'
+    __table_args__ = {'schema': 'shelfsense'}
+
+    user_id = Column(GUID, ForeignKey('shelfsense.users.id', ondelete='CASCADE'), primary_key=True)
+    library_entries = Column(Integer, nullable=False, server_default='0')
+    reviews = Column(Integer, nullable=False, server_default='0')
+    ratings = Column(Integer, nullable=False, server_default='0')
+    rating_sum = Column(Numeric(12, 1), nullable=False, server_default='0')
+    # {genre: library entries}; books without a genre are not counted
+    genre_counts = Column(JSONDocument, nullable=False, server_default=text("'{}'"))
+    updated_at = Column(Timestamp, nullable=False, server_default=func.now(), onupdate=func.now())
+
+# Plain B-tree indexes from db/migrations, declared here too so create_schema()
+# builds them on any backend (migrations create them IF NOT EXISTS, by the same names)
+Index('idx_user_library_entries_user_created', UserLibraryEntry.user_id, UserLibraryEntry.created_at.desc(), UserLibraryEntry.id.desc())
+Index('idx_recommendations_user_created', Recommendation.user_id, Recommendation.created_at.desc(), Recommendation.id.desc())
+Index('idx_books_title_id', Book.title, Book.id)
+Index('idx_books_created_id', Book.created_at.desc(), Book.id.desc())
+Index('idx_books_genre_title', Book.genre_id, Book.title, Book.id)
+Index('idx_books_updated_at', Book.updated_at)
+Index('idx_user_preferences_updated_at', UserPreference.updated_at)
+Index('idx_user_library_entries_updated_at', UserLibraryEntry.updated_at)
+Index('idx_recommendation_ratings_updated_at', RecommendationRating.updated_at)
+Index(
+    'idx_jobs_queued', Job.created_at,
+    postgresql_where=text("status = 'queued'"),
+    sqlite_where=text("status = 'queued'"),
+)
+
+# Versioned SQL migrations; absent when only backend/ is deployed (e.g. the Docker image)
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'db', 'migrations')
+
+def create_schema(bind=None) -> None:
+    """
+    Creates every table and index on an empty database (tests, benchmarks, local development).
+
+    On Postgres the shelfsense schema and the extensions are created first and the
+    SQL migrations are then applied for what the models cannot express (trigram
+    and full-text indexes, book_norm_key()); they are written to be re-runnable.
+    On SQLite the Postgres-only parts are skipped. Existing deployments are
+    upgraded with the migration files alone.
+
+    Args:
+        bind: Engine to create the schema on; defaults to the app's engine.
+    """
+    bind = bind if bind is not None else engine
+    with bind.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text(f'CREATE SCHEMA IF NOT EXISTS {SCHEMA}'))
+            connection.execute(text('CREATE EXTENSION IF NOT EXISTS "uuid-ossp"'))
+        Base.metadata.create_all(connection)
+        if connection.dialect.name == "postgresql" and os.path.isdir(MIGRATIONS_DIR):
+            for name in sorted(os.listdir(MIGRATIONS_DIR)):
+                if name.endswith('.sql'):
+                    with open(os.path.join(MIGRATIONS_DIR, name)) as file:
+                        connection.exec_driver_sql(file.read())
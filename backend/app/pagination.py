@@ -0,0 +1,138 @@
+# Keyset (cursor) pagination shared by the list endpoints
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Literal, Sequence
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# How the optional `total` of a page is computed:
+#   none     - not computed (cheapest)
+#   estimate - planner row estimate, no table scan (falls back to exact off Postgres)
+#   exact    - COUNT(*) over the filtered rows
+CountMode = Literal["none", "estimate", "exact"]
+
+
+@dataclass(frozen=True)
+class SortKey:
+    """
+    An ordering usable for keyset pagination.
+
+    `columns` must end with a unique column (the primary key) so the order is total.
+    All columns are sorted in the same direction, which lets the "after cursor"
+    condition be a single row-value comparison that the composite index can seek to.
+    """
+
+    name: str
+    columns: tuple
+    parsers: tuple[Callable[[Any], Any], ...]
+    descending: bool = False
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, (datetime, UUID)):
+        return value.isoformat() if isinstance(value, datetime) else str(value)
+    return value
+
+
+def encode_cursor(sort_key: SortKey, values: Sequence[Any]) -> str:
+    """Encode the sort values of the last returned row as an opaque cursor string."""
+    payload = json.dumps([sort_key.name, [_to_json(value) for value in values]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(sort_key: SortKey, cursor: str) -> list[Any]:
+    """
+    Decode a cursor produced by encode_cursor() for the same sort key.
+
+    Raises:
+        HTTPException(400): If the cursor is malformed or belongs to another ordering.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        name, raw_values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if name != sort_key.name or not isinstance(raw_values, list) or len(raw_values) != len(sort_key.parsers):
+            raise ValueError("cursor does not match the requested sort")
+        # encode_cursor() only writes strings and numbers; anything else was not made by it
+        if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in raw_values):
+            raise ValueError("cursor values must be strings or numbers")
+        return [parse(value) for parse, value in zip(sort_key.parsers, raw_values)]
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+async def fetch_keyset_page(
+    db: AsyncSession,
+    statement: Select,
+    sort_key: SortKey,
+    cursor: str | None,
+    limit: int,
+    as_rows: bool = False,
+) -> tuple[list, str | None]:
+    """
+    Fetch one page of `statement` ordered by `sort_key`, starting after `cursor`.
+
+    The sort values are selected alongside the row so the next cursor can be built
+    from computed expressions (e.g. a search rank) as well as plain columns.
+    Every page costs one index seek plus `limit` rows, however deep it is.
+
+    Returns:
+        (rows, next_cursor) where each row is the first selected entity (or, with
+        `as_rows`, the tuple of all selected columns) and next_cursor is None on
+        the last page.
+    """
+    key_columns = sort_key.columns
+    if cursor is not None:
+        after = tuple_(*key_columns)
+        values = tuple_(*decode_cursor(sort_key, cursor))
+        statement = statement.where(after < values if sort_key.descending else after > values)
+
+    ordering = [column.desc() if sort_key.descending else column.asc() for column in key_columns]
+    statement = statement.add_columns(*key_columns).order_by(*ordering).limit(limit + 1)
+
+    rows = (await db.execute(statement)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(sort_key, rows[-1][-len(key_columns):])
+    if as_rows:
+        return [tuple(row[:-len(key_columns)]) for row in rows], next_cursor
+    return [row[0] for row in rows], next_cursor
+
+
+async def count_rows(db: AsyncSession, statement: Select, mode: CountMode) -> tuple[int | None, bool]:
+    """
+    Count the rows matched by `statement` according to `mode`.
+
+    Returns:
+        (total, is_estimate); total is None when mode is "none".
+    """
+    if mode == "none":
+        return None, False
+    if mode == "estimate" and db.get_bind().dialect.name == "postgresql":
+        return await _planner_estimate(db, statement), True
+    exact = select(func.count()).select_from(statement.order_by(None).subquery())
+    return (await db.execute(exact)).scalar_one(), False
+
+
+async def _planner_estimate(db: AsyncSession, statement: Select) -> int:
+    """Ask the Postgres planner how many rows `statement` returns, without running it."""
+    connection = await db.connection()
+    compiled = statement.order_by(None).compile(dialect=connection.dialect)
+    if compiled.positional:
+        parameters = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        parameters = compiled.params
+    result = await connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + compiled.string, parameters)
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
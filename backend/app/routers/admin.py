@@ -0,0 +1,70 @@
+# Router for operator-only endpoints (protected by the X-Admin-Token header)
+import hashlib
+import io
+import os
+import tempfile
+from typing import IO, Annotated
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from .. import dependencies, models
+from ..services import book_import
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(dependencies.require_admin)],
+)
+
+# Checkpoints of uploaded imports, named after the upload's SHA-256: uploading
+# the same file again after a failure resumes it. Local to the host that ran it.
+BOOK_IMPORT_CHECKPOINT_DIR = os.getenv(
+    "BOOK_IMPORT_CHECKPOINT_DIR", os.path.join(tempfile.gettempdir(), "shelfsense-imports")
+)
+
+@router.post("/books/import")
+async def import_books(
+    file: Annotated[UploadFile, File(description="Catalog as CSV (with header) or JSON Lines")],
+    format: Annotated[book_import.ImportFormat | None, Query()] = None,
+    batch_size: Annotated[int, Query(ge=100, le=100_000)] = 10_000,
+):
+    """
+    Bulk-imports books from an uploaded publisher catalog.
+
+    The upload is streamed through the same COPY-based pipeline as the
+    `import-books` CLI command; duplicates by ISBN or normalized title+author are skipped.
+    The format is taken from `format` or, if omitted, from the file extension.
+    Progress is checkpointed per file content, so if an import fails midway,
+    uploading the same file again resumes after the last committed batch.
+
+    Raises:
+        HTTPException(400): If the format cannot be determined.
+    """
+    fmt = format or _format_from_filename(file.filename)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail="Unknown file format, pass ?format=csv or ?format=jsonl")
+    stats = await run_in_threadpool(_import_upload, file.file, fmt, batch_size)
+    return stats.to_dict()
+
+def checkpoint_path_for(upload: IO[bytes]) -> str:
+    """The checkpoint file of an upload, by content hash (leaves the upload rewound)."""
+    digest = hashlib.sha256()
+    for block in iter(lambda: upload.read(1 << 20), b""):
+        digest.update(block)
+    upload.seek(0)
+    os.makedirs(BOOK_IMPORT_CHECKPOINT_DIR, exist_ok=True)
+    return os.path.join(BOOK_IMPORT_CHECKPOINT_DIR, f"{digest.hexdigest()}.checkpoint")
+
+def _import_upload(upload: IO[bytes], fmt: book_import.ImportFormat, batch_size: int) -> book_import.ImportStats:
+    checkpoint_path = checkpoint_path_for(upload)
+    # UploadFile spools to disk, so wrapping it keeps memory flat for large catalogs
+    stream = io.TextIOWrapper(upload, encoding="utf-8", newline="")
+    return book_import.import_books(models.engine, stream, fmt, batch_size, checkpoint_path=checkpoint_path)
+
+def _format_from_filename(filename: str | None) -> book_import.ImportFormat | None:
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    if filename and filename.lower().endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return None
@@ -0,0 +1,91 @@
+# Router for AI-assisted features (review templates)
+import json
+import logging
+from typing import Annotated, AsyncIterator
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import schemas, dependencies
+from ..services.principal_cache import Principal
+from ..services.review_templates import (
+    GenerationUnavailable,
+    ReviewTemplateService,
+    get_review_template_service,
+    load_book_context,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/ai",
+    tags=["ai"],
+)
+
+DBSession = Annotated[AsyncSession, Depends(dependencies.get_async_db)]
+CurrentUser = Annotated[Principal, Depends(dependencies.get_current_user_async)]
+TemplateService = Annotated[ReviewTemplateService, Depends(get_review_template_service)]
+
+# Seconds clients are told to wait when generation is saturated or timed out
+RETRY_AFTER_SECONDS = 5
+
+def _sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+async def _event_stream(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Server-sent events: a `token` event per chunk, then `done` with the full template (or `error`)."""
+    template = []
+    try:
+        async for chunk in chunks:
+            template.append(chunk)
+            yield _sse("token", {"text": chunk})
+    except GenerationUnavailable as exc:
+        yield _sse("error", {"detail": str(exc), "retry_after": RETRY_AFTER_SECONDS})
+        return
+    except Exception:
+        # The 200 status line is already sent: end the stream with a terminal event, not a cut-off body
+        logger.exception("Review template generation failed mid-stream")
+        yield _sse("error", {"detail": "Review template generation failed", "retry_after": RETRY_AFTER_SECONDS})
+        return
+    yield _sse("done", {"template": "".join(template)})
+
+@router.post(
+    "/review-template",
+    response_model=schemas.AiReviewTemplateResponse,
+    responses={200: {"content": {"text/event-stream": {}}}, 503: {"description": "Generation saturated or timed out"}},
+)
+async def create_review_template(
+    request_data: schemas.AiReviewTemplateRequest,
+    request: Request,
+    db: DBSession,
+    current_user: CurrentUser,
+    service: TemplateService,
+):
+    """
+    Generates a review template for a book, optionally building on the user's notes.
+
+    Send `Accept: text/event-stream` to receive the template as server-sent events
+    while it is generated; otherwise the complete template is returned as JSON.
+    Templates are not saved until the user submits their review.
+
+    Raises:
+        HTTPException(404): If the book does not exist.
+        HTTPException(503): If generation is saturated or timed out (see Retry-After).
+    """
+    book = await load_book_context(db, request_data.book_id)
+    # Generation can take seconds; don't hold a pooled connection meanwhile
+    await db.close()
+
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            _event_stream(service.stream(book, request_data.notes)),
+            media_type="text/event-stream",
+            # Keep proxies from buffering the stream
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    try:
+        template = await service.generate(book, request_data.notes)
+    except GenerationUnavailable as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    return schemas.AiReviewTemplateResponse(template=template)
@@ -1,42 +1,32 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas import RegisterRequest, AuthResponse, LoginRequest  # add missing import for login
-from app.models import User
-from app.dependencies import get_db
+from app.dependencies import get_async_db
 from app.services import auth_service
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/register", response_model=AuthResponse, status_code=201)
-def register(
+async def register(
     data: RegisterRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Register a new user. Returns user id, email, and JWT token.
     """
     # Check if email already exists
-    if db.query(User).filter(User.email == data.email).first():
+    if await auth_service.get_user_by_email_async(db, data.email):
         raise HTTPException(status_code=409, detail="Email already exists")
-    # Hash the password
-    password_hash = auth_service.hash_password(data.password)
-    # Create the user
-    user = User(email=data.email, username=data.email, password_hash=password_hash)
-    db.add(user)
-    try:
-        db.commit()
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail="Database error during registration")
-    db.refresh(user)
+    # Hash the password (on the dedicated hashing pool) and create the user
+    user = await auth_service.create_user_async(db, data.email, data.password)
     # Generate JWT
     token = auth_service.create_access_token(user)
     return AuthResponse(id=user.id, email=user.email, token=token)
 
 @router.post("/login", response_model=AuthResponse)
-def login(
+async def login(
     data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> AuthResponse:
     """Authenticate existing user and return JWT token"""
-    return auth_service.authenticate(data, db)
+    return await auth_service.authenticate_async(data, db)
@@ -0,0 +1,81 @@
+# Router for the shared books catalog
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated, List
+
+from .. import schemas, dependencies
+from ..pagination import CountMode
+from ..serialization import JSONBytesResponse
+from ..services import books_service
+from ..services.principal_cache import Principal
+
+router = APIRouter(
+    prefix="/books",
+    tags=["books"],
+)
+
+DBSession = Annotated[AsyncSession, Depends(dependencies.get_async_db)]
+CurrentUser = Annotated[Principal, Depends(dependencies.get_current_user_async)]
+
+@router.get("", response_model=schemas.BookListResponse)
+async def list_books(
+    db: DBSession,
+    search: Annotated[str | None, Query(max_length=200)] = None,
+    author: Annotated[str | None, Query(max_length=255)] = None,
+    genre: Annotated[str | None, Query(max_length=100)] = None,
+    sort: books_service.BookSort | None = None,
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    count: CountMode = "none",
+):
+    """
+    Lists books from the catalog, one keyset page at a time.
+
+    `search` is ranked full-text search over title, author and description,
+    `author` tolerates typos, and `genre` filters by genre name or alias
+    ("sci-fi" finds Science Fiction).
+    Pass the returned `next_cursor` as `cursor` to get the next page.
+    """
+    page = await books_service.search_books(
+        db, search=search, author=author, genre=genre, sort=sort, cursor=cursor, limit=limit, count=count
+    )
+    return JSONBytesResponse(page)
+
+@router.post(
+    "",
+    response_model=schemas.BookResponse,
+    status_code=201,
+    responses={
+        200: {"model": schemas.BookResponse, "description": "A duplicate already in the catalog (on_duplicate=merge)"},
+        409: {"model": schemas.BookDuplicateResponse, "description": "A duplicate is already in the catalog"},
+    },
+)
+async def create_book(
+    book: schemas.BookCreateRequest,
+    db: DBSession,
+    current_user: CurrentUser,
+    on_duplicate: books_service.DuplicatePolicy = "reject",
+):
+    """
+    Adds a book to the shared catalog.
+
+    If the catalog already has the book under a slightly different title or
+    author ("Hobbit, The", other casing), nothing is created: by default the
+    answer is 409 with the existing book in `duplicate_of`, so the client can
+    use its id; `on_duplicate=merge` returns the existing book with 200 instead,
+    and `on_duplicate=create` adds the book regardless.
+    """
+    result = await books_service.create_book(db, book, on_duplicate)
+    if result.created:
+        return JSONBytesResponse(result.book, status_code=201)
+    if on_duplicate == "merge":
+        return JSONBytesResponse(result.book)
+    return JSONBytesResponse(
+        {"detail": "The catalog already has this book", "duplicate_of": result.book, "similarity": result.similarity},
+        status_code=409,
+    )
+
+@router.get("/genres", response_model=List[schemas.GenreResponse])
+async def list_genres(db: DBSession):
+    """Lists the canonical genres that books are filed under."""
+    return JSONBytesResponse(await books_service.list_genres(db))
@@ -0,0 +1,31 @@
+# Router for polling background jobs of the current user
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated
+from uuid import UUID
+
+from .. import schemas, dependencies
+from ..services import job_queue
+from ..services.principal_cache import Principal
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+)
+
+DBSession = Annotated[AsyncSession, Depends(dependencies.get_async_db)]
+CurrentUser = Annotated[Principal, Depends(dependencies.get_current_user_async)]
+
+@router.get("/{job_id}", response_model=schemas.JobResponse)
+async def get_job(job_id: UUID, db: DBSession, current_user: CurrentUser):
+    """
+    Returns the status of one of the current user's background jobs
+    (queued, running, succeeded or failed) and its result once finished.
+
+    Raises:
+        HTTPException(404): If the job does not exist or belongs to another user.
+    """
+    job = await job_queue.get_job(db, current_user.id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -0,0 +1,112 @@
+# Router for the current user's library and the reviews attached to it
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated
+from uuid import UUID
+
+from .. import schemas, dependencies
+from ..conditional import ConditionalRequest, conditional_request, etag_headers
+from ..pagination import CountMode
+from ..serialization import JSONBytesResponse
+from ..services import library_export, library_service, review_service
+from ..services.principal_cache import Principal
+
+router = APIRouter(
+    prefix="/users/me/library",
+    tags=["library"],
+)
+
+DBSession = Annotated[AsyncSession, Depends(dependencies.get_async_db)]
+CurrentUser = Annotated[Principal, Depends(dependencies.get_current_user_async)]
+Conditional = Annotated[ConditionalRequest, Depends(conditional_request)]
+
+@router.get("", response_model=schemas.LibraryEntryListResponse, responses={304: {"description": "Not modified"}})
+async def list_library_entries(
+    db: DBSession,
+    current_user: CurrentUser,
+    conditional: Conditional,
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    count: CountMode = "none",
+):
+    """
+    Lists the library entries of the current user, newest first.
+    Pass the returned `next_cursor` as `cursor` to get the next page.
+    Send the returned ETag back in If-None-Match to get a bodiless 304 while
+    the library is unchanged.
+    """
+    # Versioned before the page is read, so a concurrent change can only make the ETag stale, never the body
+    etag = await library_service.library_etag(db, current_user.id)
+    not_modified = conditional.not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+    page = await library_service.list_library_entries(db, current_user.id, cursor=cursor, limit=limit, count=count)
+    return JSONBytesResponse(page, headers=etag_headers(etag))
+
+@router.post("/batch", response_model=schemas.LibraryBatchResponse)
+async def add_library_entries(batch: schemas.LibraryBatchRequest, db: DBSession, current_user: CurrentUser):
+    """
+    Adds up to 500 books to the current user's library in one request and one transaction.
+
+    Returns a result per item, in request order: `created`, `duplicate` (already
+    in the library, or repeated in the request) or `invalid_book`. Items are
+    independent: a duplicate or unknown book does not fail the others.
+    """
+    return await library_service.add_library_entries(db, current_user.id, [item.book_id for item in batch.items])
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {media_type: {} for media_type in library_export.MEDIA_TYPES.values()}}},
+)
+async def export_library(
+    db: DBSession,
+    current_user: CurrentUser,
+    format: library_export.ExportFormat = "ndjson",
+):
+    """
+    Downloads the current user's whole library, with each book and review, newest first.
+
+    `format=ndjson` gives one JSON object per line, `format=csv` a CSV file with a
+    header row. The body is streamed as it is read from the database, so
+    libraries of any size export in constant memory.
+    """
+    # The export reads through its own session; don't hold the request's connection meanwhile
+    await db.close()
+    return StreamingResponse(
+        library_export.stream_library_export(current_user.id, format),
+        media_type=library_export.MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="library.{format}"',
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+@router.put("/{entry_id}/review", response_model=schemas.ReviewResponse)
+async def put_review(
+    entry_id: UUID,
+    review_data: schemas.ReviewRequest,
+    db: DBSession,
+    current_user: CurrentUser,
+    conditional: Conditional,
+    response: Response,
+):
+    """
+    Sets or updates the review of a book in the current user's library.
+
+    Send the review's ETag in If-Match to update it only if nobody changed it
+    since you read it (`If-Match: *` requires an existing review).
+
+    Raises:
+        HTTPException(404): If the library entry does not exist or belongs to another user.
+        HTTPException(412): If If-Match does not match the current review.
+    """
+    if conditional.if_match is not None:
+        conditional.check_if_match(await review_service.lock_review_etag(db, current_user.id, entry_id))
+    review = await review_service.upsert_review(db, current_user.id, entry_id, review_data)
+    if review is None:
+        raise HTTPException(status_code=404, detail="Library entry not found")
+    response.headers.update(etag_headers(review_service.review_etag(review)))
+    return review
@@ -1,11 +1,13 @@
 # Router for user preferences endpoints
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated # Using Annotated for better dependency readability
 
 # Assumption: schemas, models, dependencies, and services modules exist in their respective locations
 from .. import schemas, models, dependencies
+from ..conditional import ConditionalRequest, conditional_request, etag_headers
 from ..services import preferences_service
+from ..services.principal_cache import Principal
 
 # Create a router instance
 # The /users prefix is used to group user-related endpoints
@@ -16,34 +18,53 @@ router = APIRouter(
 )
 
 # Type definitions for injected dependencies, using Annotated for readability
-# DBSession will provide the SQLAlchemy database session
-DBSession = Annotated[Session, Depends(dependencies.get_db)]
-# CurrentUser will provide the SQLAlchemy model of the logged-in user (after JWT verification)
-CurrentUser = Annotated[models.User, Depends(dependencies.get_current_user)]
+# DBSession will provide the async SQLAlchemy database session,
+# so queries are awaited instead of blocking the event loop
+DBSession = Annotated[AsyncSession, Depends(dependencies.get_async_db)]
+# CurrentUser will provide the logged-in user as a cached Principal (after JWT verification)
+CurrentUser = Annotated[Principal, Depends(dependencies.get_current_user_async)]
+# ReadOnlyUser may skip the users lookup entirely by trusting the signed token claims
+ReadOnlyUser = Annotated[Principal, Depends(dependencies.get_current_user_readonly)]
+# Conditional exposes the If-None-Match / If-Match headers of the request
+Conditional = Annotated[ConditionalRequest, Depends(conditional_request)]
 
-@router.get("/me/preferences", response_model=schemas.PreferenceResponse)
+@router.get("/me/preferences", response_model=schemas.PreferenceResponse, responses={304: {"description": "Not modified"}})
 async def read_user_preferences(
     # Dependency injection: database session
     db: DBSession,
     # Dependency injection: currently logged-in user
-    current_user: CurrentUser,
+    current_user: ReadOnlyUser,
+    # Dependency injection: If-None-Match header, for cheap polling
+    conditional: Conditional,
+    # Response whose headers carry the ETag
+    response: Response,
 ):
     """
     Retrieves the preferences for the currently authenticated user.
 
+    Send the returned ETag back in If-None-Match to get a bodiless 304 while
+    the preferences are unchanged.
+
     Raises:
         HTTPException(404): If the user preferences are not found.
     """
     # Call the service function to get user preferences
-    preferences = preferences_service.get_user_preferences(db, current_user.id)
+    preferences = await preferences_service.get_user_preferences_async(db, current_user.id)
 
     # Check if preferences were found
     if preferences is None:
         # If not found, raise an HTTP 404 Not Found exception
         raise HTTPException(status_code=404, detail="User preferences not found")
 
+    # Unchanged since the client's copy: answer 304 before serializing anything
+    etag = preferences_service.preferences_etag(preferences)
+    not_modified = conditional.not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
     # If found, return the preferences object
     # FastAPI will automatically convert the SQLAlchemy model to the Pydantic model (PreferenceResponse)
+    response.headers.update(etag_headers(etag))
     return preferences
 
 @router.put("/me/preferences", response_model=schemas.PreferenceResponse)
@@ -55,23 +76,35 @@ async def update_user_preferences(
     db: DBSession,
     # Dependency injection: currently logged-in user
     current_user: CurrentUser,
+    # Dependency injection: If-Match header, for lost-update protection
+    conditional: Conditional,
+    # Response whose headers carry the new ETag
+    response: Response,
 ):
     """
     Sets or updates the preferences for the currently authenticated user.
 
     The request body must contain `preferences_text` which cannot be empty.
+    Send the ETag of the preferences you edited in If-Match to update them only
+    if nobody changed them since (`If-Match: *` requires existing preferences).
 
     Raises:
+        HTTPException(412): If If-Match does not match the current preferences.
         HTTPException(500): If an internal server error occurs during the update.
     """
+    # Check the precondition under a row lock, so no other write can slip in before ours
+    if conditional.if_match is not None:
+        current_etag = await preferences_service.lock_user_preferences_etag_async(db, current_user.id)
+        conditional.check_if_match(current_etag)
+
     # try...except block to handle potential errors during database operations
     try:
         # Call the service function to create or update preferences
-        updated_preferences = preferences_service.upsert_user_preferences(
+        updated_preferences = await preferences_service.upsert_user_preferences_async(
             db=db, user_id=current_user.id, preferences_data=preferences_data
         )
-        # Return the updated/created preferences
-        # FastAPI will automatically convert the SQLAlchemy model to the Pydantic model (PreferenceResponse)
+        # Return the updated/created preferences (already a PreferenceResponse) with their new ETag
+        response.headers.update(etag_headers(preferences_service.preferences_etag(updated_preferences)))
         return updated_preferences
     except Exception as e:
         # In case of any exception during the service operation:
@@ -0,0 +1,83 @@
+# Router for the current user's recommendations and their ratings
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated
+from uuid import UUID
+
+from .. import schemas, dependencies
+from ..conditional import ConditionalRequest, conditional_request, etag_headers
+from ..pagination import CountMode
+from ..serialization import JSONBytesResponse
+from ..services import job_queue, recommendation_service, rating_service
+from ..services.principal_cache import Principal
+
+router = APIRouter(
+    prefix="/users/me/recommendations",
+    tags=["recommendations"],
+)
+
+DBSession = Annotated[AsyncSession, Depends(dependencies.get_async_db)]
+CurrentUser = Annotated[Principal, Depends(dependencies.get_current_user_async)]
+Conditional = Annotated[ConditionalRequest, Depends(conditional_request)]
+
+@router.get("", response_model=schemas.RecommendationListResponse, responses={304: {"description": "Not modified"}})
+async def list_recommendations(
+    db: DBSession,
+    current_user: CurrentUser,
+    conditional: Conditional,
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    count: CountMode = "none",
+):
+    """
+    Lists the recommendations of the current user, newest first.
+    Pass the returned `next_cursor` as `cursor` to get the next page.
+    Send the returned ETag back in If-None-Match to get a bodiless 304 while
+    the list is unchanged.
+    """
+    # Versioned before the page is read, so a concurrent change can only make the ETag stale, never the body
+    etag = await recommendation_service.recommendations_etag(db, current_user.id)
+    not_modified = conditional.not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+    page = await recommendation_service.list_recommendations(db, current_user.id, cursor=cursor, limit=limit, count=count)
+    return JSONBytesResponse(page, headers=etag_headers(etag))
+
+@router.post("/refresh", response_model=schemas.JobResponse, status_code=202)
+async def refresh_recommendations(db: DBSession, current_user: CurrentUser):
+    """
+    Queues a background refresh of the current user's recommendations.
+
+    Returns the job to poll with GET /jobs/{id}. Repeated calls while a refresh
+    is queued or running return that same job.
+    """
+    return await job_queue.enqueue(db, current_user.id, job_queue.REFRESH_RECOMMENDATIONS)
+
+@router.post("/ratings/batch", response_model=schemas.RatingBatchResponse)
+async def put_ratings(batch: schemas.RatingBatchRequest, db: DBSession, current_user: CurrentUser):
+    """
+    Sets or updates up to 500 ratings of the current user's recommendations in one transaction.
+
+    Returns a result per item, in request order: `created`, `updated` or
+    `invalid_recommendation` (unknown, or not the current user's). Items are
+    independent: an invalid one does not fail the others.
+    """
+    return await rating_service.upsert_ratings(db, current_user.id, batch.items)
+
+@router.put("/{recommendation_id}/rating", response_model=schemas.RatingResponse)
+async def put_rating(
+    recommendation_id: UUID,
+    rating_data: schemas.RatingRequest,
+    db: DBSession,
+    current_user: CurrentUser,
+):
+    """
+    Sets or updates the current user's rating of a recommendation.
+
+    Raises:
+        HTTPException(404): If the recommendation does not exist or belongs to another user.
+    """
+    rating = await rating_service.upsert_rating(db, current_user.id, recommendation_id, rating_data)
+    if rating is None:
+        raise HTTPException(status_code=404, detail="Recommendation not found")
+    return rating
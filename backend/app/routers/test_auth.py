@@ -1,35 +1,29 @@
+import uuid
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine, text  # Added text import for raw SQL execution
-from sqlalchemy.orm import sessionmaker
+from passlib.context import CryptContext
+
+from app import models
 from app.main import app
-from app.models import Base, engine, SessionLocal
-from app.dependencies import get_db
-import uuid
+from app.services import auth_service, password_cost
+from app.services.principal_cache import principal_cache
+
+# The suite runs against a throwaway database (see conftest.py); unique emails
+# keep the tests independent of each other and of earlier runs
 
-# Use a test database (in-memory or a dedicated test DB)
-# For demonstration, we'll use the same engine, but in real projects use a separate DB!
 
 @pytest.fixture(scope="module")
 def test_client():
-    # Create tables
-    Base.metadata.create_all(bind=engine)
-    client = TestClient(app)
-    yield client
-    # Drop tables after tests
-    Base.metadata.drop_all(bind=engine)
-
-@pytest.fixture(autouse=True)
-def clear_users():
-    # Clean up users table before each test
-    db = SessionLocal()
-    db.execute(text("DELETE FROM shelfsense.users"))  # Use text() for raw SQL
-    db.commit()
-    db.close()
+    yield TestClient(app)
+
+
+def unique_email(name: str) -> str:
+    return f"{name}-{uuid.uuid4().hex[:12]}@example.com"
 
 
 def test_register_success(test_client):
-    payload = {"email": "testuser@example.com", "password": "Password123"}
+    payload = {"email": unique_email("testuser"), "password": "Password123"}
     response = test_client.post("/auth/register", json=payload)
     assert response.status_code == 201
     data = response.json()
@@ -39,7 +33,7 @@ def test_register_success(test_client):
 
 
 def test_register_duplicate_email(test_client):
-    payload = {"email": "dupe@example.com", "password": "Password123"}
+    payload = {"email": unique_email("dupe"), "password": "Password123"}
     # First registration
     response1 = test_client.post("/auth/register", json=payload)
     assert response1.status_code == 201
@@ -50,11 +44,11 @@ def test_register_duplicate_email(test_client):
 
 
 def test_register_invalid_password(test_client):
-    payload = {"email": "badpass@example.com", "password": "short"}
+    payload = {"email": unique_email("badpass"), "password": "short"}
     response = test_client.post("/auth/register", json=payload)
     assert response.status_code == 422  # Pydantic validation error
 
-    payload2 = {"email": "badpass2@example.com", "password": "allletters"}
+    payload2 = {"email": unique_email("badpass2"), "password": "allletters"}
     response2 = test_client.post("/auth/register", json=payload2)
     assert response2.status_code == 422 or response2.status_code == 400
     # Should mention password complexity
@@ -70,7 +64,7 @@ def test_register_invalid_email(test_client):
 
 def test_register_then_login(test_client):
     # Register a new user
-    register_payload = {"email": "flowuser@example.com", "password": "FlowPassword1"}
+    register_payload = {"email": unique_email("flowuser"), "password": "FlowPassword1"}
     reg_resp = test_client.post("/auth/register", json=register_payload)
     assert reg_resp.status_code == 201
     reg_data = reg_resp.json()
@@ -90,7 +84,7 @@ def test_register_then_login(test_client):
 
 def test_login_invalid_credentials(test_client):
     # Attempt login without registering
-    bad_login = {"email": "nouser@example.com", "password": "NoUserPass1"}
+    bad_login = {"email": unique_email("nouser"), "password": "NoUserPass1"}
     resp = test_client.post("/auth/login", json=bad_login)
     assert resp.status_code == 401
     # Should indicate invalid credentials
@@ -99,7 +93,7 @@ def test_login_invalid_credentials(test_client):
 
 def test_register_login_and_add_preferences(test_client):
     # Register a new user
-    register_payload = {"email": "prefuser@example.com", "password": "PrefPass123"}
+    register_payload = {"email": unique_email("prefuser"), "password": "PrefPass123"}
     reg_resp = test_client.post("/auth/register", json=register_payload)
     assert reg_resp.status_code == 201
     # Login to get JWT token
@@ -128,3 +122,114 @@ def test_register_login_and_add_preferences(test_client):
     assert get_resp.status_code == 200
     get_data = get_resp.json()
     assert get_data == prefs_data
+
+
+def test_login_rehashes_a_hash_made_at_another_cost(test_client):
+    email = unique_email("rehash")
+    legacy_hash = CryptContext(schemes=["bcrypt"]).hash("Password123", rounds=4)
+    with models.SessionLocal() as db:
+        db.add(models.User(email=email, username=email, password_hash=legacy_hash))
+        db.commit()
+
+    response = test_client.post("/auth/login", json={"email": email, "password": "Password123"})
+    assert response.status_code == 200
+
+    with models.SessionLocal() as db:
+        stored = auth_service.get_user_by_email(db, email).password_hash
+    assert password_cost.hash_rounds(stored) == auth_service.BCRYPT_ROUNDS
+    assert auth_service.verify_password("Password123", stored)
+    # The upgraded hash keeps working and is not rewritten again
+    assert test_client.post("/auth/login", json={"email": email, "password": "Password123"}).status_code == 200
+    with models.SessionLocal() as db:
+        assert auth_service.get_user_by_email(db, email).password_hash == stored
+
+
+def _register(test_client, name: str) -> tuple[dict, dict]:
+    payload = {"email": unique_email(name), "password": "Password123"}
+    response = test_client.post("/auth/register", json=payload)
+    assert response.status_code == 201
+    return payload, {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+def test_change_password(test_client):
+    payload, headers = _register(test_client, "newpass")
+    wrong = test_client.put("/users/me/password", headers=headers, json={"old_password": "Wrong1234", "new_password": "NewPassword1"})
+    assert wrong.status_code == 400
+
+    response = test_client.put("/users/me/password", headers=headers, json={"old_password": payload["password"], "new_password": "NewPassword1"})
+    assert response.status_code == 200
+    assert test_client.post("/auth/login", json=payload).status_code == 401
+    assert test_client.post("/auth/login", json={**payload, "password": "NewPassword1"}).status_code == 200
+
+
+def test_password_change_and_deletion_invalidate_the_cached_principal(test_client):
+    payload, headers = _register(test_client, "principal")
+    user_id = uuid.UUID(test_client.post("/auth/login", json=payload).json()["id"])
+    # An authenticated request caches the principal
+    assert test_client.get("/users/me/stats", headers=headers).status_code == 200
+    assert principal_cache.get(user_id) is not None
+
+    test_client.put("/users/me/password", headers=headers, json={"old_password": payload["password"], "new_password": "NewPassword1"})
+    assert principal_cache.get(user_id) is None
+
+    assert test_client.get("/users/me/stats", headers=headers).status_code == 200
+    assert test_client.delete("/users/me", headers=headers).status_code == 204
+    assert principal_cache.get(user_id) is None
+    # The token outlives the account but no longer authenticates
+    assert test_client.get("/users/me/stats", headers=headers).status_code == 401
+
+
+def test_delete_account_removes_dependent_rows(test_client):
+    payload, headers = _register(test_client, "delete")
+    user_id = uuid.UUID(test_client.post("/auth/login", json=payload).json()["id"])
+    assert test_client.put("/users/me/preferences", headers=headers, json={"preferences_text": "space opera"}).status_code == 200
+    with models.SessionLocal() as db:
+        book = models.Book(title="Deleted reader's book", author="Author")
+        db.add(book)
+        db.flush()
+        book_id = book.id
+        entry = models.UserLibraryEntry(user_id=user_id, book_id=book_id)
+        recommendation = models.Recommendation(user_id=user_id, recommended_book_id=book_id)
+        db.add_all([entry, recommendation])
+        db.flush()
+        db.add_all([
+            models.Review(user_library_entry_id=entry.id, review_text="Gone soon"),
+            models.RecommendationRating(recommendation_id=recommendation.id, user_id=user_id, rating=4),
+        ])
+        db.commit()
+
+    assert test_client.delete("/users/me", headers=headers).status_code == 204
+
+    with models.SessionLocal() as db:
+        assert db.get(models.User, user_id) is None
+        for model in (models.UserPreference, models.UserLibraryEntry, models.Recommendation, models.RecommendationRating):
+            assert db.query(model).filter(model.user_id == user_id).count() == 0
+        assert db.get(models.Book, book_id) is not None
+        db.query(models.Book).filter(models.Book.id == book_id).delete()
+        db.commit()
+    assert test_client.post("/auth/login", json=payload).status_code == 401
+
+
+def test_no_connection_is_held_while_bcrypt_runs(test_client, monkeypatch):
+    # Connections checked out of the async pool whenever bcrypt starts
+    checked_out = []
+    pool = models.async_engine.sync_engine.pool
+
+    def recording(func):
+        async def wrapper(*args):
+            checked_out.append(pool.checkedout())
+            return await func(*args)
+        return wrapper
+
+    monkeypatch.setattr(auth_service, "hash_password_async", recording(auth_service.hash_password_async))
+    monkeypatch.setattr(auth_service, "verify_password_async", recording(auth_service.verify_password_async))
+    monkeypatch.setattr(auth_service.pwd_context, "needs_update", lambda password_hash: True)
+
+    payload, headers = _register(test_client, "pool")
+    # Login verifies, then rehashes (needs_update is forced)
+    assert test_client.post("/auth/login", json=payload).status_code == 200
+    assert test_client.put(
+        "/users/me/password", headers=headers, json={"old_password": payload["password"], "new_password": "NewPassword1"}
+    ).status_code == 200
+    assert test_client.post("/auth/login", json={**payload, "password": "NewPassword1"}).status_code == 200
+    assert len(checked_out) == 7 and not any(checked_out)
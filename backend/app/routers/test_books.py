@@ -0,0 +1,126 @@
+import base64
+import json
+import random
+import string
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import models
+from app.main import app
+from app.models import SessionLocal
+
+
+def test_blank_search_and_author_are_ignored():
+    with TestClient(app) as client:
+        unfiltered = client.get("/books").json()
+        for params in ({"search": "   "}, {"author": " "}, {"search": "", "author": "\t"}):
+            response = client.get("/books", params=params)
+            assert response.status_code == 200
+            assert response.json() == unfiltered
+        # Without search terms there is nothing to rank by
+        assert client.get("/books", params={"search": "  ", "sort": "relevance"}).status_code == 400
+
+
+def test_crafted_cursor_is_a_bad_request():
+    cursor = base64.urlsafe_b64encode(json.dumps(["created_at", ["2024-01-01T00:00:00", 123]]).encode()).decode()
+    with TestClient(app) as client:
+        response = client.get("/books", params={"sort": "created_at", "cursor": cursor})
+    assert response.status_code == 400
+
+
+# Both dialects run the same endpoint: Postgres with tsvector ranking and
+# pg_trgm, everything else with the ILIKE fallback
+postgres_only = pytest.mark.skipif(
+    models.engine.dialect.name != "postgresql", reason="Full-text ranking needs Postgres (set TEST_DATABASE_URL)"
+)
+fallback_only = pytest.mark.skipif(models.engine.dialect.name == "postgresql", reason="Tests the non-Postgres fallback")
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    """A few books sharing a made-up marker word, so searches can be scoped to them."""
+    marker = "zq" + "".join(random.choices(string.ascii_lowercase, k=10))
+    books = {
+        "title": models.Book(title=f"Dragon Harbor {marker}", author="Ursula Vance", description="A voyage by sea"),
+        "author": models.Book(title=f"Quiet Shore {marker}", author="Dragon Keller", description="No harbor here"),
+        "description": models.Book(title=f"Field Notes {marker}", author="Mara Ellis", description="Mentions a dragon once"),
+        "exact": models.Book(title=f"Letters {marker}", author=f"Ann Ostrow {marker}"),
+        "partial": models.Book(title=f"Postcards {marker}", author=f"Ann Ostrow {marker} Jr"),
+        "plain": models.Book(title=f"Top 100 Reads {marker}", author="Lee Fox"),
+        "percent": models.Book(title=f"Top 100% Reads {marker}", author="Lee Fox"),
+    }
+    with SessionLocal() as db:
+        db.add_all(books.values())
+        db.commit()
+        titles = {name: book.title for name, book in books.items()}
+    yield marker, titles
+    with SessionLocal() as db:
+        db.query(models.Book).filter(models.Book.title.in_(list(titles.values()))).delete(synchronize_session=False)
+        db.commit()
+
+
+def _titles(client: TestClient, **params) -> list[str]:
+    response = client.get("/books", params=params)
+    assert response.status_code == 200, response.text
+    return [book["title"] for book in response.json()["items"]]
+
+
+@fallback_only
+def test_fallback_search_ranks_title_over_author_over_description(catalog):
+    marker, titles = catalog
+    with TestClient(app) as client:
+        expected = [titles["title"], titles["author"], titles["description"]]
+        assert _titles(client, search=f"DRAGON {marker}") == expected
+        # Every word must appear, in any of the three columns
+        assert _titles(client, search=f"dragon harbor {marker}") == [titles["title"], titles["author"]]
+        assert _titles(client, search=f"dragon {marker}", sort="title") == sorted(expected)
+
+        # The relevance cursor walks the same order one page at a time
+        walked, cursor = [], None
+        while True:
+            page = client.get("/books", params={"search": f"dragon {marker}", "limit": 1, **({"cursor": cursor} if cursor else {})}).json()
+            walked += [book["title"] for book in page["items"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert walked == expected
+
+
+@fallback_only
+def test_fallback_author_filter_prefers_exact_names(catalog):
+    marker, titles = catalog
+    with TestClient(app) as client:
+        assert _titles(client, author=f"ann ostrow {marker}") == [titles["exact"], titles["partial"]]
+        assert _titles(client, author="KELLER", search=marker) == [titles["author"]]
+
+
+def test_search_and_author_match_wildcards_literally(catalog):
+    marker, titles = catalog
+    with TestClient(app) as client:
+        assert _titles(client, search=marker, author="%") == []
+        assert _titles(client, search=marker, author="_") == []
+        if models.engine.dialect.name != "postgresql":
+            assert _titles(client, search=f"100% {marker}") == [titles["percent"]]
+
+
+@postgres_only
+def test_full_text_search_is_ranked_by_field_weight(catalog):
+    marker, titles = catalog
+    with TestClient(app) as client:
+        assert _titles(client, search=f"dragon {marker}") == [titles["title"], titles["author"], titles["description"]]
+        # Web search syntax: phrases and exclusions
+        assert _titles(client, search=f'"dragon harbor" {marker}') == [titles["title"]]
+        assert _titles(client, search=f"dragon -harbor {marker}") == [titles["description"]]
+        # Stemming: "dragons" finds "dragon"
+        assert titles["title"] in _titles(client, search=f"dragons {marker}")
+
+
+@postgres_only
+def test_author_filter_tolerates_typos(catalog):
+    marker, titles = catalog
+    with TestClient(app) as client:
+        assert _titles(client, author="Ursla Vance", search=marker) == [titles["title"]]
+        assert _titles(client, author="Vance", search=marker) == [titles["title"]]
+        # Without a search, the closest spelling comes first
+        assert _titles(client, author=f"Ann Ostrow {marker}")[:1] == [titles["exact"]]
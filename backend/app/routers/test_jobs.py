@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from app import models
+from app.main import app
+from app.models import SessionLocal
+from app.services import auth_service, job_queue
+
+
+@pytest.fixture(scope="module")
+def test_client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def user_tokens():
+    # Two users, so ownership checks can be exercised
+    db = SessionLocal()
+    users = [
+        models.User(email=f"jobs-{uuid.uuid4().hex}@example.com", username="jobs", password_hash="x" * 60)
+        for _ in range(2)
+    ]
+    db.add_all(users)
+    db.commit()
+    tokens = [auth_service.create_access_token(user) for user in users]
+    user_ids = [user.id for user in users]
+    db.close()
+    yield tokens
+    db = SessionLocal()
+    db.query(models.User).filter(models.User.id.in_(user_ids)).delete()
+    db.commit()
+    db.close()
+
+
+def test_refresh_returns_a_pollable_job(test_client, user_tokens):
+    headers = {"Authorization": f"Bearer {user_tokens[0]}"}
+    response = test_client.post("/users/me/recommendations/refresh", headers=headers)
+    assert response.status_code == 202
+    job = response.json()
+    assert job["kind"] == "refresh_recommendations"
+
+    polled = test_client.get(f"/jobs/{job['id']}", headers=headers)
+    assert polled.status_code == 200
+    assert polled.json()["status"] in ("queued", "running", "succeeded")
+
+
+def test_duplicate_refresh_clicks_coalesce(test_client, user_tokens, monkeypatch):
+    # The job cannot finish before the second click: its handler waits for the test
+    release = threading.Event()
+    monkeypatch.setitem(job_queue.JOB_HANDLERS, job_queue.REFRESH_RECOMMENDATIONS, lambda user_id: release.wait(10) and {})
+    headers = {"Authorization": f"Bearer {user_tokens[0]}"}
+    try:
+        first = test_client.post("/users/me/recommendations/refresh", headers=headers).json()
+        second = test_client.post("/users/me/recommendations/refresh", headers=headers).json()
+    finally:
+        release.set()
+    assert second["status"] in ("queued", "running")
+    assert first["id"] == second["id"]
+
+
+def test_runner_requeues_jobs_orphaned_while_it_runs(user_tokens):
+    job_id = uuid.uuid4()
+    user_id = uuid.UUID(jwt.get_unverified_claims(user_tokens[0])["sub"])
+
+    async def scenario():
+        runner = job_queue.JobRunner(poll_seconds=0.05, requeue_seconds=0.1)
+        # Nothing for the startup requeue to find; the job is orphaned only afterwards
+        runner.start()
+        await asyncio.sleep(0.2)
+        with SessionLocal() as db:
+            orphaned_at = datetime.now(timezone.utc) - timedelta(seconds=job_queue.JOB_STALE_SECONDS + 60)
+            db.add(models.Job(
+                id=job_id, kind="unknown_kind", user_id=user_id, status="running", attempts=1, started_at=orphaned_at
+            ))
+            db.commit()
+        try:
+            for _ in range(50):
+                await asyncio.sleep(0.1)
+                with SessionLocal() as db:
+                    job = db.get(models.Job, job_id)
+                    if job.attempts > 1:
+                        return job
+        finally:
+            await runner.stop()
+
+    job = asyncio.run(scenario())
+    # Requeued and picked up again (the unknown kind then fails it) without a restart
+    assert job is not None and job.attempts == 2
+
+
+def test_jobs_of_other_users_are_hidden(test_client, user_tokens):
+    owner = {"Authorization": f"Bearer {user_tokens[0]}"}
+    other = {"Authorization": f"Bearer {user_tokens[1]}"}
+    job = test_client.post("/users/me/recommendations/refresh", headers=owner).json()
+    assert test_client.get(f"/jobs/{job['id']}", headers=other).status_code == 404
@@ -0,0 +1,206 @@
+import asyncio
+import csv
+import io
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from app import models
+from app.main import app
+from app.models import SessionLocal, async_engine
+from app.services import auth_service
+from app.testing import assert_max_queries
+
+# Principal lookup + ETag (version) query + one page query; must not grow with the page size
+LIST_QUERY_BUDGET = 3
+ITEMS = 100
+
+
+@pytest.fixture(scope="module")
+def test_client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def seeded_user():
+    # A user with ITEMS library entries and recommendations, each pointing at its own book
+    db = SessionLocal()
+    user = models.User(email=f"lists-{uuid.uuid4().hex}@example.com", username="lists", password_hash="x" * 60)
+    books = [models.Book(title=f"Book {i}", author="Author", isbn=f"LST{i:010d}") for i in range(ITEMS)]
+    db.add(user)
+    db.add_all(books)
+    db.flush()
+    db.add_all(models.UserLibraryEntry(user_id=user.id, book_id=book.id) for book in books)
+    db.add_all(models.Recommendation(user_id=user.id, recommended_book_id=book.id) for book in books)
+    db.commit()
+    user_id, book_ids = user.id, [book.id for book in books]
+    token = auth_service.create_access_token(user)
+    db.close()
+    yield token
+    db = SessionLocal()
+    db.query(models.User).filter(models.User.id == user_id).delete()
+    db.query(models.Book).filter(models.Book.id.in_(book_ids)).delete()
+    db.commit()
+    db.close()
+
+
+def test_library_page_stays_within_query_budget(test_client, seeded_user):
+    headers = {"Authorization": f"Bearer {seeded_user}"}
+    with assert_max_queries(async_engine.sync_engine, LIST_QUERY_BUDGET):
+        response = test_client.get(f"/users/me/library?limit={ITEMS}", headers=headers)
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert len(items) == ITEMS
+    assert all(item["book"]["author"] == "Author" for item in items)
+
+
+def test_recommendations_page_stays_within_query_budget(test_client, seeded_user):
+    headers = {"Authorization": f"Bearer {seeded_user}"}
+    with assert_max_queries(async_engine.sync_engine, LIST_QUERY_BUDGET):
+        response = test_client.get(f"/users/me/recommendations?limit={ITEMS}", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == ITEMS
+
+
+def test_library_cursor_walks_every_entry_once(test_client, seeded_user):
+    headers = {"Authorization": f"Bearer {seeded_user}"}
+    seen, cursor = [], None
+    while True:
+        url = "/users/me/library?limit=30" + (f"&cursor={cursor}" if cursor else "")
+        body = test_client.get(url, headers=headers).json()
+        seen.extend(item["id"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == ITEMS
+    assert len(set(seen)) == ITEMS
+
+
+def test_unchanged_library_answers_304_without_reading_the_page(test_client, seeded_user):
+    headers = {"Authorization": f"Bearer {seeded_user}"}
+    first = test_client.get("/users/me/library", headers=headers)
+    etag = first.headers["etag"]
+    # Principal lookup + ETag query only
+    with assert_max_queries(async_engine.sync_engine, 2):
+        response = test_client.get("/users/me/library", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_preferences_if_match_prevents_lost_updates(test_client, seeded_user):
+    headers = {"Authorization": f"Bearer {seeded_user}"}
+    created = test_client.put("/users/me/preferences", json={"preferences_text": "space opera"}, headers=headers)
+    etag = created.headers["etag"]
+    assert test_client.get("/users/me/preferences", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    updated = test_client.put(
+        "/users/me/preferences", json={"preferences_text": "hard sci-fi"}, headers={**headers, "If-Match": etag}
+    )
+    assert updated.status_code == 200
+    assert updated.headers["etag"] != etag
+    # A second writer still holding the old version is refused
+    stale = test_client.put(
+        "/users/me/preferences", json={"preferences_text": "cozy mystery"}, headers={**headers, "If-Match": etag}
+    )
+    assert stale.status_code == 412
+
+
+def test_export_streams_every_entry_with_its_review(test_client, seeded_user):
+    headers = {"Authorization": f"Bearer {seeded_user}"}
+    entry_id = test_client.get("/users/me/library?limit=1", headers=headers).json()["items"][0]["id"]
+    assert test_client.put(
+        f"/users/me/library/{entry_id}/review", headers=headers, json={"review_text": "Loved it, 5/5"}
+    ).status_code == 200
+
+    response = test_client.get("/users/me/library/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert len(records) == ITEMS
+    assert records[0]["entry_id"] == entry_id and records[0]["review"] == "Loved it, 5/5"
+    assert sum(record["review"] is not None for record in records) == 1
+
+    response = test_client.get("/users/me/library/export?format=csv", headers=headers)
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == ITEMS
+    assert rows[0]["review"] == "Loved it, 5/5" and rows[1]["review"] == ""
+    assert {row["entry_id"] for row in rows} == {record["entry_id"] for record in records}
+
+
+def test_export_reads_in_batches_with_one_query(seeded_user):
+    from app.services.library_export import stream_library_export
+
+    user_id = uuid.UUID(jwt.get_unverified_claims(seeded_user)["sub"])
+
+    async def chunks():
+        return [chunk async for chunk in stream_library_export(user_id, "ndjson", batch_size=30)]
+
+    with assert_max_queries(async_engine.sync_engine, 1):
+        received = asyncio.run(chunks())
+    # One chunk per fetched batch, never the whole library at once
+    assert [chunk.count(b"\n") for chunk in received] == [30, 30, 30, 10]
+
+
+def test_batch_add_reports_each_item_in_one_statement(test_client, seeded_user):
+    headers = {"Authorization": f"Bearer {seeded_user}"}
+    owned = test_client.get("/users/me/library?limit=1", headers=headers).json()["items"][0]
+    db = SessionLocal()
+    new_books = [models.Book(title=f"Batch {i}", author="Author", isbn=f"BAT{uuid.uuid4().hex[:10]}") for i in range(3)]
+    db.add_all(new_books)
+    db.commit()
+    new_ids = [book.id for book in new_books]
+    db.close()
+    unknown = str(uuid.uuid4())
+
+    book_ids = [str(new_ids[0]), owned["book_id"], unknown, str(new_ids[1]), str(new_ids[0]), str(new_ids[2])]
+    # Principal lookup + one INSERT ... SELECT + one lookup of the skipped books
+    # + the added books' genres, the statistics counters and genre histogram
+    with assert_max_queries(async_engine.sync_engine, 6):
+        response = test_client.post(
+            "/users/me/library/batch", headers=headers, json={"items": [{"book_id": book_id} for book_id in book_ids]}
+        )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == [
+        "created", "duplicate", "invalid_book", "created", "duplicate", "created"
+    ]
+    assert results[1]["entry_id"] == owned["id"]
+    assert results[4]["entry_id"] == results[0]["entry_id"]
+    assert results[2]["entry_id"] is None
+
+    # Re-sending the batch is harmless: everything is a duplicate now
+    again = test_client.post("/users/me/library/batch", headers=headers, json={"items": [{"book_id": str(new_ids[0])}]})
+    assert again.json()["results"][0] == {**results[0], "status": "duplicate"}
+
+    db = SessionLocal()
+    db.query(models.UserLibraryEntry).filter(models.UserLibraryEntry.book_id.in_(new_ids)).delete()
+    db.query(models.Book).filter(models.Book.id.in_(new_ids)).delete()
+    db.commit()
+    db.close()
+
+
+def test_batch_ratings_create_update_and_reject(test_client, seeded_user):
+    headers = {"Authorization": f"Bearer {seeded_user}"}
+    first, second = [item["id"] for item in test_client.get("/users/me/recommendations?limit=2", headers=headers).json()["items"]]
+    assert test_client.put(f"/users/me/recommendations/{first}/rating", headers=headers, json={"rating": 2.0}).status_code == 200
+
+    items = [
+        {"recommendation_id": first, "rating": 4.5},
+        {"recommendation_id": second, "rating": 3.0},
+        {"recommendation_id": str(uuid.uuid4()), "rating": 1.0},
+    ]
+    response = test_client.post("/users/me/recommendations/ratings/batch", headers=headers, json={"items": items})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == ["updated", "created", "invalid_recommendation"]
+    assert results[0]["rating"]["rating"] == 4.5 and results[1]["rating"]["rating"] == 3.0
+    assert results[2]["rating"] is None
+
+    repeated = {"items": [items[0], {**items[0], "rating": 1.0}]}
+    assert test_client.post("/users/me/recommendations/ratings/batch", headers=headers, json=repeated).status_code == 422
@@ -0,0 +1,53 @@
+# Router for account-level endpoints of the current user
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated
+
+from .. import schemas, dependencies
+from ..services import auth_service, user_stats
+from ..services.principal_cache import Principal
+
+router = APIRouter(
+    prefix="/users",
+    tags=["users"],
+)
+
+DBSession = Annotated[AsyncSession, Depends(dependencies.get_async_db)]
+CurrentUser = Annotated[Principal, Depends(dependencies.get_current_user_async)]
+
+@router.get("/me/stats", response_model=schemas.UserStatsResponse)
+async def get_stats(db: DBSession, current_user: CurrentUser):
+    """
+    Returns the reading statistics of the current user for their profile:
+    library size, review count, average rating given and a genre histogram.
+
+    They are maintained as the library, reviews and ratings change, so this is
+    a single primary-key lookup.
+    """
+    return await user_stats.get_user_stats(db, current_user.id)
+
+@router.put("/me/password", response_model=schemas.MessageResponse)
+async def update_password(
+    data: schemas.UpdatePasswordRequest,
+    db: DBSession,
+    current_user: CurrentUser,
+):
+    """
+    Changes the password of the currently authenticated user.
+
+    Raises:
+        HTTPException(400): If the old password is incorrect.
+    """
+    await auth_service.change_password_async(db, current_user.id, data)
+    return schemas.MessageResponse(message="Password updated")
+
+@router.delete("/me", status_code=204)
+async def delete_account(
+    db: DBSession,
+    current_user: CurrentUser,
+):
+    """
+    Deletes the currently authenticated user together with all their data.
+    """
+    await auth_service.delete_user_async(db, current_user.id)
+    return Response(status_code=204)
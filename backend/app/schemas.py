@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
+from typing import Literal, Optional, List
 from uuid import UUID
 from datetime import datetime, date
 
@@ -8,7 +8,8 @@ class RegisterRequest(BaseModel):
     email: EmailStr
     password: str = Field(..., min_length=8)
 
-    @validator('password')
+    @field_validator('password')
+    @classmethod
     def password_complexity(cls, v: str) -> str:
         if not any(c.isalpha() for c in v) or not any(c.isdigit() for c in v):
             raise ValueError('Password must contain both letters and numbers')
@@ -23,8 +24,7 @@ class AuthResponse(BaseModel):
     email: EmailStr
     token: str
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # User Schemas
 class UserResponse(BaseModel):
@@ -33,14 +33,14 @@ class UserResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class UpdatePasswordRequest(BaseModel):
     old_password: str
     new_password: str = Field(..., min_length=8)
 
-    @validator('new_password')
+    @field_validator('new_password')
+    @classmethod
     def new_password_complexity(cls, v: str) -> str:
         if not any(c.isalpha() for c in v) or not any(c.isdigit() for c in v):
             raise ValueError('New password must contain both letters and numbers')
@@ -58,8 +58,7 @@ class PreferenceResponse(BaseModel):
     preferences_text: str
     updated_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Pagination Metadata
 class PageMeta(BaseModel):
@@ -67,17 +66,26 @@ class PageMeta(BaseModel):
     page: int
     limit: int
 
+# Keyset pagination metadata shared by the list responses
+# next_cursor is passed back as `?cursor=` to fetch the following page (None on the last page)
+class CursorPage(BaseModel):
+    next_cursor: Optional[str] = None
+    limit: int
+    total: Optional[int] = None
+    total_is_estimate: bool = False
+
 # Book Schemas
 class BookBase(BaseModel):
     title: str
     author: str
-    isbn: Optional[str]
-    genre: Optional[str]
-    description: Optional[str]
-    publication_date: Optional[date]
-    page_count: Optional[int]
-
-    @validator('page_count')
+    isbn: Optional[str] = None
+    genre: Optional[str] = None
+    description: Optional[str] = None
+    publication_date: Optional[date] = None
+    page_count: Optional[int] = None
+
+    @field_validator('page_count')
+    @classmethod
     def non_negative_page_count(cls, v: Optional[int]) -> Optional[int]:
         if v is not None and v < 0:
             raise ValueError('page_count must be non-negative')
@@ -87,15 +95,16 @@ class BookCreateRequest(BookBase):
     pass
 
 class BookUpdateRequest(BaseModel):
-    title: Optional[str]
-    author: Optional[str]
-    isbn: Optional[str]
-    genre: Optional[str]
-    description: Optional[str]
-    publication_date: Optional[date]
-    page_count: Optional[int]
-
-    @validator('page_count')
+    title: Optional[str] = None
+    author: Optional[str] = None
+    isbn: Optional[str] = None
+    genre: Optional[str] = None
+    description: Optional[str] = None
+    publication_date: Optional[date] = None
+    page_count: Optional[int] = None
+
+    @field_validator('page_count')
+    @classmethod
     def non_negative_page_count(cls, v: Optional[int]) -> Optional[int]:
         if v is not None and v < 0:
             raise ValueError('page_count must be non-negative')
@@ -103,17 +112,25 @@ class BookUpdateRequest(BaseModel):
 
 class BookResponse(BookBase):
     id: UUID
+    # Canonical genre (see GET /books/genres); `genre` is its name
+    genre_id: Optional[int] = None
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
-class BookListResponse(BaseModel):
+class BookListResponse(CursorPage):
     items: List[BookResponse]
-    total: int
-    page: int
-    limit: int
+
+class BookDuplicateResponse(BaseModel):
+    detail: str
+    # The catalog book the new one duplicates, and how closely (0..1)
+    duplicate_of: BookResponse
+    similarity: float
+
+class GenreResponse(BaseModel):
+    id: int
+    name: str
 
 # Library Entry Schemas
 class LibraryEntryCreateRequest(BaseModel):
@@ -125,14 +142,26 @@ class LibraryEntryResponse(BaseModel):
     created_at: datetime
     book: BookResponse
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
-class LibraryEntryListResponse(BaseModel):
+class LibraryEntryListResponse(CursorPage):
     items: List[LibraryEntryResponse]
-    total: int
-    page: int
-    limit: int
+
+# Batch mutations apply up to this many items in one transaction
+BATCH_MAX_ITEMS = 500
+
+class LibraryBatchRequest(BaseModel):
+    items: List[LibraryEntryCreateRequest] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+class LibraryBatchItemResult(BaseModel):
+    book_id: UUID
+    status: Literal["created", "duplicate", "invalid_book"]
+    # The new entry, or the one already holding the book (None for invalid books)
+    entry_id: Optional[UUID] = None
+
+class LibraryBatchResponse(BaseModel):
+    # One result per request item, in request order
+    results: List[LibraryBatchItemResult]
 
 # Review Schemas
 class ReviewRequest(BaseModel):
@@ -144,8 +173,7 @@ class ReviewResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Recommendation Schemas
 class RecommendationResponse(BaseModel):
@@ -153,20 +181,17 @@ class RecommendationResponse(BaseModel):
     recommended_book: BookResponse
     created_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
-class RecommendationListResponse(BaseModel):
+class RecommendationListResponse(CursorPage):
     items: List[RecommendationResponse]
-    total: int
-    page: int
-    limit: int
 
 # Rating Schemas
 class RatingRequest(BaseModel):
     rating: float = Field(..., ge=1.0, le=5.0)
 
-    @validator('rating')
+    @field_validator('rating')
+    @classmethod
     def validate_rating_step(cls, v: float) -> float:
         if (v * 2) % 1 != 0:
             raise ValueError('Rating must be in increments of 0.5')
@@ -178,13 +203,59 @@ class RatingResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+class RatingBatchItem(RatingRequest):
+    recommendation_id: UUID
+
+class RatingBatchRequest(BaseModel):
+    items: List[RatingBatchItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+    @field_validator('items')
+    @classmethod
+    def validate_unique_recommendations(cls, v: List[RatingBatchItem]) -> List[RatingBatchItem]:
+        if len({item.recommendation_id for item in v}) != len(v):
+            raise ValueError('Each recommendation can be rated only once per batch')
+        return v
+
+class RatingBatchItemResult(BaseModel):
+    recommendation_id: UUID
+    status: Literal["created", "updated", "invalid_recommendation"]
+    rating: Optional[RatingResponse] = None
+
+class RatingBatchResponse(BaseModel):
+    # One result per request item, in request order
+    results: List[RatingBatchItemResult]
+
+# Reading Statistics Schema
+class UserStatsResponse(BaseModel):
+    library_entries: int
+    reviews: int
+    ratings: int
+    # Mean of the user's recommendation ratings; None until they rate one
+    average_rating: Optional[float] = None
+    # Library entries per genre, most frequent first
+    genres: dict[str, int]
+    updated_at: Optional[datetime] = None
+
+# Background Job Schemas
+class JobResponse(BaseModel):
+    id: UUID
+    kind: str
+    status: str
+    attempts: int
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
 
 # AI Review Template Schema
 class AiReviewTemplateRequest(BaseModel):
     book_id: UUID
-    notes: Optional[str]
+    notes: Optional[str] = None
 
 class AiReviewTemplateResponse(BaseModel):
     template: str
@@ -0,0 +1,216 @@
+# Synthetic but realistically shaped data for tests, benchmarks and local development
+import itertools
+import random
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Iterable, Iterator
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Every seeded user can log in with this password
+SEED_PASSWORD = "SeedPassword1"
+
+GENRES = [
+    "Fantasy", "Science Fiction", "Mystery", "Thriller", "Romance", "Historical Fiction",
+    "Horror", "Biography", "History", "Poetry", "Young Adult", "Nonfiction",
+]
+
+
+@dataclass
+class SeedSpec:
+    """How much data to generate. Library and recommendation sizes are per-user means."""
+
+    users: int = 1_000
+    books: int = 10_000
+    library_per_user: int = 25
+    recommendations_per_user: int = 20
+    # Share of library entries with a review and of recommendations with a rating
+    review_fraction: float = 0.2
+    rating_fraction: float = 0.3
+    # Seeded users are <tag>-<n>@example.com, so several datasets can share a database
+    tag: str = "seed"
+    seed: int = 42
+
+
+@dataclass
+class SeedSummary:
+    """What seed_database() inserted."""
+
+    users: int = 0
+    books: int = 0
+    preferences: int = 0
+    library_entries: int = 0
+    reviews: int = 0
+    recommendations: int = 0
+    ratings: int = 0
+    elapsed_seconds: float = 0.0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def seed_email(tag: str, number: int) -> str:
+    """Email of the `number`-th user of a dataset (see SeedSpec.tag)."""
+    return f"{tag}-{number}@example.com"
+
+
+class _TextGenerator:
+    """Pseudo-words with a Zipf-like frequency, so a few terms are common and most are rare."""
+
+    def __init__(self, rng: random.Random, size: int = 20_000) -> None:
+        letters = "abcdefghijklmnopqrstuvwxyz"
+        self.rng = rng
+        self.words = ["".join(rng.choices(letters, k=rng.randint(3, 10))) for _ in range(size)]
+        self.cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(size)))
+
+    def sample(self, count: int) -> list[str]:
+        return self.rng.choices(self.words, cum_weights=self.cum_weights, k=count)
+
+    def title(self) -> str:
+        return " ".join(self.sample(self.rng.randint(1, 5))).title()[:255]
+
+    def text(self, low: int, high: int) -> str:
+        return " ".join(self.sample(self.rng.randint(low, high)))
+
+
+def _new_id(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _timestamp(rng: random.Random, now: datetime, days: int = 365) -> datetime:
+    return now - timedelta(seconds=rng.randint(0, days * 86_400))
+
+
+def _insert(db: Session, model, rows: Iterable[dict], batch_size: int) -> int:
+    """Insert rows in executemany batches; returns the number inserted."""
+    inserted = 0
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, batch_size)):
+        db.execute(insert(model), batch)
+        inserted += len(batch)
+    db.commit()
+    return inserted
+
+
+def seed_database(db: Session, spec: SeedSpec | None = None, batch_size: int = 5_000) -> SeedSummary:
+    """
+    Fill the database with a synthetic catalog and user base of the given size.
+
+    The data has the skew the read paths see in production: book popularity
+    is Zipf-like (a few titles are in most libraries), library sizes vary per
+    user, and timestamps are spread over the past year. The same spec always
+    generates the same rows, ids included (timestamps are relative to now), so
+    benchmark runs are comparable.
+    Rows are bulk-inserted with executemany, so 100k+ rows take seconds.
+
+    Args:
+        db: The SQLAlchemy session to insert through; it is committed per table.
+        spec: Volumes and random seed; defaults to SeedSpec().
+        batch_size: Rows per INSERT batch.
+
+    Returns:
+        The number of rows inserted per table.
+    """
+    from .services import auth_service, user_stats
+    from .services.genres import genre_resolver
+
+    spec = spec or SeedSpec()
+    started = time.perf_counter()
+    rng = random.Random(spec.seed)
+    text = _TextGenerator(rng)
+    now = datetime.now(timezone.utc)
+    summary = SeedSummary()
+
+    authors = [f"{text.title()} {text.title()}"[:255] for _ in range(max(1, spec.books // 8))]
+    book_ids = [_new_id(rng) for _ in range(spec.books)]
+    genres = genre_resolver.resolve(db, GENRES)
+
+    def books() -> Iterator[dict]:
+        for number, book_id in enumerate(book_ids):
+            created_at = _timestamp(rng, now, days=5 * 365)
+            genre = genres[rng.choice(GENRES)]
+            yield {
+                "id": book_id,
+                "title": text.title(),
+                "author": rng.choice(authors),
+                "isbn": f"979{spec.seed % 1000:03d}{number:07d}",
+                "genre": genre.name,
+                "genre_id": genre.id,
+                "description": text.text(20, 120),
+                "publication_date": (now - timedelta(days=rng.randint(0, 80 * 365))).date(),
+                "page_count": rng.randint(60, 1_200),
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+
+    summary.books = _insert(db, models.Book, books(), batch_size)
+
+    # One bcrypt hash shared by every user: hashing per user would dominate the run
+    password_hash = auth_service.hash_password(SEED_PASSWORD)
+    user_ids = [_new_id(rng) for _ in range(spec.users)]
+    summary.users = _insert(db, models.User, (
+        {
+            "id": user_id,
+            "email": seed_email(spec.tag, number),
+            "username": f"{spec.tag}-{number}",
+            "password_hash": password_hash,
+        }
+        for number, user_id in enumerate(user_ids)
+    ), batch_size)
+    summary.preferences = _insert(db, models.UserPreference, (
+        {"id": _new_id(rng), "user_id": user_id, "preferences_text": f"{' '.join(rng.sample(GENRES, 2))} {text.text(5, 20)}"}
+        for user_id in user_ids
+    ), batch_size)
+
+    # Zipf-like popularity over a shuffled catalog, so popular books are not the oldest ones
+    popularity_order = rng.sample(range(spec.books), spec.books)
+    popularity = list(itertools.accumulate(1.0 / (rank + 1) ** 0.8 for rank in range(spec.books)))
+
+    def pick_books(count: int, exclude: set[int]) -> list[int]:
+        picked: set[int] = set()
+        for _ in range(count * 3):
+            if len(picked) >= count:
+                break
+            book = popularity_order[rng.choices(range(spec.books), cum_weights=popularity)[0]]
+            if book not in exclude:
+                picked.add(book)
+        return list(picked)
+
+    library_rows, review_rows, recommendation_rows, rating_rows = [], [], [], []
+    for user_id in user_ids:
+        owned = pick_books(min(spec.books, rng.randint(0, 2 * spec.library_per_user)), set())
+        for book in owned:
+            entry_id, created_at = _new_id(rng), _timestamp(rng, now)
+            library_rows.append({
+                "id": entry_id, "user_id": user_id, "book_id": book_ids[book],
+                "created_at": created_at, "updated_at": created_at,
+            })
+            if rng.random() < spec.review_fraction:
+                review_rows.append({"id": _new_id(rng), "user_library_entry_id": entry_id, "review_text": text.text(10, 80)})
+        recommended = pick_books(min(spec.books, rng.randint(0, 2 * spec.recommendations_per_user)), set(owned))
+        for book in recommended:
+            recommendation_id, created_at = _new_id(rng), _timestamp(rng, now, days=90)
+            recommendation_rows.append({
+                "id": recommendation_id, "user_id": user_id, "recommended_book_id": book_ids[book],
+                "created_at": created_at, "updated_at": created_at,
+            })
+            if rng.random() < spec.rating_fraction:
+                rating_rows.append({
+                    "id": _new_id(rng), "recommendation_id": recommendation_id, "user_id": user_id,
+                    "rating": Decimal(rng.randint(2, 10)) / 2,
+                })
+
+    summary.library_entries = _insert(db, models.UserLibraryEntry, library_rows, batch_size)
+    summary.reviews = _insert(db, models.Review, review_rows, batch_size)
+    summary.recommendations = _insert(db, models.Recommendation, recommendation_rows, batch_size)
+    summary.ratings = _insert(db, models.RecommendationRating, rating_rows, batch_size)
+    # Bulk inserts bypass the services that keep the statistics current
+    user_stats.rebuild_user_stats(db, user_ids)
+    summary.elapsed_seconds = time.perf_counter() - started
+    return summary
@@ -0,0 +1,50 @@
+# Fast JSON path for list endpoints: DB row tuples -> plain dicts -> JSON bytes
+from typing import Any, Iterable, Sequence
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+
+# Timestamps as "...Z" for UTC, the same text Pydantic produces
+_ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+def dumps(payload: Any) -> bytes:
+    """Encode a payload of dicts/lists/UUIDs/datetimes to JSON bytes (orjson, C speed)."""
+    return orjson.dumps(payload, option=_ORJSON_OPTIONS)
+
+
+class JSONBytesResponse(Response):
+    """
+    JSON response rendered with orjson.
+
+    Returning a Response from an endpoint makes FastAPI skip validating and
+    re-encoding it against the response_model, which stays for the OpenAPI docs.
+    Only pass data that already has the documented shape (e.g. rows read from the DB).
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return content if isinstance(content, bytes) else dumps(content)
+
+
+def schema_columns(schema: type[BaseModel], model, fields: Sequence[str] | None = None) -> list:
+    """The model columns behind the (scalar) fields of a response schema, in field order."""
+    return [getattr(model, name) for name in (fields or schema_fields(schema))]
+
+
+def schema_fields(schema: type[BaseModel], exclude: Iterable[str] = ()) -> tuple[str, ...]:
+    excluded = set(exclude)
+    return tuple(name for name in schema.model_fields if name not in excluded)
+
+
+def page_payload(items: list[dict], next_cursor: str | None, limit: int, total: int | None, total_is_estimate: bool) -> dict:
+    """The CursorPage envelope around already-serializable items."""
+    return {
+        "next_cursor": next_cursor,
+        "limit": limit,
+        "total": total,
+        "total_is_estimate": total_is_estimate,
+        "items": items,
+    }
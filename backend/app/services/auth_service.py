@@ -1,15 +1,31 @@
-from passlib.context import CryptContext
+import logging
 from datetime import datetime, timedelta
 from jose import jwt
 from app.models import User
 from uuid import UUID
 import os
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
-from app.schemas import LoginRequest, AuthResponse
+from app.schemas import LoginRequest, AuthResponse, UpdatePasswordRequest
+from app.metrics import REGISTRY
+from app.services import password_cost
+from app.services.password_hasher import HashingQueueFull, password_hasher
+from app.services.principal_cache import invalidate_principal
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+# Password hashing context; its work factor is decided once per process (see password_cost)
+BCRYPT_ROUNDS = password_cost.configured_rounds()
+pwd_context = password_cost.build_context(BCRYPT_ROUNDS)
+
+PASSWORD_REHASHES = REGISTRY.counter(
+    "shelfsense_password_rehashes_total",
+    "Stored hashes re-made at the configured work factor on login, by outcome (upgraded, deferred, raced)",
+    ("outcome",),
+)
+REGISTRY.gauge("shelfsense_bcrypt_rounds", "Work factor of newly made password hashes", lambda: BCRYPT_ROUNDS)
 
 # JWT settings (should be in config/env in production)
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "dev-secret-key")
@@ -23,6 +39,44 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the dedicated hashing pool."""
+    return await password_hasher.run(hash_password, password, operation="hash", rounds=BCRYPT_ROUNDS)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the dedicated hashing pool."""
+    return await password_hasher.run(
+        verify_password, plain_password, hashed_password,
+        operation="verify", rounds=password_cost.hash_rounds(hashed_password),
+    )
+
+def get_user_by_email(db: Session, email: str) -> User | None:
+    """Fetch a user by email, or None if no such user exists."""
+    return db.query(User).filter(User.email == email).first()
+
+async def get_user_by_email_async(db: AsyncSession, email: str) -> User | None:
+    """Async variant of get_user_by_email()."""
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalar_one_or_none()
+
+async def create_user_async(db: AsyncSession, email: str, password: str) -> User:
+    """
+    Hash the password and insert a new user.
+    Raises 500 if the insert fails.
+    """
+    # bcrypt takes a while: give back the connection of the email check meanwhile
+    await db.close()
+    password_hash = await hash_password_async(password)
+    user = User(email=email, username=email, password_hash=password_hash)
+    db.add(user)
+    try:
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Database error during registration")
+    await db.refresh(user)
+    return user
+
 def create_access_token(user: User) -> str:
     """Generate a JWT token for the user."""
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -40,7 +94,104 @@ def authenticate(request: LoginRequest, db: Session) -> AuthResponse:
     # If user not found or password invalid, raise 401
     if not user or not verify_password(request.password, user.password_hash):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    # Bring the stored hash to the configured work factor while the password is at hand
+    # (see rehash_password_async() for why the write is conditional)
+    if pwd_context.needs_update(user.password_hash):
+        result = db.execute(
+            update(User)
+            .where(User.id == user.id, User.password_hash == user.password_hash)
+            .values(password_hash=hash_password(request.password))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        PASSWORD_REHASHES.inc("upgraded" if result.rowcount == 1 else "raced")
     # Generate JWT token
     token = create_access_token(user)
     # Return response model
     return AuthResponse(id=user.id, email=user.email, token=token)
+
+async def authenticate_async(request: LoginRequest, db: AsyncSession) -> AuthResponse:
+    """
+    Async variant of authenticate().
+
+    The user lookup is awaited on the async engine while bcrypt verification
+    runs on the bounded hashing pool, so neither blocks the event loop. The
+    session's connection goes back to the pool before bcrypt runs, so a burst
+    of logins queues on the hashing pool without draining the database pool.
+    """
+    user = await get_user_by_email_async(db, request.email)
+    await db.close()
+    if not user or not await verify_password_async(request.password, user.password_hash):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if pwd_context.needs_update(user.password_hash):
+        await rehash_password_async(db, user, request.password)
+    token = create_access_token(user)
+    return AuthResponse(id=user.id, email=user.email, token=token)
+
+async def rehash_password_async(db: AsyncSession, user: User, password: str) -> bool:
+    """
+    Replace the user's stored hash with one at the configured work factor.
+
+    Called on login, the only time the plain password is known. The new hash
+    is computed with no connection checked out; the write is then a short
+    transaction of its own, and only succeeds if the stored hash is still the
+    one that was verified, so a concurrent password change is never
+    overwritten with the old password. A rehash is an optimization, not part of
+    logging in: if the hashing pool is saturated it is left for a later login.
+
+    Returns:
+        Whether the new hash was stored.
+    """
+    old_hash = user.password_hash
+    await db.close()
+    try:
+        new_hash = await hash_password_async(password)
+    except HashingQueueFull:
+        PASSWORD_REHASHES.inc("deferred")
+        return False
+    result = await db.execute(
+        update(User)
+        .where(User.id == user.id, User.password_hash == old_hash)
+        .values(password_hash=new_hash)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    if result.rowcount != 1:
+        PASSWORD_REHASHES.inc("raced")
+        return False
+    PASSWORD_REHASHES.inc("upgraded")
+    logger.debug("Rehashed the password of user %s at %d rounds", user.id, BCRYPT_ROUNDS)
+    return True
+
+async def change_password_async(db: AsyncSession, user_id: UUID, data: UpdatePasswordRequest) -> None:
+    """
+    Replace the user's password after checking the old one.
+    Raises 400 if the old password does not match.
+    """
+    old_hash = (await db.execute(select(User.password_hash).where(User.id == user_id))).scalar_one_or_none()
+    # No connection is held while bcrypt verifies and hashes; the write takes a new one
+    await db.close()
+    if not old_hash or not await verify_password_async(data.old_password, old_hash):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Old password is incorrect")
+    new_hash = await hash_password_async(data.new_password)
+    await db.execute(
+        update(User).where(User.id == user_id).values(password_hash=new_hash).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    # Credentials changed: force the next request to re-read the user
+    invalidate_principal(user_id)
+
+async def delete_user_async(db: AsyncSession, user_id: UUID) -> None:
+    """
+    Delete the user account.
+
+    A single DELETE leaves the dependent rows (preferences, library, reviews,
+    recommendations, ratings, statistics) to ON DELETE CASCADE in the database;
+    an ORM delete would try to null their foreign keys instead.
+    """
+    try:
+        await db.execute(delete(User).where(User.id == user_id))
+        await db.commit()
+    finally:
+        # The account is (or may be) gone: cached principals must not keep authenticating it
+        invalidate_principal(user_id)
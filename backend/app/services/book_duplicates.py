@@ -0,0 +1,416 @@
+# Near-duplicate detection for the books catalog, and merging of duplicate clusters
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Iterable, NamedTuple
+from uuid import UUID
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+# Minimum trigram similarity (Jaccard, 0..1) of both title and author for two books to be duplicates
+BOOK_DUPLICATE_SIMILARITY = float(os.getenv("BOOK_DUPLICATE_SIMILARITY", "0.8"))
+# How stale (seconds) the index may get before a write refreshes it with other processes' books
+BOOK_DUPLICATE_INDEX_REFRESH_SECONDS = float(os.getenv("BOOK_DUPLICATE_INDEX_REFRESH_SECONDS", "30"))
+# Build the index while the app starts rather than on the first POST /books
+BOOK_DUPLICATE_INDEX_AT_STARTUP = os.getenv("BOOK_DUPLICATE_INDEX_AT_STARTUP", "true").lower() == "true"
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_LEADING_ARTICLE_RE = re.compile(r"^(the|a|an)\s+")
+# "Hobbit, The" is how library catalogs file "The Hobbit"
+_TRAILING_ARTICLE_RE = re.compile(r",\s*(the|a|an)\s*$")
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def title_key(title: str | None) -> str:
+    """
+    Lower-cased, punctuation-free title without its leading article.
+
+    'The Hobbit', 'Hobbit, The' and 'the hobbit!' all give 'hobbit'.
+    Mirrors shelfsense.book_title_key() in SQL, which the bulk import dedupes by.
+    """
+    title = (title or "").lower().strip()
+    title = _TRAILING_ARTICLE_RE.sub("", title)
+    title = _NON_ALNUM_RE.sub(" ", title).strip()
+    return _LEADING_ARTICLE_RE.sub("", title)
+
+
+def author_key(author: str | None) -> str:
+    """
+    Lower-cased author name with its words sorted and initials run together.
+
+    'J.R.R. Tolkien', 'Tolkien, J. R. R.' and 'JRR TOLKIEN' all give 'jrr tolkien'.
+    Mirrors shelfsense.book_author_key() in SQL.
+    """
+    words, initials = [], ""
+    for word in _NON_ALNUM_RE.sub(" ", (author or "").lower()).split():
+        if len(word) == 1:
+            initials += word
+            continue
+        if initials:
+            words.append(initials)
+            initials = ""
+        words.append(word)
+    if initials:
+        words.append(initials)
+    return " ".join(sorted(words))
+
+
+def _trigrams(key: str) -> frozenset[str]:
+    padded = f"  {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def similarity(a: str, b: str) -> float:
+    """Trigram Jaccard similarity of two keys (1.0 when equal, like pg_trgm's similarity())."""
+    if a == b:
+        return 1.0
+    a_grams, b_grams = _trigrams(a), _trigrams(b)
+    return len(a_grams & b_grams) / len(a_grams | b_grams)
+
+
+class DuplicateMatch(NamedTuple):
+    book_id: UUID
+    # min(title similarity, author similarity)
+    similarity: float
+
+
+class _Entry(NamedTuple):
+    book_id: UUID
+    title: str
+    author: str
+
+
+class DuplicateIndex:
+    """
+    In-memory index of the catalog's normalized titles and authors.
+
+    Candidates for a new book are the indexed books with the same normalized
+    author or the same normalized title, found by two dictionary lookups; only
+    those few are compared by trigram similarity. A lookup therefore costs
+    microseconds whatever the catalog size, which lets every write check for
+    duplicates. Titles whose numbers differ ('Volume 1' / 'Volume 2') are never
+    duplicates.
+
+    Books created or updated elsewhere are picked up by refresh(); books
+    deleted elsewhere are only dropped by a full build() (or by discard()), so
+    callers must check that a matched book still exists.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[UUID, _Entry] = {}
+        self._by_author: dict[str, dict[UUID, None]] = {}
+        self._by_title: dict[str, dict[UUID, None]] = {}
+        self.watermark: datetime | None = None
+        self.refreshed_at = 0.0
+        self._write_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def match(self, title: str, author: str, threshold: float = BOOK_DUPLICATE_SIMILARITY) -> DuplicateMatch | None:
+        """The indexed book most similar to `title` by `author`, if any reaches `threshold`."""
+        title, author = title_key(title), author_key(author)
+        if not title or not author:
+            return None
+        candidates = {**self._by_author.get(author, {}), **self._by_title.get(title, {})}
+        numbers = _DIGITS_RE.findall(title)
+        best = None
+        for book_id in candidates:
+            entry = self._entries.get(book_id)
+            if entry is None or _DIGITS_RE.findall(entry.title) != numbers:
+                continue
+            score = min(similarity(title, entry.title), similarity(author, entry.author))
+            if score >= threshold and (best is None or score > best.similarity):
+                best = DuplicateMatch(book_id, score)
+        return best
+
+    def add(self, book_id: UUID, title: str, author: str) -> None:
+        """Index a book, replacing an earlier version of it."""
+        entry = _Entry(book_id, title_key(title), author_key(author))
+        with self._write_lock:
+            self._discard(book_id)
+            self._entries[book_id] = entry
+            self._by_author.setdefault(entry.author, {})[book_id] = None
+            self._by_title.setdefault(entry.title, {})[book_id] = None
+
+    def discard(self, book_id: UUID) -> None:
+        """Forget a book, e.g. one that turned out to be deleted."""
+        with self._write_lock:
+            self._discard(book_id)
+
+    def _discard(self, book_id: UUID) -> None:
+        entry = self._entries.pop(book_id, None)
+        if entry is None:
+            return
+        for bucket, key in ((self._by_author, entry.author), (self._by_title, entry.title)):
+            bucket[key].pop(book_id, None)
+            if not bucket[key]:
+                del bucket[key]
+
+    def _add_rows(self, rows: Iterable[tuple[UUID, str, str, datetime | None]]) -> int:
+        added = 0
+        for book_id, title, author, updated_at in rows:
+            self.add(book_id, title, author)
+            if updated_at is not None and (self.watermark is None or updated_at > self.watermark):
+                self.watermark = updated_at
+            added += 1
+        return added
+
+    def build(self, db: Session) -> None:
+        """Rebuild the whole index from the catalog."""
+        fresh = DuplicateIndex()
+        fresh._add_rows(load_book_keys(db))
+        with self._write_lock:
+            self._entries, self._by_author, self._by_title = fresh._entries, fresh._by_author, fresh._by_title
+            self.watermark = fresh.watermark
+        self.refreshed_at = time.monotonic()
+        logger.info("Built the duplicate index over %d books", len(self))
+
+    def refresh(self, db: Session) -> int:
+        """Index books created or updated since the last build/refresh; returns how many."""
+        changed = self._add_rows(load_book_keys(db, since=self.watermark))
+        self.refreshed_at = time.monotonic()
+        return changed
+
+
+def load_book_keys(db: Session, since: datetime | None = None) -> Iterable[tuple[UUID, str, str, datetime | None]]:
+    """Stream (id, title, author, updated_at) of the catalog, optionally only rows updated after `since`."""
+    book = models.Book
+    statement = select(book.id, book.title, book.author, book.updated_at)
+    if since is not None:
+        statement = statement.where(book.updated_at > since)
+    yield from db.execute(statement.execution_options(yield_per=10_000))
+
+
+# Process-wide index used by POST /books
+duplicate_index = DuplicateIndex()
+_build_lock = threading.Lock()
+
+
+def get_duplicate_index() -> DuplicateIndex:
+    """
+    Return the shared index as it is now.
+
+    Once it is older than BOOK_DUPLICATE_INDEX_REFRESH_SECONDS, this starts an
+    incremental refresh in a background thread with its own session, so the
+    scan of recently updated books never runs on the caller's (event-loop) thread.
+    """
+    stale = time.monotonic() - duplicate_index.refreshed_at >= BOOK_DUPLICATE_INDEX_REFRESH_SECONDS
+    if duplicate_index.refreshed_at and stale and _build_lock.acquire(blocking=False):
+        threading.Thread(target=_refresh_in_background, name="duplicate-index-refresh", daemon=True).start()
+    return duplicate_index
+
+
+def _refresh_in_background() -> None:
+    try:
+        with models.SessionLocal() as db:
+            duplicate_index.refresh(db)
+    except Exception:
+        # The next write retries; until then it checks against the current snapshot
+        logger.exception("Refreshing the duplicate index failed")
+    finally:
+        _build_lock.release()
+
+
+def warm_duplicate_index() -> None:
+    """
+    Build the shared index unless it is built already, blocking until it is.
+
+    Run it from a worker thread (the app does so at startup, or before the
+    first write when BOOK_DUPLICATE_INDEX_AT_STARTUP is off).
+    """
+    with _build_lock:
+        if not duplicate_index.refreshed_at:
+            with models.SessionLocal() as db:
+                duplicate_index.build(db)
+
+
+@dataclass
+class MergeStats:
+    """Outcome of a merge_duplicate_books() run."""
+
+    books_scanned: int = 0
+    clusters: int = 0
+    books_merged: int = 0
+    library_entries_moved: int = 0
+    library_entries_dropped: int = 0
+    recommendations_moved: int = 0
+    recommendations_dropped: int = 0
+    users_affected: int = 0
+    dry_run: bool = False
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def find_duplicate_clusters(db: Session, threshold: float = BOOK_DUPLICATE_SIMILARITY) -> dict[UUID, list[UUID]]:
+    """
+    Group the catalog into clusters of near-duplicates.
+
+    Books are visited oldest first and each is matched against the books kept so
+    far, so every cluster is keyed by its oldest book (the one that survives a
+    merge) and lists the newer duplicates of it.
+
+    Returns:
+        Surviving book id -> ids of its duplicates, for clusters of two or more books.
+    """
+    book = models.Book
+    kept = DuplicateIndex()
+    clusters: dict[UUID, list[UUID]] = {}
+    rows = db.execute(
+        select(book.id, book.title, book.author).order_by(book.created_at, book.id).execution_options(yield_per=10_000)
+    )
+    for book_id, title, author in rows:
+        match = kept.match(title, author, threshold)
+        if match is None:
+            kept.add(book_id, title, author)
+        else:
+            clusters.setdefault(match.book_id, []).append(book_id)
+    return clusters
+
+
+def _merge_rows(rows: list[tuple[UUID, UUID, UUID, UUID | None]], survivor: UUID) -> tuple[dict[UUID, UUID | None], set[UUID]]:
+    """
+    Decide which of a cluster's per-user rows survive.
+
+    `rows` are (row id, user id, book id, child id) for every book of the
+    cluster: library entries with their review, or recommendations with their
+    rating. Each user keeps one row, the one on the surviving book if they have
+    it, else their oldest; a child of a dropped row moves to the kept row if
+    that has none.
+
+    Returns:
+        Kept row id -> the child it should end up with (None: leave as is),
+        and the ids of the rows to drop.
+    """
+    by_user: dict[UUID, list[tuple[UUID, UUID, UUID, UUID | None]]] = {}
+    for row in rows:
+        by_user.setdefault(row[1], []).append(row)
+    kept, dropped = {}, set()
+    for user_rows in by_user.values():
+        keep = next((row for row in user_rows if row[2] == survivor), user_rows[0])
+        child = keep[3]
+        for row in user_rows:
+            if row is keep:
+                continue
+            dropped.add(row[0])
+            if child is None and row[3] is not None:
+                child = row[3]
+                kept[keep[0]] = child
+        kept.setdefault(keep[0], None)
+    return kept, dropped
+
+
+def _merge_cluster(db: Session, survivor: UUID, duplicates: list[UUID], stats: MergeStats) -> set[UUID]:
+    """Re-point everything that references `duplicates` at `survivor` and delete them; returns the users touched."""
+    entry, review = models.UserLibraryEntry, models.Review
+    recommendation, rating = models.Recommendation, models.RecommendationRating
+    cluster = [survivor, *duplicates]
+    users: set[UUID] = set()
+
+    for table, book_column, child, parent_column in (
+        (entry, entry.book_id, review, review.user_library_entry_id),
+        (recommendation, recommendation.recommended_book_id, rating, rating.recommendation_id),
+    ):
+        # Only users with a row on a duplicate are affected, so the survivor's rows are read for them alone
+        affected = select(table.user_id).where(book_column.in_(duplicates))
+        rows = db.execute(
+            select(table.id, table.user_id, book_column, child.id)
+            .outerjoin(child, parent_column == table.id)
+            .where(book_column.in_(cluster), table.user_id.in_(affected))
+            .order_by(table.created_at, table.id)
+        ).all()
+        if not rows:
+            continue
+        kept, dropped = _merge_rows([tuple(row) for row in rows], survivor)
+        users.update(row[1] for row in rows)
+        # Children first: they move to the kept row, or go with the dropped one
+        for row_id, child_id in kept.items():
+            if child_id is not None:
+                db.execute(update(child).where(child.id == child_id).values({parent_column.key: row_id}))
+        if dropped:
+            db.execute(delete(child).where(parent_column.in_(dropped)))
+            db.execute(delete(table).where(table.id.in_(dropped)))
+        moved = db.execute(
+            update(table).where(table.id.in_(list(kept)), book_column != survivor).values({book_column.key: survivor})
+        ).rowcount
+        if table is entry:
+            stats.library_entries_moved += moved
+            stats.library_entries_dropped += len(dropped)
+        else:
+            stats.recommendations_moved += moved
+            stats.recommendations_dropped += len(dropped)
+
+    db.execute(delete(models.Book).where(models.Book.id.in_(duplicates)))
+    return users
+
+
+def merge_clusters(db: Session, clusters: dict[UUID, list[UUID]], stats: MergeStats | None = None) -> MergeStats:
+    """
+    Merge each cluster's duplicates into its surviving book.
+
+    Library entries and recommendations of the duplicates are re-pointed at the
+    surviving book. A user who ends up with two rows for it keeps one (the one
+    already on the survivor, else the oldest), and a review or rating of the
+    dropped row moves to the kept one if that has none. Each cluster is merged
+    in its own transaction; afterwards the statistics of the affected users and
+    this process's duplicate index are rebuilt.
+
+    Args:
+        db: The SQLAlchemy session; it is committed per cluster.
+        clusters: Surviving book id -> ids of its duplicates (see find_duplicate_clusters()).
+        stats: Counters to add to (default: new ones).
+
+    Returns:
+        Counts of merged books and moved or dropped rows.
+    """
+    from . import user_stats
+
+    stats = stats or MergeStats()
+    users: set[UUID] = set()
+    for number, (survivor, duplicates) in enumerate(clusters.items(), 1):
+        users |= _merge_cluster(db, survivor, duplicates, stats)
+        db.commit()
+        stats.clusters += 1
+        stats.books_merged += len(duplicates)
+        if number % 1_000 == 0:
+            logger.info("Merged %d of %d duplicate clusters", number, len(clusters))
+    stats.users_affected += len(users)
+    if users:
+        user_stats.rebuild_user_stats(db, users)
+    duplicate_index.build(db)
+    return stats
+
+
+def merge_duplicate_books(
+    db: Session,
+    threshold: float = BOOK_DUPLICATE_SIMILARITY,
+    dry_run: bool = False,
+) -> MergeStats:
+    """
+    Find clusters of near-duplicate books and merge each into its oldest book (see merge_clusters()).
+
+    Args:
+        db: The SQLAlchemy session.
+        threshold: Minimum title and author similarity of duplicates.
+        dry_run: Only find and count the clusters.
+
+    Returns:
+        Counts of clusters, merged books and moved or dropped rows.
+    """
+    clusters = find_duplicate_clusters(db, threshold)
+    stats = MergeStats(dry_run=dry_run, books_scanned=db.execute(select(func.count(models.Book.id))).scalar_one())
+    if dry_run:
+        stats.clusters = len(clusters)
+        stats.books_merged = sum(len(duplicates) for duplicates in clusters.values())
+        return stats
+    return merge_clusters(db, clusters, stats)
@@ -0,0 +1,251 @@
+# Streaming bulk import of publisher catalogs into shelfsense.books
+import csv
+import io
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from itertools import islice
+from typing import IO, Iterator, Literal
+
+from pydantic import ValidationError
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .. import schemas
+from .genres import ResolvedGenre, genre_resolver
+
+logger = logging.getLogger(__name__)
+
+ImportFormat = Literal["csv", "jsonl"]
+
+# Columns copied into the staging table, in COPY order
+BOOK_COLUMNS = ("title", "author", "isbn", "genre", "description", "publication_date", "page_count")
+# Keep at most this many validation errors in the report
+MAX_REPORTED_ERRORS = 20
+
+# Session-local staging table; rows are merged into shelfsense.books with set-based SQL
+_CREATE_STAGING_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS book_import_staging (
+    row_no bigint NOT NULL,
+    title varchar(255) NOT NULL,
+    author varchar(255) NOT NULL,
+    isbn varchar(13),
+    genre text,
+    description text,
+    publication_date date,
+    page_count integer,
+    genre_id integer
+) ON COMMIT DELETE ROWS
+"""
+
+# Dedupe inside the batch (first occurrence wins), then insert only rows whose
+# ISBN and normalized title+author are not in the catalog yet.
+_MERGE_SQL = """
+DELETE FROM book_import_staging s
+USING (
+    SELECT row_no, isbn,
+           row_number() OVER (PARTITION BY isbn ORDER BY row_no) AS isbn_rank,
+           row_number() OVER (PARTITION BY shelfsense.book_norm_key(title, author) ORDER BY row_no) AS key_rank
+    FROM book_import_staging
+) ranked
+WHERE s.row_no = ranked.row_no
+  AND ((ranked.isbn IS NOT NULL AND ranked.isbn_rank > 1) OR ranked.key_rank > 1);
+
+INSERT INTO shelfsense.books (title, author, isbn, genre, description, publication_date, page_count, genre_id)
+SELECT s.title, s.author, s.isbn, s.genre, s.description, s.publication_date, s.page_count, s.genre_id
+FROM book_import_staging s
+WHERE NOT EXISTS (
+        SELECT 1 FROM shelfsense.books b WHERE s.isbn IS NOT NULL AND b.isbn = s.isbn)
+  AND NOT EXISTS (
+        SELECT 1 FROM shelfsense.books b
+        WHERE shelfsense.book_norm_key(b.title, b.author) = shelfsense.book_norm_key(s.title, s.author))
+ORDER BY s.row_no;
+"""
+
+
+@dataclass
+class ImportStats:
+    """Progress and outcome of an import run."""
+
+    rows_read: int = 0
+    rows_valid: int = 0
+    rows_invalid: int = 0
+    rows_inserted: int = 0
+    rows_duplicate: int = 0
+    resumed_from_row: int = 0
+    elapsed_seconds: float = 0.0
+    rows_per_second: float = 0.0
+    errors: list[dict] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def normalize_isbn(value: str | None) -> str | None:
+    """Strip hyphens/spaces from an ISBN; returns None for blank values."""
+    if not value:
+        return None
+    return re.sub(r"[^0-9Xx]", "", value).upper() or None
+
+
+def iter_records(stream: IO[str], fmt: ImportFormat) -> Iterator[dict]:
+    """Yield raw records one at a time from a CSV (with header) or JSON Lines text stream."""
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # An empty record fails validation and is reported as invalid
+                    yield {}
+
+
+def _validate(record: dict) -> schemas.BookCreateRequest:
+    # Empty CSV cells mean "no value"
+    values = {name: (record.get(name) if record.get(name) != "" else None) for name in BOOK_COLUMNS}
+    values["isbn"] = normalize_isbn(values["isbn"])
+    book = schemas.BookCreateRequest.model_validate(values)
+    if not book.title.strip() or not book.author.strip():
+        raise ValueError("title and author must not be blank")
+    if book.isbn is not None and len(book.isbn) > 13:
+        raise ValueError("isbn must be at most 13 characters")
+    return book
+
+
+def _resolve_genres(engine: Engine, rows: list[tuple[int, schemas.BookCreateRequest]]) -> dict[str, ResolvedGenre]:
+    """Canonical genres of a batch, creating new ones in their own short transaction."""
+    with Session(engine) as db:
+        genres = genre_resolver.resolve(db, {book.genre for _, book in rows})
+        db.commit()
+    return genres
+
+
+def _to_copy_buffer(rows: list[tuple[int, schemas.BookCreateRequest]], genres: dict[str, ResolvedGenre]) -> io.StringIO:
+    """Serialize validated rows as CSV for COPY FROM STDIN, genres replaced by their canonical name and id."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row_no, book in rows:
+        genre = genres.get(book.genre)
+        values = [getattr(book, name) for name in BOOK_COLUMNS]
+        values[BOOK_COLUMNS.index("genre")] = genre.name if genre else None
+        writer.writerow([row_no, *values, genre.id if genre else None])
+    buffer.seek(0)
+    return buffer
+
+
+def _load_checkpoint(path: str | None) -> int:
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path) as checkpoint:
+        return int(json.load(checkpoint)["rows_done"])
+
+
+def _save_checkpoint(path: str | None, rows_done: int) -> None:
+    if not path:
+        return
+    # Write-then-rename so a crash never leaves a half-written checkpoint
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as checkpoint:
+        json.dump({"rows_done": rows_done}, checkpoint)
+    os.replace(temporary, path)
+
+
+def import_books(
+    engine: Engine,
+    stream: IO[str],
+    fmt: ImportFormat,
+    batch_size: int = 10_000,
+    checkpoint_path: str | None = None,
+) -> ImportStats:
+    """
+    Stream books from `stream` into shelfsense.books.
+
+    Records are read lazily and handled `batch_size` at a time, so memory stays
+    constant whatever the file size. Each batch is validated against
+    BookCreateRequest, COPY'd into a temporary staging table and merged with one
+    set-based INSERT ... SELECT that skips ISBN and normalized title+author
+    duplicates (within the batch and against the existing catalog). Genres are
+    mapped onto the taxonomy first (see services.genres); unseen ones are added.
+
+    Each batch commits on its own; when `checkpoint_path` is given the number of
+    processed records is saved after every commit, and a rerun resumes after it.
+
+    Args:
+        engine: A Postgres (psycopg2) engine.
+        stream: Text stream with CSV (header row required) or JSON Lines content.
+        fmt: "csv" or "jsonl".
+        batch_size: Records per batch/transaction.
+        checkpoint_path: Optional file used to resume an interrupted import.
+
+    Returns:
+        Counts of read, invalid, inserted and duplicate rows plus throughput.
+    """
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError("Bulk import uses COPY and requires PostgreSQL")
+
+    stats = ImportStats()
+    started = time.perf_counter()
+    records = iter_records(stream, fmt)
+
+    # Skip records committed by a previous, interrupted run
+    stats.resumed_from_row = _load_checkpoint(checkpoint_path)
+    stats.rows_read = sum(1 for _ in islice(records, stats.resumed_from_row))
+
+    raw_connection = engine.raw_connection()
+    try:
+        cursor = raw_connection.cursor()
+        cursor.execute(_CREATE_STAGING_SQL)
+        raw_connection.commit()
+
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+
+            valid_rows = []
+            for record in batch:
+                stats.rows_read += 1
+                try:
+                    valid_rows.append((stats.rows_read, _validate(record)))
+                except (ValidationError, ValueError, TypeError) as exc:
+                    stats.rows_invalid += 1
+                    if len(stats.errors) < MAX_REPORTED_ERRORS:
+                        stats.errors.append({"row": stats.rows_read, "error": str(exc)})
+            stats.rows_valid += len(valid_rows)
+
+            if valid_rows:
+                cursor.copy_expert(
+                    f"COPY book_import_staging (row_no, {', '.join(BOOK_COLUMNS)}, genre_id) FROM STDIN WITH (FORMAT csv)",
+                    _to_copy_buffer(valid_rows, _resolve_genres(engine, valid_rows)),
+                )
+                cursor.execute(_MERGE_SQL)
+                inserted = cursor.rowcount
+                stats.rows_inserted += inserted
+                stats.rows_duplicate += len(valid_rows) - inserted
+            raw_connection.commit()
+            _save_checkpoint(checkpoint_path, stats.rows_read)
+
+            elapsed = time.perf_counter() - started
+            logger.info(
+                "Imported %d rows (%d new, %d duplicate, %d invalid) at %.0f rows/s",
+                stats.rows_read, stats.rows_inserted, stats.rows_duplicate, stats.rows_invalid,
+                (stats.rows_read - stats.resumed_from_row) / elapsed if elapsed else 0.0,
+            )
+    except Exception:
+        raw_connection.rollback()
+        raise
+    finally:
+        raw_connection.close()
+
+    stats.elapsed_seconds = time.perf_counter() - started
+    processed = stats.rows_read - stats.resumed_from_row
+    stats.rows_per_second = processed / stats.elapsed_seconds if stats.elapsed_seconds else 0.0
+    # A finished import needs no checkpoint; the next run starts from scratch
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return stats
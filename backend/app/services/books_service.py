@@ -0,0 +1,210 @@
+# Service layer for the books catalog
+import asyncio
+from typing import Literal, NamedTuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models, schemas
+from ..pagination import CountMode, SortKey, count_rows, fetch_keyset_page, parse_datetime
+from ..serialization import page_payload, schema_columns, schema_fields
+from ..upsert import dialect_name
+from . import book_duplicates
+from .genres import genre_key, genre_resolver
+
+# Text search configuration used by the generated search_vector column
+SEARCH_CONFIG = "english"
+
+
+# Escape character of the LIKE patterns below; SQLite has no default one, unlike Postgres
+LIKE_ESCAPE = "\\"
+
+
+def _escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input is matched literally (pass escape=LIKE_ESCAPE)."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _portable_search_filter(search: str):
+    """Full-text search stand-in for databases without tsvector (SQLite): every word must appear somewhere."""
+    book = models.Book
+    return and_(*(
+        or_(*(
+            column.ilike(f"%{_escape_like(word)}%", escape=LIKE_ESCAPE)
+            for column in (book.title, book.author, book.description)
+        ))
+        for word in search.split()
+    ))
+
+
+def _portable_search_score(search: str):
+    """Relevance for _portable_search_filter(), weighting title over author over description like the tsvector."""
+    book = models.Book
+    return sum(
+        case(
+            (book.title.ilike(pattern, escape=LIKE_ESCAPE), 1.0),
+            (book.author.ilike(pattern, escape=LIKE_ESCAPE), 0.4),
+            else_=0.1,
+        )
+        for pattern in (f"%{_escape_like(word)}%" for word in search.split())
+    )
+
+
+# Orderings available for GET /books (all end with the primary key as tie-breaker)
+BOOK_SORT_KEYS = {
+    "title": SortKey("title", (models.Book.title, models.Book.id), (str, UUID)),
+    "created_at": SortKey("created_at", (models.Book.created_at, models.Book.id), (parse_datetime, UUID), descending=True),
+}
+BookSort = Literal["relevance", "title", "created_at"]
+# Response fields, read straight from the selected columns
+BOOK_FIELDS = schema_fields(schemas.BookResponse)
+
+# What POST /books does when the book is a near-duplicate of one in the catalog:
+# "reject" it with 409 and the existing book, "merge" it (return the existing book) or "create" it anyway
+DuplicatePolicy = Literal["reject", "merge", "create"]
+
+
+class BookCreateResult(NamedTuple):
+    book: dict
+    created: bool
+    # Similarity to the existing book when `created` is false
+    similarity: float | None = None
+
+
+async def search_books(
+    db: AsyncSession,
+    search: str | None = None,
+    author: str | None = None,
+    genre: str | None = None,
+    sort: BookSort | None = None,
+    cursor: str | None = None,
+    limit: int = 20,
+    count: CountMode = "none",
+) -> dict:
+    """
+    Searches the catalog with index-backed filters and keyset pagination.
+
+    - `search` runs ranked full-text search over title, author and description
+      (GIN index on the generated `search_vector` column).
+    - `author` matches by substring or trigram similarity, so typos like
+      "Tolkein" still find "Tolkien" (GIN trigram index).
+
+    - `genre` matches any spelling of a genre ("Sci-Fi", "science fiction"):
+      the name is resolved to its genre id through the alias table, and
+      (genre_id, title, id) serves both the filter and the default title order.
+
+    Off Postgres (SQLite in tests and benchmarks) `search` and `author` fall
+    back to unindexed substring matching with a simple relevance score.
+
+    Args:
+        db: The async SQLAlchemy database session.
+        search: Free-text query (web search syntax: quotes, OR, -exclusions).
+        author: Author name or fragment.
+        genre: Genre name or alias.
+        sort: "relevance" (default when searching), "title" (default otherwise) or "created_at".
+        cursor: Cursor returned with the previous page, if any.
+        limit: Page size.
+        count: Whether and how to compute the total number of matches.
+
+    Returns:
+        The requested page of books, shaped like BookListResponse but as plain
+        data ready for JSON encoding.
+    """
+    book = models.Book
+    filters = []
+    score = None
+    postgres = dialect_name(db) == "postgresql"
+    # Blank values (e.g. ?search=%20) mean "no filter" on every dialect
+    search = (search or "").strip() or None
+    author = (author or "").strip() or None
+
+    if search and postgres:
+        query = func.websearch_to_tsquery(SEARCH_CONFIG, search)
+        filters.append(book.search_vector.op("@@")(query))
+        score = func.ts_rank_cd(book.search_vector, query)
+    elif search:
+        filters.append(_portable_search_filter(search))
+        score = _portable_search_score(search)
+    if author and postgres:
+        # `%` is pg_trgm's similarity operator; ILIKE covers fragments too short to be similar
+        filters.append(or_(book.author.op("%")(author), book.author.ilike(f"%{_escape_like(author)}%", escape=LIKE_ESCAPE)))
+        if score is None:
+            score = func.similarity(book.author, author)
+    elif author:
+        filters.append(book.author.ilike(f"%{_escape_like(author)}%", escape=LIKE_ESCAPE))
+        if score is None:
+            score = case((func.lower(book.author) == author.lower(), 1.0), else_=0.5)
+    if genre:
+        genre_id = select(models.GenreAlias.genre_id).where(models.GenreAlias.key == genre_key(genre))
+        filters.append(book.genre_id == genre_id.scalar_subquery())
+
+    if sort is None:
+        sort = "relevance" if score is not None else "title"
+    if sort == "relevance":
+        if score is None:
+            raise HTTPException(status_code=400, detail="sort=relevance requires search or author")
+        sort_key = SortKey("relevance", (score, book.id), (float, UUID), descending=True)
+    else:
+        sort_key = BOOK_SORT_KEYS[sort]
+
+    statement = select(*schema_columns(schemas.BookResponse, book)).where(*filters)
+    rows, next_cursor = await fetch_keyset_page(db, statement, sort_key, cursor, limit, as_rows=True)
+    total, total_is_estimate = await count_rows(db, statement, count)
+    items = [dict(zip(BOOK_FIELDS, row)) for row in rows]
+    return page_payload(items, next_cursor, limit, total, total_is_estimate)
+
+
+async def list_genres(db: AsyncSession) -> list[dict]:
+    """All canonical genres by name."""
+    rows = await db.execute(select(models.Genre.id, models.Genre.name).order_by(models.Genre.name))
+    return [{"id": genre_id, "name": name} for genre_id, name in rows]
+
+
+async def _get_book(db: AsyncSession, book_id: UUID) -> dict | None:
+    row = (await db.execute(select(*schema_columns(schemas.BookResponse, models.Book)).where(models.Book.id == book_id))).first()
+    return dict(zip(BOOK_FIELDS, row)) if row else None
+
+
+async def create_book(
+    db: AsyncSession, data: schemas.BookCreateRequest, on_duplicate: DuplicatePolicy = "reject"
+) -> BookCreateResult:
+    """
+    Adds a book to the catalog unless a near-duplicate of it is already there.
+
+    Duplicates ("Hobbit, The" for "The Hobbit", an author in other casing) are
+    found in the in-memory duplicate index (see book_duplicates), without a
+    query; the matched book is then read to check it still exists.
+
+    Args:
+        db: The async SQLAlchemy database session.
+        data: The new book.
+        on_duplicate: "reject" or "merge" report the existing book instead of
+            creating one (the router answers 409 or 200); "create" skips the check.
+
+    Returns:
+        The created book, or the existing duplicate with its similarity.
+    """
+    if not book_duplicates.duplicate_index.refreshed_at:
+        # Not built at startup: build it once, in a worker thread rather than on the event loop
+        await asyncio.to_thread(book_duplicates.warm_duplicate_index)
+    index = book_duplicates.get_duplicate_index()
+    while on_duplicate != "create":
+        match = index.match(data.title, data.author)
+        if match is None:
+            break
+        existing = await _get_book(db, match.book_id)
+        if existing is not None:
+            return BookCreateResult(existing, created=False, similarity=match.similarity)
+        # Deleted since it was indexed (e.g. merged away by another process)
+        index.discard(match.book_id)
+
+    genre = (await db.run_sync(genre_resolver.resolve, [data.genre])).get(data.genre)
+    book = models.Book(**data.model_dump(exclude={"genre"}), genre=genre and genre.name, genre_id=genre and genre.id)
+    db.add(book)
+    await db.flush()
+    book_id = book.id
+    await db.commit()
+    index.add(book_id, data.title, data.author)
+    return BookCreateResult(await _get_book(db, book_id), created=True)
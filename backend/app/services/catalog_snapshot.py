@@ -0,0 +1,310 @@
+# Versioned binary snapshot of the books catalog, memory-mapped read-only by every worker
+import json
+import mmap
+import os
+import threading
+import time
+from collections.abc import Mapping, Sequence
+from datetime import datetime, timezone
+from uuid import UUID
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy.orm import Session
+
+from .recommendation_engine import N_FEATURES, BookText, CatalogIndex, _IndexState, load_books
+
+# File layout:
+#   MAGIC | uint32 format version | uint32 header length | JSON header | sections
+# Every section starts on an ALIGNMENT boundary so it can be viewed in place as a
+# NumPy array; the header lists each section's offset, dtype and shape.
+MAGIC = b"SHELFCAT"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREFIX = np.dtype([("magic", "S8"), ("format_version", "<u4"), ("header_length", "<u4")])
+
+# Where workers look for the snapshot; unset disables snapshots
+CATALOG_SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT_PATH")
+# How often (seconds) a worker checks whether a newer snapshot was written
+CATALOG_SNAPSHOT_CHECK_SECONDS = float(os.getenv("CATALOG_SNAPSHOT_CHECK_SECONDS", "10"))
+
+
+class SnapshotFormatError(ValueError):
+    """The file is not a catalog snapshot this code can read."""
+
+
+class _BookIds(Sequence):
+    """Row -> book UUID, read from the fixed-width id array."""
+
+    def __init__(self, ids: np.ndarray) -> None:
+        self._ids = ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        # NumPy drops trailing NUL bytes of fixed-width byte strings; pad them back
+        return UUID(bytes=self._ids[row].ljust(16, b"\0"))
+
+
+class _RowLookup(Mapping):
+    """Book UUID -> row, by binary search over the ids sorted at write time."""
+
+    def __init__(self, sorted_ids: np.ndarray, sorted_rows: np.ndarray) -> None:
+        self._sorted_ids = sorted_ids
+        self._sorted_rows = sorted_rows
+
+    def __getitem__(self, book_id: UUID) -> int:
+        key = book_id.bytes
+        position = int(np.searchsorted(self._sorted_ids, key))
+        if position < len(self._sorted_ids) and self._sorted_ids[position] == key.rstrip(b"\0"):
+            return int(self._sorted_rows[position])
+        raise KeyError(book_id)
+
+    def __contains__(self, book_id) -> bool:
+        try:
+            self[book_id]
+        except (KeyError, AttributeError):
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(_BookIds(self._sorted_ids))
+
+    def __len__(self) -> int:
+        return len(self._sorted_ids)
+
+
+class CatalogSnapshot:
+    """
+    A catalog snapshot opened read-only through mmap.
+
+    All arrays are views into the mapping: opening is O(1) whatever the catalog
+    size, and the pages live in the OS page cache, shared by every process on
+    the host that maps the same file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as file:
+            # The mapping stays valid after the file is closed (or replaced on disk)
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        prefix = np.frombuffer(self._mmap, dtype=_PREFIX, count=1)[0]
+        if prefix["magic"] != MAGIC:
+            raise SnapshotFormatError(f"{path} is not a catalog snapshot")
+        if prefix["format_version"] != FORMAT_VERSION:
+            raise SnapshotFormatError(
+                f"{path} has snapshot format {prefix['format_version']}, expected {FORMAT_VERSION}"
+            )
+        start = _PREFIX.itemsize
+        self.header = json.loads(self._mmap[start:start + int(prefix["header_length"])])
+        self.genres: list[str] = self.header["genres"]
+        self.created_at = datetime.fromisoformat(self.header["created_at"])
+        watermark = self.header["watermark"]
+        self.watermark = datetime.fromisoformat(watermark) if watermark else None
+
+        self.ids = self._array("ids")
+        self.genre_codes = self._array("genre_codes")
+        self._title_offsets, self._title_blob = self._array("title_offsets"), self._array("title_blob")
+        self._author_offsets, self._author_blob = self._array("author_offsets"), self._array("author_blob")
+        self.book_ids = _BookIds(self.ids)
+        self.row_of = _RowLookup(self._array("sorted_ids"), self._array("sorted_rows"))
+
+    def _array(self, name: str) -> np.ndarray:
+        section = self.header["sections"][name]
+        dtype = np.dtype(section["dtype"])
+        count = int(np.prod(section["shape"]))
+        return np.frombuffer(self._mmap, dtype=dtype, count=count, offset=section["offset"]).reshape(section["shape"])
+
+    def _csr(self, name: str, shape: tuple[int, int]) -> sparse.csr_matrix:
+        arrays = (self._array(f"{name}_data"), self._array(f"{name}_indices"), self._array(f"{name}_indptr"))
+        return sparse.csr_matrix(arrays, shape=shape, copy=False)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def title(self, row: int) -> str:
+        return bytes(self._title_blob[self._title_offsets[row]:self._title_offsets[row + 1]]).decode()
+
+    def author(self, row: int) -> str:
+        return bytes(self._author_blob[self._author_offsets[row]:self._author_offsets[row + 1]]).decode()
+
+    def genre(self, row: int) -> str | None:
+        code = self.genre_codes[row]
+        return self.genres[code] if code >= 0 else None
+
+    def index(self) -> CatalogIndex:
+        """A read-only CatalogIndex scoring directly against the mapped matrices."""
+        n_books = len(self)
+        state = _IndexState(
+            book_ids=self.book_ids,
+            row_of=self.row_of,
+            tf=None,
+            idf=self._array("idf"),
+            matrix=self._csr("matrix", (n_books, N_FEATURES)),
+            postings=self._csr("postings", (N_FEATURES, n_books)),
+        )
+        return CatalogIndex.from_state(state, self.watermark)
+
+
+def _offsets_and_blob(values: list[str | None]) -> tuple[np.ndarray, np.ndarray]:
+    encoded = [(value or "").encode() for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _csr_sections(name: str, matrix: sparse.csr_matrix) -> dict[str, np.ndarray]:
+    # indptr and indices must share a dtype, or SciPy copies them when the matrix is rebuilt
+    index_dtype = np.int32 if matrix.nnz < np.iinfo(np.int32).max else np.int64
+    return {
+        f"{name}_indptr": matrix.indptr.astype(index_dtype),
+        f"{name}_indices": matrix.indices.astype(index_dtype),
+        f"{name}_data": matrix.data.astype(np.float32),
+    }
+
+
+def write_snapshot(path: str, books: list[BookText], index: CatalogIndex) -> None:
+    """
+    Write `books` and their index rows as a snapshot at `path`, atomically.
+
+    The file is written under a temporary name, fsync'ed and renamed over `path`,
+    so readers see either the old or the new snapshot, never a partial one.
+    Workers that still map the old file keep using it until they swap.
+
+    Args:
+        path: Destination file.
+        books: The catalog, in the index's row order.
+        index: A CatalogIndex built from exactly `books`.
+    """
+    if [book.id for book in books] != list(index.book_ids):
+        raise ValueError("books must be in the index's row order")
+
+    ids = np.array([book.id.bytes for book in books], dtype="S16")
+    order = np.argsort(ids, kind="stable").astype(np.int32)
+    genres = sorted({book.genre for book in books if book.genre})
+    genre_code = {genre: code for code, genre in enumerate(genres)}
+    title_offsets, title_blob = _offsets_and_blob([book.title for book in books])
+    author_offsets, author_blob = _offsets_and_blob([book.author for book in books])
+    state = index._state
+
+    sections = {
+        "ids": ids,
+        "sorted_ids": ids[order],
+        "sorted_rows": order,
+        "genre_codes": np.array([genre_code.get(book.genre, -1) for book in books], dtype=np.int32),
+        "title_offsets": title_offsets,
+        "title_blob": title_blob,
+        "author_offsets": author_offsets,
+        "author_blob": author_blob,
+        "idf": state.idf.astype(np.float32),
+        **_csr_sections("matrix", state.matrix),
+        **_csr_sections("postings", state.postings),
+    }
+    header = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "watermark": index.watermark.isoformat() if index.watermark else None,
+        "n_books": len(books),
+        "n_features": N_FEATURES,
+        "genres": genres,
+        "sections": {},
+    }
+
+    # Lay the sections out after the header; the header size depends on the offsets,
+    # so reserve generously and pad the header to the first section
+    header_space = len(json.dumps(header)) + 200 * len(sections) + 1024
+    offset = _align(_PREFIX.itemsize + header_space)
+    for name, array in sections.items():
+        header["sections"][name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset = _align(offset + array.nbytes)
+    encoded_header = json.dumps(header).encode()
+    if len(encoded_header) > header_space:
+        raise RuntimeError("Snapshot header outgrew its reserved space")
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        prefix = np.array([(MAGIC, FORMAT_VERSION, len(encoded_header))], dtype=_PREFIX)
+        file.write(prefix.tobytes())
+        file.write(encoded_header)
+        for name, array in sections.items():
+            file.seek(header["sections"][name]["offset"])
+            file.write(np.ascontiguousarray(array).tobytes())
+        file.truncate(offset)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+    # Persist the rename itself
+    directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def build_snapshot(db: Session, path: str) -> dict:
+    """
+    Build a snapshot of the whole catalog from the database and publish it at `path`.
+
+    Returns:
+        Summary of the written snapshot.
+    """
+    started = time.perf_counter()
+    books = list(load_books(db))
+    index = CatalogIndex()
+    index.add_or_update(books)
+    write_snapshot(path, books, index)
+    return {
+        "path": path,
+        "books": len(books),
+        "bytes": os.path.getsize(path),
+        "watermark": index.watermark.isoformat() if index.watermark else None,
+        "elapsed_seconds": time.perf_counter() - started,
+    }
+
+
+class SnapshotWatcher:
+    """
+    Holds the current snapshot index of a process and swaps in newer snapshots.
+
+    At most every `check_seconds` the file at `path` is stat'ed; when it was
+    replaced (new inode, size or mtime) the new file is mapped and swapped in
+    atomically. In-flight scoring keeps the old mapping alive until it finishes.
+    """
+
+    def __init__(self, path: str, check_seconds: float = CATALOG_SNAPSHOT_CHECK_SECONDS) -> None:
+        self.path = path
+        self.check_seconds = check_seconds
+        self._index: CatalogIndex | None = None
+        self._file_key = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> CatalogIndex | None:
+        """Return the current snapshot index, or None if no snapshot has been written yet."""
+        if time.monotonic() - self._checked_at < self.check_seconds:
+            return self._index
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return self._index
+            file_key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            if file_key != self._file_key:
+                self._index = CatalogSnapshot(self.path).index()
+                self._file_key = file_key
+        return self._index
+
+
+_watcher: SnapshotWatcher | None = SnapshotWatcher(CATALOG_SNAPSHOT_PATH) if CATALOG_SNAPSHOT_PATH else None
+
+
+def shared_snapshot_index() -> CatalogIndex | None:
+    """The process-wide snapshot index, or None if snapshots are not configured or not written yet."""
+    return _watcher.get() if _watcher is not None else None
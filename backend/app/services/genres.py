@@ -0,0 +1,132 @@
+# Genre taxonomy: free-text genre names mapped onto canonical, integer-keyed genres
+import re
+import threading
+from typing import Iterable, NamedTuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..upsert import build_insert_ignore, dialect_name
+
+# Canonical genres and the spellings that mean them besides the obvious variants
+# of the name itself (case, spaces, hyphens: see genre_key()).
+# Keep in sync with db/migrations/008_genre_taxonomy.sql, which backfills with the same list.
+CANONICAL_GENRES: dict[str, tuple[str, ...]] = {
+    "Fantasy": (),
+    "Science Fiction": ("Sci-Fi", "SF", "SciFi"),
+    "Mystery": ("Mysteries",),
+    "Thriller": ("Thrillers",),
+    "Romance": (),
+    "Historical Fiction": (),
+    "Horror": (),
+    "Biography": ("Biographies",),
+    "History": (),
+    "Poetry": ("Poems",),
+    "Young Adult": ("YA",),
+    "Nonfiction": (),
+    "Classics": ("Classic",),
+    "Graphic Novel": ("Graphic Novels",),
+}
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
+def genre_key(name: str | None) -> str:
+    """
+    The spelling-insensitive form of a genre name: lower-case letters and digits only.
+
+    'Sci-Fi', 'sci fi' and 'SciFi' all give 'scifi'; '' means "no genre".
+    Mirrors shelfsense.genre_key() in SQL.
+    """
+    return _NON_ALNUM_RE.sub("", (name or "").lower())[:100]
+
+
+# genre_key() of every alias -> canonical name
+_CANONICAL_BY_KEY = {
+    genre_key(alias): name for name, aliases in CANONICAL_GENRES.items() for alias in (name, *aliases)
+}
+
+
+def display_name(name: str) -> str:
+    """How a genre first seen as `name` is shown: canonical if known, else tidied up."""
+    canonical = _CANONICAL_BY_KEY.get(genre_key(name))
+    if canonical:
+        return canonical
+    name = " ".join(name.split())[:100]
+    return name.title() if name.islower() or name.isupper() else name
+
+
+class ResolvedGenre(NamedTuple):
+    id: int
+    name: str
+
+
+class GenreResolver:
+    """
+    Maps genre strings to canonical genres, creating the ones never seen before.
+
+    Known keys are cached per process: genres and aliases are only ever added,
+    and only committed rows are cached, so a cached mapping never goes stale.
+    """
+
+    def __init__(self) -> None:
+        self._by_key: dict[str, ResolvedGenre] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, db: Session, names: Iterable[str | None]) -> dict[str, ResolvedGenre]:
+        """
+        Canonical genre of each name; blank names are left out.
+
+        New genres and aliases are inserted with ON CONFLICT DO NOTHING and read
+        back, so concurrent resolvers agree on one id per genre. They are
+        committed in a short transaction of their own, not the caller's: a
+        rollback of the caller must not leave ids in the cache that do not exist.
+        """
+        keys = {name: genre_key(name) for name in names if name and genre_key(name)}
+        missing = set(keys.values()) - self._by_key.keys()
+        if missing:
+            found = self._lookup(db, missing)
+            unknown = missing - found.keys()
+            if unknown:
+                with Session(db.get_bind()) as own:
+                    self._create(own, {key: next(name for name, k in keys.items() if k == key) for key in unknown})
+                    own.commit()
+                found.update(self._lookup(db, unknown))
+            with self._lock:
+                self._by_key.update(found)
+        return {name: self._by_key[key] for name, key in keys.items()}
+
+    def _lookup(self, db: Session, keys: set[str]) -> dict[str, ResolvedGenre]:
+        alias, genre = models.GenreAlias, models.Genre
+        rows = db.execute(
+            select(alias.key, genre.id, genre.name).join(genre, genre.id == alias.genre_id).where(alias.key.in_(keys))
+        )
+        return {key: ResolvedGenre(genre_id, name) for key, genre_id, name in rows}
+
+    def _create(self, db: Session, first_seen: dict[str, str]) -> None:
+        names = {key: display_name(name) for key, name in first_seen.items()}
+        # A canonical genre comes with all of its spellings, as the migration seeds them
+        for name in set(names.values()):
+            for alias in CANONICAL_GENRES.get(name, ()):
+                names.setdefault(genre_key(alias), name)
+            names.setdefault(genre_key(name), name)
+        dialect = dialect_name(db)
+        db.execute(build_insert_ignore(
+            dialect, models.Genre, [{"name": name} for name in set(names.values())], index_elements=["name"]
+        ))
+        ids = dict(db.execute(
+            select(models.Genre.name, models.Genre.id).where(models.Genre.name.in_(set(names.values())))
+        ).all())
+        db.execute(build_insert_ignore(
+            dialect, models.GenreAlias, [{"key": key, "genre_id": ids[name]} for key, name in names.items()],
+            index_elements=["key"],
+        ))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_key.clear()
+
+
+# Resolver of this process, shared by the import, the seed data and the CLI
+genre_resolver = GenreResolver()
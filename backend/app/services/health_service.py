@@ -0,0 +1,133 @@
+# Service layer for health checks and connection pool statistics
+import asyncio
+import logging
+import os
+import time
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from .. import models
+from ..metrics import POOL_WAIT, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# How long a database check result is reused before the DB is queried again
+HEALTH_CHECK_CACHE_SECONDS = float(os.getenv("HEALTH_CHECK_CACHE_SECONDS", "5"))
+# Upper bound on how long a single database check may take
+HEALTH_CHECK_TIMEOUT_SECONDS = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "2"))
+# Connections opened per engine at startup (defaults to the pool size)
+DB_POOL_WARM_CONNECTIONS = int(os.getenv("DB_POOL_WARM_CONNECTIONS", str(models.DB_POOL_SIZE)))
+
+# Last database check: (monotonic timestamp, is_healthy, error message)
+_last_check: tuple[float, bool, str | None] = (0.0, False, None)
+_check_lock = asyncio.Lock()
+
+
+async def check_database() -> tuple[bool, str | None]:
+    """
+    Run `SELECT 1` against the database, reusing a recent result if available.
+
+    Concurrent callers share one in-flight check, so a burst of health probes
+    never turns into a burst of queries.
+
+    Returns:
+        (True, None) if the database answered, otherwise (False, error message).
+    """
+    global _last_check
+    checked_at, healthy, error = _last_check
+    if time.monotonic() - checked_at < HEALTH_CHECK_CACHE_SECONDS:
+        return healthy, error
+
+    async with _check_lock:
+        # Another caller may have refreshed the result while we waited
+        checked_at, healthy, error = _last_check
+        if time.monotonic() - checked_at < HEALTH_CHECK_CACHE_SECONDS:
+            return healthy, error
+        try:
+            async with asyncio.timeout(HEALTH_CHECK_TIMEOUT_SECONDS):
+                async with models.async_engine.connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+            healthy, error = True, None
+        except Exception as exc:
+            logger.warning("Database health check failed: %s", exc)
+            healthy, error = False, type(exc).__name__
+        _last_check = (time.monotonic(), healthy, error)
+        return healthy, error
+
+
+def pool_stats(engine: Engine) -> dict:
+    """Return size and usage counters of an engine's connection pool."""
+    pool = engine.pool
+    stats = {"class": type(pool).__name__}
+    # Only queue pools track these counters
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            stats[name] = method()
+    return stats
+
+
+def checkout_wait_stats() -> dict:
+    """Aggregate connection checkout wait across both engines."""
+    histogram = POOL_WAIT.labels()
+    return {
+        "checkouts": histogram.count,
+        "wait_seconds_total": histogram.sum,
+        "wait_seconds_avg": histogram.sum / histogram.count if histogram.count else 0.0,
+    }
+
+
+def _warm_sync_pool(connections: int) -> None:
+    opened = []
+    try:
+        for _ in range(connections):
+            opened.append(models.engine.connect())
+    finally:
+        for connection in opened:
+            connection.close()
+
+
+async def _warm_async_pool(connections: int) -> None:
+    opened = []
+    try:
+        for _ in range(connections):
+            opened.append(await models.async_engine.connect())
+    finally:
+        for connection in opened:
+            await connection.close()
+
+
+async def warm_pools(connections: int = DB_POOL_WARM_CONNECTIONS) -> None:
+    """
+    Open `connections` connections on both engines and return them to their pools,
+    so the first requests after startup do not pay for connection setup.
+    A database that is not reachable yet is logged, not fatal.
+    """
+    # Only queue pools keep idle connections around (e.g. not SQLite's pools)
+    if connections <= 0 or not isinstance(models.engine.pool, QueuePool):
+        return
+    try:
+        await asyncio.to_thread(_warm_sync_pool, connections)
+        await _warm_async_pool(connections)
+        logger.info("Warmed database pools with %d connections each", connections)
+    except Exception as exc:
+        logger.warning("Could not warm database pools: %s", exc)
+
+
+REGISTRY.gauge(
+    "shelfsense_db_pool_checked_out",
+    "Connections currently checked out of the sync pool",
+    lambda: pool_stats(models.engine).get("checkedout", 0),
+)
+REGISTRY.gauge(
+    "shelfsense_db_async_pool_checked_out",
+    "Connections currently checked out of the async pool",
+    lambda: pool_stats(models.async_engine.sync_engine).get("checkedout", 0),
+)
+REGISTRY.gauge(
+    "shelfsense_db_pool_overflow",
+    "Overflow connections currently open in the sync pool",
+    lambda: pool_stats(models.engine).get("overflow", 0),
+)
@@ -0,0 +1,216 @@
+# Persistent background jobs with bounded concurrency, e.g. "refresh my recommendations"
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from .. import models, schemas
+from ..upsert import build_insert_ignore, dialect_name
+from . import recommendation_precompute
+
+logger = logging.getLogger(__name__)
+
+REFRESH_RECOMMENDATIONS = "refresh_recommendations"
+
+# Jobs executed at the same time by one runner (each occupies a thread while it runs)
+JOB_MAX_CONCURRENCY = int(os.getenv("JOB_MAX_CONCURRENCY", "2"))
+# How often the runner looks for jobs enqueued by other processes
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+# A job "running" for longer than this was orphaned by a crash or restart and is retried
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "600"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Run jobs inside the API processes; set to false when a separate `python -m app.cli run-jobs` does it
+JOB_RUNNER_IN_PROCESS = os.getenv("JOB_RUNNER_IN_PROCESS", "true").lower() == "true"
+
+
+def _refresh_recommendations(user_id: UUID) -> dict:
+    with models.SessionLocal() as db:
+        return recommendation_precompute.refresh_user_recommendations(db, user_id)
+
+
+# Job kind -> synchronous handler, run in a worker thread; its return value is stored as the result
+JOB_HANDLERS: dict[str, Callable[[UUID], dict]] = {
+    REFRESH_RECOMMENDATIONS: _refresh_recommendations,
+}
+
+_JOB_COLUMNS = models.Job.__table__.columns
+_ACTIVE = models.Job.status.in_(models.JOB_ACTIVE_STATUSES)
+
+
+async def enqueue(db: AsyncSession, user_id: UUID, kind: str) -> schemas.JobResponse:
+    """
+    Queue a job of `kind` for the user, or return their job of that kind that is already active.
+
+    Coalescing relies on the partial unique index on (kind, user_id) for active
+    jobs, so concurrent requests (even in different processes) share one job.
+    """
+    for _ in range(3):
+        statement = build_insert_ignore(
+            dialect_name(db), models.Job, [{"kind": kind, "user_id": user_id, "status": "queued"}],
+            index_elements=["kind", "user_id"], index_where=text(models.JOB_ACTIVE_SQL),
+        ).returning(*_JOB_COLUMNS)
+        row = (await db.execute(statement)).first()
+        if row is None:
+            # Conflict: join the active job (unless it finished in the meantime, then retry)
+            row = (await db.execute(
+                select(*_JOB_COLUMNS).where(models.Job.kind == kind, models.Job.user_id == user_id, _ACTIVE)
+            )).first()
+        await db.commit()
+        if row is not None:
+            job_runner.notify()
+            return schemas.JobResponse.model_validate(row, from_attributes=True)
+    raise HTTPException(status_code=503, detail="Could not queue the job, please retry")
+
+
+async def get_job(db: AsyncSession, user_id: UUID, job_id: UUID) -> schemas.JobResponse | None:
+    """Fetch one of the user's jobs; None if it does not exist or belongs to someone else."""
+    row = (await db.execute(
+        select(*_JOB_COLUMNS).where(models.Job.id == job_id, models.Job.user_id == user_id)
+    )).first()
+    return schemas.JobResponse.model_validate(row, from_attributes=True) if row else None
+
+
+class JobRunner:
+    """
+    Executes queued jobs from the jobs table, at most `max_concurrency` at a time.
+
+    Jobs are claimed with UPDATE ... WHERE id = (SELECT ... FOR UPDATE SKIP LOCKED),
+    so any number of runners (API workers or `python -m app.cli run-jobs`
+    processes) can share the table without running a job twice. The runner wakes
+    up immediately for jobs enqueued in its own process and polls for the rest.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker | None = None,
+        max_concurrency: int = JOB_MAX_CONCURRENCY,
+        poll_seconds: float = JOB_POLL_SECONDS,
+        requeue_seconds: float = JOB_STALE_SECONDS / 2,
+    ) -> None:
+        self._session_factory = session_factory
+        self.max_concurrency = max_concurrency
+        self.poll_seconds = poll_seconds
+        # How often to look for jobs orphaned by a runner that died
+        self.requeue_seconds = requeue_seconds
+        self._slots: asyncio.Semaphore | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._loop_task: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Start the claim loop on the running event loop."""
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._wakeup = asyncio.Event()
+        self._loop_task = asyncio.create_task(self._claim_loop())
+
+    async def stop(self) -> None:
+        """Stop claiming and cancel running jobs; they are retried once stale."""
+        tasks = [task for task in (self._loop_task, *self._running) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop_task = None
+
+    def notify(self) -> None:
+        """Wake the runner up because a job was just enqueued."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _session(self) -> AsyncSession:
+        return (self._session_factory or models.AsyncSessionLocal)()
+
+    async def _claim_loop(self) -> None:
+        next_requeue = 0.0
+        while True:
+            # Runners can die at any time, not just before this one started
+            if time.monotonic() >= next_requeue:
+                try:
+                    await self.requeue_stale()
+                except Exception:
+                    logger.exception("Requeueing stale jobs failed")
+                next_requeue = time.monotonic() + self.requeue_seconds
+            await self._slots.acquire()
+            try:
+                job = await self._claim()
+            except Exception:
+                logger.exception("Claiming a job failed")
+                job = None
+            if job is None:
+                self._slots.release()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self._execute(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _claim(self):
+        next_job = (
+            select(models.Job.id)
+            .where(models.Job.status == "queued")
+            .order_by(models.Job.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        claim = (
+            update(models.Job)
+            .where(models.Job.id == next_job)
+            .values(status="running", started_at=func.now(), attempts=models.Job.attempts + 1)
+            .returning(*_JOB_COLUMNS)
+        )
+        async with self._session() as db:
+            job = (await db.execute(claim)).first()
+            await db.commit()
+        return job
+
+    async def _execute(self, job) -> None:
+        try:
+            handler = JOB_HANDLERS[job.kind]
+            result = await run_in_threadpool(handler, job.user_id)
+            values = {"status": "succeeded", "result": result, "error": None}
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            values = {"status": "failed", "error": str(exc) or type(exc).__name__}
+        finally:
+            self._slots.release()
+        async with self._session() as db:
+            await db.execute(
+                update(models.Job).where(models.Job.id == job.id).values(finished_at=func.now(), **values)
+            )
+            await db.commit()
+
+    async def requeue_stale(self) -> int:
+        """Give orphaned "running" jobs another attempt (or fail them after JOB_MAX_ATTEMPTS)."""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=JOB_STALE_SECONDS)
+        stale = (models.Job.status == "running", models.Job.started_at < cutoff)
+        async with self._session() as db:
+            await db.execute(
+                update(models.Job)
+                .where(*stale, models.Job.attempts >= JOB_MAX_ATTEMPTS)
+                .values(status="failed", error="Gave up after repeated interruptions", finished_at=func.now())
+            )
+            requeued = (await db.execute(
+                update(models.Job).where(*stale).values(status="queued", started_at=None)
+            )).rowcount
+            await db.commit()
+        if requeued:
+            logger.info("Requeued %d stale jobs", requeued)
+        return requeued
+
+
+# Runner of this process; started by the app lifespan or `python -m app.cli run-jobs`
+job_runner = JobRunner()
@@ -0,0 +1,129 @@
+# Service layer for the current user's library
+from uuid import UUID
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models, schemas
+from ..conditional import weak_etag
+from ..pagination import CountMode, SortKey, count_rows, fetch_keyset_page, parse_datetime
+from ..db_types import GUID
+from ..serialization import page_payload, schema_columns, schema_fields
+from ..upsert import build_insert_ignore, dialect_name
+from . import user_stats
+
+# Newest entries first; matches idx_user_library_entries_user_created (user_id, created_at DESC, id DESC)
+LIBRARY_SORT_KEY = SortKey(
+    "created_at",
+    (models.UserLibraryEntry.created_at, models.UserLibraryEntry.id),
+    (parse_datetime, UUID),
+    descending=True,
+)
+
+# Response fields, read straight from the joined columns (LibraryEntryResponse and its nested BookResponse)
+ENTRY_FIELDS = schema_fields(schemas.LibraryEntryResponse, exclude=("book",))
+BOOK_FIELDS = schema_fields(schemas.BookResponse)
+
+async def list_library_entries(
+    db: AsyncSession,
+    user_id: UUID,
+    cursor: str | None = None,
+    limit: int = 20,
+    count: CountMode = "none",
+) -> dict:
+    """
+    Lists the user's library entries, newest first, one keyset page at a time.
+
+    Args:
+        db: The async SQLAlchemy database session.
+        user_id: The UUID of the library owner.
+        cursor: Cursor returned with the previous page, if any.
+        limit: Page size.
+        count: Whether and how to compute the total number of entries.
+
+    Returns:
+        The requested page of library entries with their books, shaped like
+        LibraryEntryListResponse but as plain data ready for JSON encoding.
+    """
+    entry = models.UserLibraryEntry
+    statement = select(entry.id).where(entry.user_id == user_id)
+    # One query returning plain column tuples: no ORM identity map, no per-item validation
+    page_statement = (
+        select(*schema_columns(schemas.LibraryEntryResponse, entry, ENTRY_FIELDS), *schema_columns(schemas.BookResponse, models.Book))
+        .join(entry.book)
+        .where(entry.user_id == user_id)
+    )
+    rows, next_cursor = await fetch_keyset_page(db, page_statement, LIBRARY_SORT_KEY, cursor, limit, as_rows=True)
+    total, total_is_estimate = await count_rows(db, statement, count)
+    split = len(ENTRY_FIELDS)
+    items = [{**dict(zip(ENTRY_FIELDS, row[:split])), "book": dict(zip(BOOK_FIELDS, row[split:]))} for row in rows]
+    return page_payload(items, next_cursor, limit, total, total_is_estimate)
+
+async def library_etag(db: AsyncSession, user_id: UUID) -> str:
+    """
+    Returns a weak ETag for the user's whole library, valid for every page of it.
+
+    It combines the number of entries with the latest change to an entry or to one
+    of its books, so adding, removing or editing anything listed changes it. The
+    aggregate walks the user's entries by index and reads no text columns, which
+    is much cheaper than loading and serializing a page.
+    """
+    entry = models.UserLibraryEntry
+    statement = (
+        select(func.count(entry.id), func.max(entry.updated_at), func.max(models.Book.updated_at))
+        .join(entry.book)
+        .where(entry.user_id == user_id)
+    )
+    count, entries_changed, books_changed = (await db.execute(statement)).one()
+    return weak_etag("library", user_id, count, entries_changed, books_changed)
+
+async def add_library_entries(db: AsyncSession, user_id: UUID, book_ids: list[UUID]) -> schemas.LibraryBatchResponse:
+    """
+    Adds many books to the user's library in one transaction.
+
+    All new entries are written by a single INSERT ... SELECT ... ON CONFLICT
+    DO NOTHING: the SELECT drops ids that are not books and the conflict
+    clause skips books already in the library. Only if something was skipped
+    does a second query tell the two apart.
+
+    Args:
+        db: The async SQLAlchemy database session.
+        user_id: The UUID of the library owner.
+        book_ids: The books to add, in request order; repeats count as duplicates.
+
+    Returns:
+        One result per requested book, in request order.
+    """
+    entry = models.UserLibraryEntry
+    requested = list(dict.fromkeys(book_ids))
+    source = select(literal(user_id, GUID), models.Book.id).where(models.Book.id.in_(requested))
+    statement = build_insert_ignore(
+        dialect_name(db), entry, index_elements=["user_id", "book_id"], from_select=(["user_id", "book_id"], source)
+    ).returning(entry.book_id, entry.id)
+    created = dict((await db.execute(statement)).all())
+    skipped = [book_id for book_id in requested if book_id not in created]
+    existing = {}
+    if skipped:
+        existing = dict((await db.execute(
+            select(entry.book_id, entry.id).where(entry.user_id == user_id, entry.book_id.in_(skipped))
+        )).all())
+    if created:
+        genres = dict((await db.execute(
+            select(models.Book.genre, func.count()).where(models.Book.id.in_(list(created))).group_by(models.Book.genre)
+        )).all())
+        await user_stats.record_changes(db, user_id, library_entries=len(created), genres=genres)
+    await db.commit()
+
+    results, seen = [], set()
+    for book_id in book_ids:
+        if book_id in created and book_id not in seen:
+            result = schemas.LibraryBatchItemResult(book_id=book_id, status="created", entry_id=created[book_id])
+        elif book_id in created or book_id in existing:
+            result = schemas.LibraryBatchItemResult(
+                book_id=book_id, status="duplicate", entry_id=created.get(book_id) or existing[book_id]
+            )
+        else:
+            result = schemas.LibraryBatchItemResult(book_id=book_id, status="invalid_book")
+        seen.add(book_id)
+        results.append(result)
+    return schemas.LibraryBatchResponse(results=results)
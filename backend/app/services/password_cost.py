@@ -0,0 +1,87 @@
+# bcrypt work factor: configured per deployment, calibrated against a latency budget
+import logging
+import math
+import os
+import time
+
+import bcrypt
+from passlib.context import CryptContext
+from passlib.hash import bcrypt as bcrypt_hash
+
+logger = logging.getLogger(__name__)
+
+# The library default, used until a deployment calibrates its own value
+DEFAULT_BCRYPT_ROUNDS = 12
+# Never go below this, however slow the hardware (OWASP's minimum for bcrypt)
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", "10"))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", "16"))
+# Budget for one hash or verify on a production core (milliseconds)
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+# Work factor for new hashes: a number (as printed by `python -m app.cli calibrate-bcrypt`
+# on the production hardware) or "auto" to calibrate at startup against BCRYPT_TARGET_MS.
+# Prefer a pinned number: with "auto", workers that measure differently would
+# keep rehashing each other's hashes.
+BCRYPT_ROUNDS = os.getenv("BCRYPT_ROUNDS", str(DEFAULT_BCRYPT_ROUNDS))
+
+
+def hash_rounds(password_hash: str) -> int | None:
+    """The work factor a stored bcrypt hash was made with (None if it is not a bcrypt hash)."""
+    try:
+        return bcrypt_hash.from_string(password_hash).rounds
+    except ValueError:
+        return None
+
+
+def measure_hash_seconds(rounds: int, samples: int = 3) -> float:
+    """Fastest of `samples` bcrypt hashes at `rounds` on this machine (the least disturbed by other load)."""
+    salt = bcrypt.gensalt(rounds)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        bcrypt.hashpw(b"calibration-password", salt)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def calibrate_rounds(
+    target_seconds: float = BCRYPT_TARGET_MS / 1000,
+    min_rounds: int = BCRYPT_MIN_ROUNDS,
+    max_rounds: int = BCRYPT_MAX_ROUNDS,
+) -> int:
+    """
+    The highest work factor whose hash still fits in `target_seconds` on this machine.
+
+    Each extra round doubles the cost, so one measurement at `min_rounds` is
+    enough to extrapolate; the result is clamped to [min_rounds, max_rounds].
+    """
+    probe_seconds = measure_hash_seconds(min_rounds)
+    if probe_seconds >= target_seconds:
+        return min_rounds
+    extra_rounds = math.floor(math.log2(target_seconds / probe_seconds))
+    return max(min_rounds, min(max_rounds, min_rounds + extra_rounds))
+
+
+def configured_rounds() -> int:
+    """Work factor for new hashes per BCRYPT_ROUNDS (calibrating now if it is "auto")."""
+    if BCRYPT_ROUNDS.strip().lower() != "auto":
+        return int(BCRYPT_ROUNDS)
+    rounds = calibrate_rounds()
+    logger.info("Calibrated bcrypt to %d rounds for a %.0f ms budget", rounds, BCRYPT_TARGET_MS)
+    return rounds
+
+
+def build_context(rounds: int) -> CryptContext:
+    """
+    A bcrypt context hashing at exactly `rounds`.
+
+    Pinning min and max rounds to the same value makes needs_update() true for
+    any stored hash made at a different cost, cheaper or dearer, so logins
+    converge every hash on the configured work factor.
+    """
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
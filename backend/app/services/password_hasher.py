@@ -0,0 +1,133 @@
+# Bounded executor for bcrypt password hashing and verification
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from ..metrics import REGISTRY, record_password_hash
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+# Executor sizing (override via environment in production)
+# bcrypt releases the GIL while hashing, so a thread pool gives real parallelism
+# without the pickling overhead of a process pool.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+# Maximum number of hash/verify calls allowed to be running or waiting at once
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 4)))
+# Seconds clients are told to wait before retrying when the queue is full
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "1"))
+
+
+class HashingQueueFull(Exception):
+    """Raised when the password hashing queue cannot accept more work."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    Runs CPU-heavy password hashing on a dedicated, size-limited thread pool.
+
+    Keeping bcrypt off FastAPI's shared threadpool means a burst of logins
+    cannot starve unrelated endpoints. When more than `max_pending` calls are
+    queued the hasher rejects new work immediately instead of letting latency grow.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, retry_after: int = 1):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        # Counters reported by stats()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._hash_seconds_total = 0.0
+        self._hash_seconds_max = 0.0
+        self._wait_seconds_total = 0.0
+
+    async def run(self, func: Callable[..., T], *args, operation: str = "hash", rounds: int | None = None) -> T:
+        """
+        Execute `func(*args)` on the hashing pool and await its result.
+
+        `operation` and `rounds` (the bcrypt work factor involved) only label
+        the duration metric.
+
+        Raises:
+            HashingQueueFull: If the pool already has `max_pending` calls in flight.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                logger.warning("Password hashing queue full (%d pending), rejecting request", self._pending)
+                raise HashingQueueFull(self.retry_after)
+            self._pending += 1
+
+        submitted_at = time.perf_counter()
+
+        def timed_call() -> tuple[T, float, float]:
+            # Measure queue wait and pure hashing time separately
+            started_at = time.perf_counter()
+            result = func(*args)
+            return result, started_at - submitted_at, time.perf_counter() - started_at
+
+        try:
+            loop = asyncio.get_running_loop()
+            result, wait_seconds, hash_seconds = await loop.run_in_executor(self._executor, timed_call)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+        record_password_hash(hash_seconds, operation, rounds)
+        with self._lock:
+            self._completed += 1
+            self._wait_seconds_total += wait_seconds
+            self._hash_seconds_total += hash_seconds
+            if hash_seconds > self._hash_seconds_max:
+                self._hash_seconds_max = hash_seconds
+        return result
+
+    def stats(self) -> dict:
+        """Return a snapshot of queue depth and latency counters."""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "hash_seconds_total": self._hash_seconds_total,
+                "hash_seconds_max": self._hash_seconds_max,
+                "wait_seconds_total": self._wait_seconds_total,
+            }
+
+    def shutdown(self) -> None:
+        """Stop the worker threads (called on application shutdown)."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Shared hasher used by the auth service
+password_hasher = PasswordHasher(
+    max_workers=PASSWORD_HASH_WORKERS,
+    max_pending=PASSWORD_HASH_MAX_PENDING,
+    retry_after=PASSWORD_HASH_RETRY_AFTER,
+)
+
+REGISTRY.gauge(
+    "shelfsense_password_hash_queue_depth",
+    "Password hash/verify calls running or waiting",
+    lambda: password_hasher.stats()["pending"],
+)
+REGISTRY.gauge(
+    "shelfsense_password_hash_rejected",
+    "Password hash/verify calls rejected because the queue was full",
+    lambda: password_hasher.stats()["rejected"],
+)
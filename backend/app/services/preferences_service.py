@@ -1,9 +1,12 @@
 # Service layer for user preferences
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import select, update, insert
+from sqlalchemy import select
 from uuid import UUID
 
 from .. import models, schemas
+from ..conditional import weak_etag
+from ..upsert import build_upsert, dialect_name, execute_upsert, execute_upsert_async
 
 def get_user_preferences(db: Session, user_id: UUID) -> models.UserPreference | None:
     """
@@ -24,39 +27,83 @@ def get_user_preferences(db: Session, user_id: UUID) -> models.UserPreference |
     result = db.execute(statement)
     return result.scalar_one_or_none()
 
-def upsert_user_preferences(db: Session, user_id: UUID, preferences_data: schemas.PreferenceRequest) -> models.UserPreference:
+def _preferences_upsert(db: Session | AsyncSession, user_id: UUID, preferences_data: schemas.PreferenceRequest):
+    """Build the INSERT ... ON CONFLICT (user_id) DO UPDATE statement for a user's preferences."""
+    return build_upsert(
+        dialect_name(db),
+        models.UserPreference,
+        index_elements=["user_id"],
+        update_columns=["preferences_text"],
+        values={"user_id": user_id, "preferences_text": preferences_data.preferences_text},
+    )
+
+def upsert_user_preferences(db: Session, user_id: UUID, preferences_data: schemas.PreferenceRequest) -> schemas.PreferenceResponse:
     """
     Creates or updates preferences for a specific user in the database.
     'Upsert' means it will UPDATE if the record exists, or INSERT if it doesn't.
 
+    The whole operation is a single INSERT ... ON CONFLICT ... RETURNING statement,
+    so there is no read-then-write race and no extra refresh query.
+
     Args:
         db: The SQLAlchemy database session.
         user_id: The UUID of the user whose preferences are being set/updated.
         preferences_data: The Pydantic model containing the new preferences text.
 
     Returns:
-        The created or updated UserPreference object.
-    """
-    # First, try to get existing preferences for the user.
-    existing_prefs = get_user_preferences(db, user_id)
-
-    if existing_prefs:
-        # If preferences already exist, update the text.
-        # SQLAlchemy tracks changes to the object.
-        existing_prefs.preferences_text = preferences_data.preferences_text
-        # Note: The 'updated_at' timestamp is handled automatically by the
-        # database trigger defined in schema.sql.
-        db.commit() # Commit the transaction to save the changes.
-        db.refresh(existing_prefs) # Refresh the object to get the latest state from DB (like updated_at).
-        return existing_prefs
-    else:
-        # If preferences don't exist, create a new record.
-        new_prefs = models.UserPreference(
-            user_id=user_id,
-            preferences_text=preferences_data.preferences_text
-            # 'id', 'created_at', 'updated_at' are handled by the database defaults/triggers.
-        )
-        db.add(new_prefs) # Add the new object to the session.
-        db.commit() # Commit the transaction to insert the new record.
-        db.refresh(new_prefs) # Refresh the object to get DB-generated values (id, timestamps).
-        return new_prefs
+        The created or updated preferences, built directly from the returned row.
+    """
+    statement = _preferences_upsert(db, user_id, preferences_data)
+    return execute_upsert(db, statement, schemas.PreferenceResponse)
+
+async def get_user_preferences_async(db: AsyncSession, user_id: UUID) -> models.UserPreference | None:
+    """
+    Async variant of get_user_preferences() for use with an AsyncSession.
+
+    Args:
+        db: The async SQLAlchemy database session.
+        user_id: The UUID of the user whose preferences are to be fetched.
+
+    Returns:
+        The UserPreference object if found, otherwise None.
+    """
+    statement = select(models.UserPreference).where(models.UserPreference.user_id == user_id)
+    result = await db.execute(statement)
+    return result.scalar_one_or_none()
+
+async def upsert_user_preferences_async(db: AsyncSession, user_id: UUID, preferences_data: schemas.PreferenceRequest) -> schemas.PreferenceResponse:
+    """
+    Async variant of upsert_user_preferences() for use with an AsyncSession.
+
+    Args:
+        db: The async SQLAlchemy database session.
+        user_id: The UUID of the user whose preferences are being set/updated.
+        preferences_data: The Pydantic model containing the new preferences text.
+
+    Returns:
+        The created or updated preferences, built directly from the returned row.
+    """
+    statement = _preferences_upsert(db, user_id, preferences_data)
+    return await execute_upsert_async(db, statement, schemas.PreferenceResponse)
+
+def preferences_etag(preferences: models.UserPreference | schemas.PreferenceResponse) -> str:
+    """The weak ETag of one version of a user's preferences."""
+    return weak_etag("preferences", preferences.id, preferences.updated_at)
+
+async def lock_user_preferences_etag_async(db: AsyncSession, user_id: UUID) -> str | None:
+    """
+    Returns the ETag of the user's current preferences and locks their row until
+    the transaction ends, so an If-Match check and the following write cannot interleave
+    with another writer.
+
+    Args:
+        db: The async SQLAlchemy database session.
+        user_id: The UUID of the user whose preferences are about to be written.
+
+    Returns:
+        The ETag, or None if the user has no preferences yet.
+    """
+    preference = models.UserPreference
+    statement = select(preference.id, preference.updated_at).where(preference.user_id == user_id).with_for_update()
+    row = (await db.execute(statement)).first()
+    return preferences_etag(row) if row else None
@@ -0,0 +1,42 @@
+# Per-worker cache of authenticated principals
+import os
+from uuid import UUID
+
+from ..cache import TTLCache
+
+# How long a looked-up user stays trusted without re-reading the users table
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_MAX_SIZE = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", "10000"))
+
+
+class Principal:
+    """
+    Lightweight stand-in for the authenticated User.
+
+    Carries only what request handlers need, so it is cheap to cache
+    and never triggers lazy loads against a closed session.
+    """
+
+    __slots__ = ("id", "email")
+
+    def __init__(self, id: UUID, email: str):
+        self.id = id
+        self.email = email
+
+    def __repr__(self) -> str:
+        return f"Principal(id={self.id!r}, email={self.email!r})"
+
+
+principal_cache: TTLCache[UUID, Principal] = TTLCache(
+    maxsize=PRINCIPAL_CACHE_MAX_SIZE,
+    ttl_seconds=PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_principal(user_id: UUID) -> None:
+    """
+    Forget a cached principal.
+
+    Must be called whenever the user's credentials change or the account is removed.
+    """
+    principal_cache.invalidate(user_id)
@@ -0,0 +1,122 @@
+# Service layer for ratings of recommendations
+from decimal import Decimal
+
+from sqlalchemy import case, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+
+from .. import models, schemas
+from ..upsert import build_upsert, dialect_name
+from . import user_stats
+
+async def upsert_rating(
+    db: AsyncSession, user_id: UUID, recommendation_id: UUID, rating_data: schemas.RatingRequest
+) -> schemas.RatingResponse | None:
+    """
+    Creates or updates the user's rating of a recommendation.
+
+    Like reviews, the ownership check is folded into the INSERT ... SELECT, so
+    the write is one statement. It is preceded by a read of the old value, which
+    the user's statistics (see user_stats) need in the same transaction.
+
+    Args:
+        db: The async SQLAlchemy database session.
+        user_id: The UUID of the user rating the recommendation.
+        recommendation_id: The UUID of the recommendation being rated.
+        rating_data: The Pydantic model containing the rating value.
+
+    Returns:
+        The created or updated rating, or None if the recommendation does not belong to the user.
+    """
+    recommendation = models.Recommendation
+    source = select(recommendation.id, recommendation.user_id, literal(rating_data.rating)).where(
+        recommendation.id == recommendation_id, recommendation.user_id == user_id
+    )
+    statement = build_upsert(
+        dialect_name(db),
+        models.RecommendationRating,
+        index_elements=["recommendation_id"],
+        update_columns=["rating"],
+        from_select=(["recommendation_id", "user_id", "rating"], source),
+    )
+    previous = await _lock_ratings(db, user_id, [recommendation_id])
+    row = (await db.execute(statement)).first()
+    if row is not None:
+        await _record_rating_changes(db, user_id, previous, [row])
+    await db.commit()
+    return schemas.RatingResponse.model_validate(row, from_attributes=True) if row else None
+
+async def _lock_ratings(db: AsyncSession, user_id: UUID, recommendation_ids: list[UUID]) -> dict[UUID, Decimal]:
+    """
+    The user's current ratings of these recommendations, locked until commit.
+
+    Their old values are what the statistics need to adjust the rating sum.
+    The user's statistics row is locked first: row locks only cover ratings
+    that exist, so two concurrent first ratings would otherwise both count as new.
+    """
+    await user_stats.lock_user_stats(db, user_id)
+    rating = models.RecommendationRating
+    rows = await db.execute(
+        select(rating.recommendation_id, rating.rating)
+        .where(rating.recommendation_id.in_(recommendation_ids), rating.user_id == user_id)
+        .with_for_update()
+    )
+    return dict(rows.all())
+
+async def _record_rating_changes(db: AsyncSession, user_id: UUID, previous: dict[UUID, Decimal], rows) -> None:
+    new_ratings = sum(1 for row in rows if row.recommendation_id not in previous)
+    rating_sum = sum(Decimal(str(row.rating)) - previous.get(row.recommendation_id, Decimal(0)) for row in rows)
+    if rows:
+        await user_stats.record_changes(db, user_id, ratings=new_ratings, rating_sum=rating_sum)
+
+async def upsert_ratings(
+    db: AsyncSession, user_id: UUID, items: list[schemas.RatingBatchItem]
+) -> schemas.RatingBatchResponse:
+    """
+    Creates or updates many ratings of the user's recommendations in one transaction.
+
+    The same single INSERT ... SELECT ... ON CONFLICT DO UPDATE as upsert_rating(),
+    over all items at once: each recommendation's value is picked by a CASE on its
+    id, and recommendations that do not belong to the user are simply not selected.
+
+    Args:
+        db: The async SQLAlchemy database session.
+        user_id: The UUID of the user rating the recommendations.
+        items: The ratings to set, at most one per recommendation.
+
+    Returns:
+        One result per item, in request order: created, updated, or
+        invalid_recommendation if it does not exist or belongs to someone else.
+    """
+    recommendation = models.Recommendation
+    ratings = {item.recommendation_id: item.rating for item in items}
+    source = select(
+        recommendation.id, recommendation.user_id, case(ratings, value=recommendation.id)
+    ).where(recommendation.id.in_(list(ratings)), recommendation.user_id == user_id)
+    statement = build_upsert(
+        dialect_name(db),
+        models.RecommendationRating,
+        index_elements=["recommendation_id"],
+        update_columns=["rating"],
+        from_select=(["recommendation_id", "user_id", "rating"], source),
+    )
+    previous = await _lock_ratings(db, user_id, list(ratings))
+    rows = {row.recommendation_id: row for row in (await db.execute(statement)).all()}
+    await _record_rating_changes(db, user_id, previous, list(rows.values()))
+    await db.commit()
+
+    results = []
+    for item in items:
+        row = rows.get(item.recommendation_id)
+        if row is None:
+            results.append(schemas.RatingBatchItemResult(
+                recommendation_id=item.recommendation_id, status="invalid_recommendation"
+            ))
+            continue
+        status = "updated" if item.recommendation_id in previous else "created"
+        results.append(schemas.RatingBatchItemResult(
+            recommendation_id=item.recommendation_id,
+            status=status,
+            rating=schemas.RatingResponse.model_validate(row, from_attributes=True),
+        ))
+    return schemas.RatingBatchResponse(results=results)
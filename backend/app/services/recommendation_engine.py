@@ -0,0 +1,411 @@
+# Content-based recommendation engine: TF-IDF over the books catalog, scored in memory
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
+from functools import lru_cache
+from typing import Iterable, Mapping, NamedTuple, Sequence
+from uuid import UUID
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models
+
+# Terms are hashed into a fixed feature space, so new books never need a vocabulary rebuild
+N_FEATURES = 1 << 18
+# Relative weight of each book field in the document vector
+TITLE_WEIGHT = 2.0
+GENRE_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+# Share of the user profile coming from the free-text preferences (the rest is the library)
+PREFERENCES_WEIGHT = 0.5
+# Terms found in more than this share of books are ignored (like scikit-learn's max_df)
+MAX_DOCUMENT_FREQUENCY = 0.5
+# Only the strongest profile terms are scored; this bounds the posting lists walked per user
+MAX_PROFILE_TERMS = 64
+# Seconds between incremental catalog refreshes of the shared index
+REFRESH_SECONDS = float(os.getenv("RECOMMENDATION_INDEX_REFRESH_SECONDS", "300"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]{2,}")
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have he her his in is it its of on or she that the their "
+    "this to was were will with you your i me my we our they them not but so if about into".split()
+)
+
+
+class BookText(NamedTuple):
+    """The catalog columns the engine reads for one book."""
+
+    id: UUID
+    title: str | None
+    author: str | None
+    genre: str | None
+    description: str | None
+    updated_at: datetime | None
+
+
+@lru_cache(maxsize=1 << 20)
+def _feature(token: str) -> int:
+    # crc32 rather than hash(): feature ids must be stable across processes and restarts
+    return zlib.crc32(token.encode()) & (N_FEATURES - 1)
+
+
+def term_frequencies(fields: Iterable[tuple[str | None, float]]) -> dict[int, float]:
+    """
+    Tokenize weighted text fields into sublinear term frequencies keyed by feature id.
+
+    Args:
+        fields: (text, weight) pairs; None texts are skipped.
+
+    Returns:
+        {feature id: 1 + log(weighted count)}
+    """
+    counts: dict[int, float] = {}
+    for text, weight in fields:
+        if not text:
+            continue
+        for token in _TOKEN_RE.findall(text.lower()):
+            if token not in STOP_WORDS:
+                feature = _feature(token)
+                counts[feature] = counts.get(feature, 0.0) + weight
+    return {feature: 1.0 + math.log(count) for feature, count in counts.items()}
+
+
+def book_fields(book: BookText) -> tuple[tuple[str | None, float], ...]:
+    return (
+        (book.title, TITLE_WEIGHT),
+        (book.genre, GENRE_WEIGHT),
+        (book.description, DESCRIPTION_WEIGHT),
+    )
+
+
+def _to_csr(rows: Sequence[dict[int, float]]) -> sparse.csr_matrix:
+    """Stack {feature: value} rows into a CSR matrix of shape (len(rows), N_FEATURES)."""
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(row) for row in rows])
+    indices = np.fromiter((f for row in rows for f in row.keys()), dtype=np.int32, count=indptr[-1])
+    data = np.fromiter((v for row in rows for v in row.values()), dtype=np.float32, count=indptr[-1])
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(rows), N_FEATURES))
+
+
+def _normalize_rows(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    """L2-normalize every row of a CSR matrix; all-zero rows stay zero."""
+    matrix = sparse.csr_matrix(matrix, dtype=np.float32, copy=True)
+    row_of_entry = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    norms = np.sqrt(np.bincount(row_of_entry, weights=matrix.data**2, minlength=matrix.shape[0]))
+    norms[norms == 0] = 1.0
+    matrix.data /= norms[row_of_entry].astype(np.float32)
+    return matrix
+
+
+def _prune(vector: sparse.csr_matrix, max_terms: int) -> sparse.csr_matrix:
+    """Keep the `max_terms` largest entries of a 1 x N row vector."""
+    if vector.nnz <= max_terms:
+        return vector
+    keep = np.argpartition(vector.data, -max_terms)[-max_terms:]
+    return sparse.csr_matrix(
+        (vector.data[keep], vector.indices[keep], [0, max_terms]), shape=vector.shape
+    )
+
+
+class _IndexState(NamedTuple):
+    """
+    Immutable snapshot of the index; replaced as a whole so readers never see a half-update.
+
+    `book_ids` and `row_of` only need sequence/mapping lookups, so a memory-mapped
+    catalog snapshot can provide them without per-book Python objects. `tf` is
+    None for such read-only states.
+    """
+
+    book_ids: Sequence[UUID]
+    row_of: Mapping[UUID, int]
+    tf: sparse.csr_matrix | None
+    idf: np.ndarray
+    matrix: sparse.csr_matrix
+    postings: sparse.csr_matrix
+
+
+def _build_state(book_ids: list[UUID], tf: sparse.csr_matrix) -> _IndexState:
+    # Smoothed IDF over the current catalog, as in scikit-learn's TfidfTransformer
+    document_frequency = np.bincount(tf.indices, minlength=N_FEATURES)
+    n_books = tf.shape[0]
+    idf = (np.log((1 + n_books) / (1 + document_frequency)) + 1).astype(np.float32)
+    # Terms in most of the catalog say nothing about a book but dominate scoring cost
+    # (skipped for tiny catalogs, where every term is "frequent")
+    if n_books >= 100:
+        idf[document_frequency > MAX_DOCUMENT_FREQUENCY * n_books] = 0
+    weighted = tf.copy()
+    weighted.data *= idf[weighted.indices]
+    weighted.eliminate_zeros()
+    matrix = _normalize_rows(weighted)
+    return _IndexState(
+        book_ids=book_ids,
+        row_of={book_id: row for row, book_id in enumerate(book_ids)},
+        tf=tf,
+        idf=idf,
+        matrix=matrix,
+        # Feature -> books (postings): scoring walks only the rows of the profile terms
+        postings=matrix.T.tocsr(),
+    )
+
+
+class CatalogIndex:
+    """
+    TF-IDF matrix of the books catalog plus an inverted index for fast scoring.
+
+    Tokenizing is the expensive part, so raw term frequencies are kept per book
+    and only new or changed books are tokenized on refresh(); the IDF weights and
+    the normalized matrix are then recomputed with vectorized SciPy operations.
+
+    Scoring a user is one scatter-add of their (pruned) profile terms' posting
+    lists into a dense score vector, so the cost depends on those posting lists,
+    not on the catalog size. Books removed from the catalog are only dropped by
+    a full build().
+    """
+
+    def __init__(self) -> None:
+        empty = sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+        self._state = _build_state([], empty)
+        self.watermark: datetime | None = None
+        self.refreshed_at = 0.0
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def from_state(cls, state: _IndexState, watermark: datetime | None) -> "CatalogIndex":
+        """Wrap a prebuilt state, e.g. one backed by a memory-mapped catalog snapshot."""
+        index = cls()
+        index._state, index.watermark = state, watermark
+        index.refreshed_at = time.monotonic()
+        return index
+
+    def __len__(self) -> int:
+        return len(self._state.book_ids)
+
+    @property
+    def book_ids(self) -> Sequence[UUID]:
+        return self._state.book_ids
+
+    @property
+    def matrix(self) -> sparse.csr_matrix:
+        return self._state.matrix
+
+    def add_or_update(self, books: Iterable[BookText]) -> int:
+        """
+        Tokenize `books` and add them to the index, replacing earlier versions of the same ids.
+
+        Returns:
+            The number of books added or replaced.
+        """
+        books = list(books)
+        if not books:
+            return 0
+        new_rows = _to_csr([term_frequencies(book_fields(book)) for book in books])
+        new_ids = [book.id for book in books]
+
+        with self._write_lock:
+            state = self._state
+            if state.tf is None:
+                raise RuntimeError("This index is a read-only snapshot; write a new snapshot instead")
+            replaced = [state.row_of[book_id] for book_id in new_ids if book_id in state.row_of]
+            tf, book_ids = state.tf, list(state.book_ids)
+            if replaced:
+                keep = np.ones(len(book_ids), dtype=bool)
+                keep[replaced] = False
+                tf = tf[keep]
+                book_ids = [book_id for book_id, kept in zip(book_ids, keep) if kept]
+            self._state = _build_state(book_ids + new_ids, sparse.vstack([tf, new_rows], format="csr"))
+            stamps = [book.updated_at for book in books if book.updated_at is not None]
+            if stamps:
+                self.watermark = max([self.watermark, *stamps] if self.watermark else stamps)
+        return len(books)
+
+    def build(self, db: Session) -> None:
+        """Rebuild the whole index from the catalog."""
+        fresh = CatalogIndex()
+        fresh.add_or_update(load_books(db))
+        with self._write_lock:
+            self._state, self.watermark = fresh._state, fresh.watermark
+        self.refreshed_at = time.monotonic()
+
+    def refresh(self, db: Session) -> int:
+        """Index books created or updated since the last build/refresh; returns how many."""
+        changed = self.add_or_update(load_books(db, since=self.watermark))
+        self.refreshed_at = time.monotonic()
+        return changed
+
+    def vectorize_text(self, text: str | None) -> sparse.csr_matrix:
+        """Project free text into the catalog's TF-IDF space (1 x N_FEATURES, L2-normalized)."""
+        row = _to_csr([term_frequencies([(text, 1.0)])])
+        row.data *= self._state.idf[row.indices]
+        return _normalize_rows(row)
+
+    def profile(self, preferences_text: str | None, library_book_ids: Iterable[UUID]) -> sparse.csr_matrix:
+        """
+        Build a user's profile vector from their preferences text and library.
+
+        The library part is the centroid of the user's books' TF-IDF rows; the two
+        parts are blended with PREFERENCES_WEIGHT (a missing part gives its weight
+        to the other) and pruned to the MAX_PROFILE_TERMS strongest terms.
+        """
+        state = self._state
+        parts = []
+        if preferences_text:
+            parts.append((PREFERENCES_WEIGHT, self.vectorize_text(preferences_text)))
+        rows = [state.row_of[book_id] for book_id in library_book_ids if book_id in state.row_of]
+        if rows:
+            # Summing through COO keeps the centroid sparse (a dense 1 x N_FEATURES row is slow to build)
+            library = state.matrix[rows].tocoo()
+            centroid = sparse.csr_matrix(
+                (library.data, (np.zeros_like(library.row), library.col)), shape=(1, N_FEATURES)
+            )
+            parts.append((1.0 - PREFERENCES_WEIGHT, _normalize_rows(centroid)))
+        if not parts:
+            return sparse.csr_matrix((1, N_FEATURES), dtype=np.float32)
+        total_weight = sum(weight for weight, _ in parts)
+        vector = sum(vector * (weight / total_weight) for weight, vector in parts)
+        return _normalize_rows(_prune(sparse.csr_matrix(vector, dtype=np.float32), MAX_PROFILE_TERMS))
+
+    def top_k(
+        self,
+        profiles: sparse.csr_matrix,
+        exclude: Sequence[Iterable[UUID]],
+        k: int = 20,
+    ) -> list[list[tuple[UUID, float]]]:
+        """
+        Score a batch of profiles against the catalog and return each one's best books.
+
+        Args:
+            profiles: (n_users x N_FEATURES) matrix, one profile() per row.
+            exclude: Per profile, book ids that must not be returned.
+            k: Number of books per profile.
+
+        Returns:
+            Per profile, up to k (book_id, cosine similarity) pairs, best first.
+        """
+        state = self._state
+        results = []
+        for user_row, excluded_ids in enumerate(exclude):
+            start, end = profiles.indptr[user_row], profiles.indptr[user_row + 1]
+            terms, weights = profiles.indices[start:end], profiles.data[start:end]
+            # (terms x books) @ weights: every book's cosine similarity in one sparse product
+            scores = state.postings[terms].T @ weights
+            excluded_rows = [state.row_of[book_id] for book_id in excluded_ids if book_id in state.row_of]
+            scores[excluded_rows] = 0
+            best = np.argpartition(scores, -k)[-k:] if len(scores) > k else np.arange(len(scores))
+            best = best[scores[best] > 0]
+            best = best[np.argsort(-scores[best], kind="stable")]
+            results.append([(state.book_ids[row], float(scores[row])) for row in best])
+        return results
+
+    def recommend(
+        self,
+        preferences_text: str | None,
+        library_book_ids: Sequence[UUID],
+        exclude_book_ids: Iterable[UUID] = (),
+        k: int = 20,
+    ) -> list[tuple[UUID, float]]:
+        """Top-k books for one user; their library books are always excluded."""
+        profile = self.profile(preferences_text, library_book_ids)
+        return self.top_k(profile, [[*library_book_ids, *exclude_book_ids]], k)[0]
+
+
+def load_books(db: Session, since: datetime | None = None) -> Iterable[BookText]:
+    """Stream the catalog columns the engine needs, optionally only rows updated after `since`."""
+    book = models.Book
+    statement = select(book.id, book.title, book.author, book.genre, book.description, book.updated_at)
+    if since is not None:
+        statement = statement.where(book.updated_at > since)
+    for row in db.execute(statement.execution_options(yield_per=10_000)):
+        yield BookText(*row)
+
+
+class UserSignals(NamedTuple):
+    """What the engine needs to know about one user."""
+
+    preferences_text: str | None
+    library_book_ids: list[UUID]
+    recommended_book_ids: list[UUID]
+
+
+def load_user_signals(db: Session, user_id: UUID) -> UserSignals:
+    """Fetch a user's preferences text, library books and already recommended books."""
+    preferences_text = db.execute(
+        select(models.UserPreference.preferences_text).where(models.UserPreference.user_id == user_id)
+    ).scalar_one_or_none()
+    library = db.execute(
+        select(models.UserLibraryEntry.book_id).where(models.UserLibraryEntry.user_id == user_id)
+    ).scalars().all()
+    recommended = db.execute(
+        select(models.Recommendation.recommended_book_id).where(models.Recommendation.user_id == user_id)
+    ).scalars().all()
+    return UserSignals(preferences_text, list(library), list(recommended))
+
+
+def load_user_signals_bulk(db: Session, user_ids: Sequence[UUID]) -> dict[UUID, UserSignals]:
+    """load_user_signals() for many users at once: three queries per call, whatever the number of users."""
+    signals = {user_id: UserSignals(None, [], []) for user_id in user_ids}
+    preferences = db.execute(
+        select(models.UserPreference.user_id, models.UserPreference.preferences_text)
+        .where(models.UserPreference.user_id.in_(user_ids))
+    )
+    for user_id, preferences_text in preferences:
+        signals[user_id] = signals[user_id]._replace(preferences_text=preferences_text)
+    library = db.execute(
+        select(models.UserLibraryEntry.user_id, models.UserLibraryEntry.book_id)
+        .where(models.UserLibraryEntry.user_id.in_(user_ids))
+    )
+    for user_id, book_id in library:
+        signals[user_id].library_book_ids.append(book_id)
+    recommended = db.execute(
+        select(models.Recommendation.user_id, models.Recommendation.recommended_book_id)
+        .where(models.Recommendation.user_id.in_(user_ids))
+    )
+    for user_id, book_id in recommended:
+        signals[user_id].recommended_book_ids.append(book_id)
+    return signals
+
+
+def recommend_for_user(db: Session, index: CatalogIndex, user_id: UUID, k: int = 20) -> list[tuple[UUID, float]]:
+    """
+    Top-k new recommendations for a user.
+
+    Books already in the user's library or already recommended to them are excluded.
+    """
+    signals = load_user_signals(db, user_id)
+    return index.recommend(
+        signals.preferences_text, signals.library_book_ids, signals.recommended_book_ids, k
+    )
+
+
+# Process-wide index shared by the API and the background jobs
+catalog_index = CatalogIndex()
+_build_lock = threading.Lock()
+
+
+def get_catalog_index(db: Session) -> CatalogIndex:
+    """
+    Return the shared index, building it on first use and refreshing it
+    incrementally once it is older than RECOMMENDATION_INDEX_REFRESH_SECONDS.
+
+    When CATALOG_SNAPSHOT_PATH points at a snapshot file, the memory-mapped
+    snapshot is used instead, so all workers on a host share one copy.
+    """
+    from .catalog_snapshot import shared_snapshot_index
+
+    snapshot_index = shared_snapshot_index()
+    if snapshot_index is not None:
+        return snapshot_index
+    if catalog_index.refreshed_at and time.monotonic() - catalog_index.refreshed_at < REFRESH_SECONDS:
+        return catalog_index
+    with _build_lock:
+        if not catalog_index.refreshed_at:
+            catalog_index.build(db)
+        elif time.monotonic() - catalog_index.refreshed_at >= REFRESH_SECONDS:
+            catalog_index.refresh(db)
+    return catalog_index
@@ -0,0 +1,209 @@
+# Offline batch job: precompute recommendations for every user whose inputs changed
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Iterator
+from uuid import UUID
+
+from scipy import sparse
+from sqlalchemy import func, select, union
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..upsert import build_insert_ignore, build_upsert, dialect_name
+from .recommendation_engine import (
+    CatalogIndex,
+    UserSignals,
+    get_catalog_index,
+    load_user_signals_bulk,
+    recommend_for_user,
+)
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "recommendation_precompute"
+# Users per task handed to a worker process
+DEFAULT_CHUNK_SIZE = 1_000
+# Recommendations stored per user and run
+DEFAULT_K = 20
+DEFAULT_WORKERS = int(os.getenv("RECOMMENDATION_PRECOMPUTE_WORKERS", str(os.cpu_count() or 1)))
+
+# The catalog index the worker processes score against. It is set in the parent
+# before the pool forks, so every worker shares the parent's matrix pages
+# copy-on-write instead of receiving a pickled copy.
+_worker_index: CatalogIndex | None = None
+
+
+@dataclass
+class PrecomputeStats:
+    """Outcome of a precompute run."""
+
+    since: datetime | None = None
+    high_water: datetime | None = None
+    users_scored: int = 0
+    recommendations_inserted: int = 0
+    elapsed_seconds: float = 0.0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def score_chunk(chunk: list[tuple[UUID, UserSignals]], k: int) -> list[dict]:
+    """
+    Score one chunk of users against the shared index (runs in a worker process).
+
+    Returns:
+        Recommendation rows ({"user_id", "recommended_book_id"}) for the chunk.
+    """
+    index = _worker_index
+    profiles = sparse.vstack(
+        [index.profile(signals.preferences_text, signals.library_book_ids) for _, signals in chunk],
+        format="csr",
+    )
+    exclude = [[*signals.library_book_ids, *signals.recommended_book_ids] for _, signals in chunk]
+    results = index.top_k(profiles, exclude, k)
+    return [
+        {"user_id": user_id, "recommended_book_id": book_id}
+        for (user_id, _), books in zip(chunk, results)
+        for book_id, _score in books
+    ]
+
+
+def changed_users(since: datetime | None):
+    """SELECT of the ids of users whose preferences, library or ratings changed after `since` (all users if None)."""
+    if since is None:
+        return select(models.User.id.label("user_id"))
+    return union(
+        select(models.UserPreference.user_id).where(models.UserPreference.updated_at > since),
+        select(models.UserLibraryEntry.user_id).where(models.UserLibraryEntry.updated_at > since),
+        select(models.RecommendationRating.user_id).where(models.RecommendationRating.updated_at > since),
+    )
+
+
+def _user_chunks(db: Session, since: datetime | None, chunk_size: int) -> Iterator[list[UUID]]:
+    """Walk the changed users in user_id order, `chunk_size` at a time (keyset pagination)."""
+    users = changed_users(since).subquery()
+    last_id = None
+    while True:
+        statement = select(users.c.user_id).order_by(users.c.user_id).limit(chunk_size)
+        if last_id is not None:
+            statement = statement.where(users.c.user_id > last_id)
+        user_ids = db.execute(statement).scalars().all()
+        if not user_ids:
+            return
+        yield list(user_ids)
+        last_id = user_ids[-1]
+
+
+def store_recommendations(db: Session, rows: list[dict]) -> int:
+    """Insert recommendation rows, skipping ones the user already has; commits and returns the number inserted."""
+    if not rows:
+        return 0
+    statement = build_insert_ignore(
+        dialect_name(db), models.Recommendation, rows, index_elements=["user_id", "recommended_book_id"]
+    )
+    inserted = db.execute(statement).rowcount
+    db.commit()
+    return inserted
+
+
+def refresh_user_recommendations(db: Session, user_id: UUID, k: int = DEFAULT_K) -> dict:
+    """
+    Score one user now (outside the batch run) and store their new recommendations.
+
+    Returns:
+        {"recommendations_added": n}
+    """
+    index = get_catalog_index(db)
+    picks = recommend_for_user(db, index, user_id, k)
+    rows = [{"user_id": user_id, "recommended_book_id": book_id} for book_id, _score in picks]
+    return {"recommendations_added": store_recommendations(db, rows)}
+
+
+def _load_high_water(db: Session) -> datetime | None:
+    return db.execute(
+        select(models.JobWatermark.high_water).where(models.JobWatermark.job_name == JOB_NAME)
+    ).scalar_one_or_none()
+
+
+def _save_high_water(db: Session, high_water: datetime) -> None:
+    statement = build_upsert(
+        dialect_name(db),
+        models.JobWatermark,
+        index_elements=["job_name"],
+        update_columns=["high_water"],
+        values={"job_name": JOB_NAME, "high_water": high_water},
+    )
+    db.execute(statement)
+    db.commit()
+
+
+def precompute_recommendations(
+    db: Session,
+    workers: int = DEFAULT_WORKERS,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    k: int = DEFAULT_K,
+    full: bool = False,
+) -> PrecomputeStats:
+    """
+    Generate recommendations for users whose inputs changed since the last run.
+
+    The catalog index is built (or refreshed) once in this process; scoring is
+    sharded by user chunk across a forked process pool that shares the index
+    copy-on-write. Results are written with multi-row
+    INSERT ... ON CONFLICT (user_id, recommended_book_id) DO NOTHING, so a
+    rerun after a crash never duplicates rows. The high-water mark (database
+    time at the start of the run) is saved only when every chunk succeeded.
+
+    Args:
+        db: The SQLAlchemy session used for reads and writes.
+        workers: Worker processes; 1 scores in this process.
+        chunk_size: Users per task.
+        k: New recommendations per user.
+        full: Ignore the high-water mark and rescore every user.
+
+    Returns:
+        What was scored and written.
+    """
+    global _worker_index
+
+    started = time.perf_counter()
+    stats = PrecomputeStats(since=None if full else _load_high_water(db))
+    # Database time, so rows committed while the job runs are picked up next time
+    stats.high_water = db.execute(select(func.now())).scalar_one()
+    _worker_index = get_catalog_index(db)
+
+    def submit_chunks(submit) -> Iterator[Future | list[dict]]:
+        for user_ids in _user_chunks(db, stats.since, chunk_size):
+            signals = load_user_signals_bulk(db, user_ids)
+            stats.users_scored += len(user_ids)
+            yield submit([(user_id, signals[user_id]) for user_id in user_ids])
+
+    if workers <= 1:
+        for rows in submit_chunks(lambda chunk: score_chunk(chunk, k)):
+            stats.recommendations_inserted += store_recommendations(db, rows)
+    else:
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            pending: set[Future] = set()
+            for future in submit_chunks(lambda chunk: pool.submit(score_chunk, chunk, k)):
+                pending.add(future)
+                # Keep a couple of chunks queued per worker; never load every user up front
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for finished in done:
+                        stats.recommendations_inserted += store_recommendations(db, finished.result())
+            for finished in wait(pending).done:
+                stats.recommendations_inserted += store_recommendations(db, finished.result())
+
+    _save_high_water(db, stats.high_water)
+    stats.elapsed_seconds = time.perf_counter() - started
+    logger.info(
+        "Precomputed recommendations for %d users (%d new rows) in %.1fs",
+        stats.users_scored, stats.recommendations_inserted, stats.elapsed_seconds,
+    )
+    return stats
@@ -0,0 +1,79 @@
+# Service layer for the current user's recommendations
+from uuid import UUID
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models, schemas
+from ..conditional import weak_etag
+from ..pagination import CountMode, SortKey, count_rows, fetch_keyset_page, parse_datetime
+from ..serialization import page_payload, schema_columns, schema_fields
+
+# Newest recommendations first; matches idx_recommendations_user_created (user_id, created_at DESC, id DESC)
+RECOMMENDATION_SORT_KEY = SortKey(
+    "created_at",
+    (models.Recommendation.created_at, models.Recommendation.id),
+    (parse_datetime, UUID),
+    descending=True,
+)
+
+# Response fields, read straight from the joined columns (RecommendationResponse and its nested BookResponse)
+RECOMMENDATION_FIELDS = schema_fields(schemas.RecommendationResponse, exclude=("recommended_book",))
+BOOK_FIELDS = schema_fields(schemas.BookResponse)
+
+async def list_recommendations(
+    db: AsyncSession,
+    user_id: UUID,
+    cursor: str | None = None,
+    limit: int = 20,
+    count: CountMode = "none",
+) -> dict:
+    """
+    Lists the user's recommendations, newest first, one keyset page at a time.
+
+    Args:
+        db: The async SQLAlchemy database session.
+        user_id: The UUID of the user the books were recommended to.
+        cursor: Cursor returned with the previous page, if any.
+        limit: Page size.
+        count: Whether and how to compute the total number of recommendations.
+
+    Returns:
+        The requested page of recommendations with their books, shaped like
+        RecommendationListResponse but as plain data ready for JSON encoding.
+    """
+    recommendation = models.Recommendation
+    statement = select(recommendation.id).where(recommendation.user_id == user_id)
+    # One query returning plain column tuples: no ORM identity map, no per-item validation
+    page_statement = (
+        select(
+            *schema_columns(schemas.RecommendationResponse, recommendation, RECOMMENDATION_FIELDS),
+            *schema_columns(schemas.BookResponse, models.Book),
+        )
+        .join(recommendation.recommended_book)
+        .where(recommendation.user_id == user_id)
+    )
+    rows, next_cursor = await fetch_keyset_page(db, page_statement, RECOMMENDATION_SORT_KEY, cursor, limit, as_rows=True)
+    total, total_is_estimate = await count_rows(db, statement, count)
+    split = len(RECOMMENDATION_FIELDS)
+    items = [
+        {**dict(zip(RECOMMENDATION_FIELDS, row[:split])), "recommended_book": dict(zip(BOOK_FIELDS, row[split:]))}
+        for row in rows
+    ]
+    return page_payload(items, next_cursor, limit, total, total_is_estimate)
+
+async def recommendations_etag(db: AsyncSession, user_id: UUID) -> str:
+    """
+    Returns a weak ETag for the user's whole recommendation list, valid for every page of it.
+
+    Like library_service.library_etag(): the number of recommendations plus the
+    latest change to a recommendation or its book.
+    """
+    recommendation = models.Recommendation
+    statement = (
+        select(func.count(recommendation.id), func.max(recommendation.updated_at), func.max(models.Book.updated_at))
+        .join(recommendation.recommended_book)
+        .where(recommendation.user_id == user_id)
+    )
+    count, recommendations_changed, books_changed = (await db.execute(statement)).one()
+    return weak_etag("recommendations", user_id, count, recommendations_changed, books_changed)
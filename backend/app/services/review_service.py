@@ -0,0 +1,79 @@
+# Service layer for reviews of library entries
+from sqlalchemy import literal, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+
+from .. import models, schemas
+from ..conditional import weak_etag
+from ..upsert import build_upsert, dialect_name
+from . import user_stats
+
+async def upsert_review(
+    db: AsyncSession, user_id: UUID, entry_id: UUID, review_data: schemas.ReviewRequest
+) -> schemas.ReviewResponse | None:
+    """
+    Creates or updates the review of one of the user's library entries.
+
+    The row is inserted from a SELECT over the user's own library entries, so the
+    ownership check, the insert and the conflict update share a single statement.
+    Whether it created the review, which the user's statistics count, comes
+    from the statement itself on Postgres and from a locked check elsewhere.
+
+    Args:
+        db: The async SQLAlchemy database session.
+        user_id: The UUID of the user writing the review.
+        entry_id: The UUID of the library entry being reviewed.
+        review_data: The Pydantic model containing the review text.
+
+    Returns:
+        The created or updated review, or None if the entry does not belong to the user.
+    """
+    entry = models.UserLibraryEntry
+    source = select(entry.id, literal(review_data.review_text)).where(
+        entry.id == entry_id, entry.user_id == user_id
+    )
+    statement = build_upsert(
+        dialect_name(db),
+        models.Review,
+        index_elements=["user_library_entry_id"],
+        update_columns=["review_text"],
+        from_select=(["user_library_entry_id", "review_text"], source),
+    )
+    if dialect_name(db) == "postgresql":
+        # xmax is 0 only on a freshly inserted row version, never on one the conflict updated
+        row = (await db.execute(statement.returning(literal_column("xmax = 0").label("inserted")))).first()
+        inserted = row is not None and row.inserted
+    else:
+        # Without xmax, check for an existing review first; the statistics row
+        # lock taken before it keeps a concurrent first review from slipping in
+        await user_stats.lock_user_stats(db, user_id)
+        existing = await db.scalar(select(models.Review.id).where(models.Review.user_library_entry_id == entry_id))
+        row = (await db.execute(statement)).first()
+        inserted = row is not None and existing is None
+    if inserted:
+        await user_stats.record_changes(db, user_id, reviews=1)
+    await db.commit()
+    return schemas.ReviewResponse.model_validate(row, from_attributes=True) if row else None
+
+def review_etag(review: models.Review | schemas.ReviewResponse) -> str:
+    """The weak ETag of one version of a review."""
+    return weak_etag("review", review.id, review.updated_at)
+
+async def lock_review_etag(db: AsyncSession, user_id: UUID, entry_id: UUID) -> str | None:
+    """
+    Returns the ETag of the review on one of the user's library entries and locks
+    its row until the transaction ends, so an If-Match check and the following
+    write cannot interleave with another writer.
+
+    Returns:
+        The ETag, or None if the entry has no review (or is not the user's).
+    """
+    review, entry = models.Review, models.UserLibraryEntry
+    statement = (
+        select(review.id, review.updated_at)
+        .join(entry, entry.id == review.user_library_entry_id)
+        .where(entry.id == entry_id, entry.user_id == user_id)
+        .with_for_update(of=review)
+    )
+    row = (await db.execute(statement)).first()
+    return review_etag(row) if row else None
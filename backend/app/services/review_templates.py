@@ -0,0 +1,284 @@
+# AI review-template generation: pluggable backend, cached, coalesced and streamed
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from typing import AsyncIterator, NamedTuple, Protocol
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models
+from ..cache import TTLCache
+from ..metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# "stub" (default) or "openai", which also needs OPENAI_API_KEY and the optional `openai` package
+# (not in requirements.txt); the app refuses to start if the package is missing
+AI_REVIEW_BACKEND = os.getenv("AI_REVIEW_BACKEND", "stub")
+AI_REVIEW_MODEL = os.getenv("AI_REVIEW_MODEL", "gpt-4o-mini")
+# Upstream calls in flight at once per worker process; further requests wait for a slot
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+# Seconds a request may wait for a free slot before failing with 503
+AI_QUEUE_TIMEOUT_SECONDS = float(os.getenv("AI_QUEUE_TIMEOUT_SECONDS", "10"))
+# Upper bound for one whole generation, from the first byte to the last
+AI_TIMEOUT_SECONDS = float(os.getenv("AI_TIMEOUT_SECONDS", "30"))
+AI_TEMPLATE_CACHE_SIZE = int(os.getenv("AI_TEMPLATE_CACHE_SIZE", "1000"))
+AI_TEMPLATE_CACHE_TTL_SECONDS = float(os.getenv("AI_TEMPLATE_CACHE_TTL_SECONDS", "3600"))
+
+TEMPLATE_REQUESTS = REGISTRY.counter(
+    "shelfsense_ai_template_requests_total",
+    "Review-template requests by outcome (cache_hit, coalesced, generated, error)",
+    ("outcome",),
+)
+
+
+class BookContext(NamedTuple):
+    """What the backend is told about the book being reviewed."""
+
+    id: UUID
+    title: str
+    author: str
+    genre: str | None
+    description: str | None
+
+
+class ReviewTemplateBackend(Protocol):
+    """A text generator that streams the template in chunks."""
+
+    def stream(self, book: BookContext, notes: str | None) -> AsyncIterator[str]: ...
+
+
+class GenerationUnavailable(Exception):
+    """The backend is saturated or timed out; the client should retry later."""
+
+
+def _prompt(book: BookContext, notes: str | None) -> str:
+    lines = [
+        "Write a short review template (headings with one guiding question each) for this book.",
+        f"Title: {book.title}",
+        f"Author: {book.author}",
+    ]
+    if book.genre:
+        lines.append(f"Genre: {book.genre}")
+    if book.description:
+        lines.append(f"Description: {book.description}")
+    if notes:
+        lines.append(f"Reader's notes to build on: {notes}")
+    return "\n".join(lines)
+
+
+class StubBackend:
+    """
+    Deterministic local backend for development and tests: no network, no cost.
+
+    The same book and notes always give the same template, streamed word by word.
+    """
+
+    def __init__(self, chunk_delay: float = 0.0) -> None:
+        self.chunk_delay = chunk_delay
+        self.calls = 0
+
+    async def stream(self, book: BookContext, notes: str | None) -> AsyncIterator[str]:
+        self.calls += 1
+        template = (
+            f"# My review of {book.title} by {book.author}\n\n"
+            "## First impressions\nWhat did you expect, and did the book meet it?\n\n"
+            f"## {'Worldbuilding' if (book.genre or '').lower() in ('fantasy', 'science fiction') else 'Story'}\n"
+            "What stood out, and what fell flat?\n\n"
+            "## Characters\nWho stayed with you after the last page?\n\n"
+            + (f"## Notes\n{notes.strip()}\n\n" if notes and notes.strip() else "")
+            + "## Verdict\nWho would you recommend it to?\n"
+        )
+        for chunk in re.findall(r"\S+\s*", template):
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            yield chunk
+
+
+class OpenAIBackend:
+    """Streams a chat completion from the OpenAI API (needs the `openai` package and OPENAI_API_KEY)."""
+
+    def __init__(self, model: str = AI_REVIEW_MODEL) -> None:
+        try:
+            from openai import AsyncOpenAI
+        except ImportError as exc:
+            raise RuntimeError("AI_REVIEW_BACKEND=openai requires the openai package") from exc
+        # Retries would multiply latency behind our own timeout; fail fast instead
+        self._client = AsyncOpenAI(max_retries=0, timeout=AI_TIMEOUT_SECONDS)
+        self.model = model
+
+    async def stream(self, book: BookContext, notes: str | None) -> AsyncIterator[str]:
+        response = await self._client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": _prompt(book, notes)}],
+            stream=True,
+        )
+        async for event in response:
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
+
+
+def normalize_notes(notes: str | None) -> str:
+    """Case- and whitespace-insensitive form of the notes, so trivial edits share a cache entry."""
+    return " ".join((notes or "").lower().split())
+
+
+def cache_key(book_id: UUID, notes: str | None) -> tuple[UUID, str]:
+    return book_id, hashlib.sha256(normalize_notes(notes).encode()).hexdigest()
+
+
+class _Generation:
+    """One upstream call, whose chunks are replayed to every request that joined it."""
+
+    def __init__(self) -> None:
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: Exception | None = None
+        self._changed = asyncio.Condition()
+
+    async def publish(self, chunk: str | None = None, *, done: bool = False, error: Exception | None = None) -> None:
+        async with self._changed:
+            if chunk:
+                self.chunks.append(chunk)
+            self.done = self.done or done
+            self.error = self.error or error
+            self._changed.notify_all()
+
+    async def follow(self) -> AsyncIterator[str]:
+        """Yield all chunks from the beginning, then new ones as they arrive."""
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.chunks) > position or self.done)
+                new_chunks, finished, error = self.chunks[position:], self.done, self.error
+            for chunk in new_chunks:
+                yield chunk
+            position += len(new_chunks)
+            if finished and position == len(self.chunks):
+                if error is not None:
+                    raise error
+                return
+
+
+class ReviewTemplateService:
+    """
+    Generates review templates through a backend with three cost/latency guards:
+
+    - results are cached per (book, normalized notes) with LRU + TTL eviction;
+    - identical requests in flight share one upstream call (coalescing);
+    - at most `max_concurrency` upstream calls run at once, each bounded by `timeout`.
+
+    The upstream call runs in its own task, so a client disconnecting mid-stream
+    neither cancels it for the other listeners nor loses the cacheable result.
+    """
+
+    def __init__(
+        self,
+        backend: ReviewTemplateBackend,
+        cache: TTLCache | None = None,
+        max_concurrency: int = AI_MAX_CONCURRENCY,
+        queue_timeout: float = AI_QUEUE_TIMEOUT_SECONDS,
+        timeout: float = AI_TIMEOUT_SECONDS,
+    ) -> None:
+        self.backend = backend
+        self.cache = cache or TTLCache(maxsize=AI_TEMPLATE_CACHE_SIZE, ttl_seconds=AI_TEMPLATE_CACHE_TTL_SECONDS)
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._in_flight: dict[tuple[UUID, str], _Generation] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def stream(self, book: BookContext, notes: str | None) -> AsyncIterator[str]:
+        """
+        Yield the template in chunks as they are generated (the whole text at once on a cache hit).
+
+        Raises:
+            GenerationUnavailable: If no upstream slot frees up in time or the backend times out.
+        """
+        key = cache_key(book.id, notes)
+        cached = self.cache.get(key)
+        if cached is not None:
+            TEMPLATE_REQUESTS.inc("cache_hit")
+            yield cached
+            return
+
+        generation = self._in_flight.get(key)
+        if generation is not None:
+            TEMPLATE_REQUESTS.inc("coalesced")
+        else:
+            generation = self._in_flight[key] = _Generation()
+            task = asyncio.create_task(self._generate(key, generation, book, notes))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        async for chunk in generation.follow():
+            yield chunk
+
+    async def generate(self, book: BookContext, notes: str | None) -> str:
+        """Return the complete template."""
+        return "".join([chunk async for chunk in self.stream(book, notes)])
+
+    async def _generate(self, key, generation: _Generation, book: BookContext, notes: str | None) -> None:
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise GenerationUnavailable("Too many review templates are being generated, please retry")
+            try:
+                async with asyncio.timeout(self.timeout):
+                    async for chunk in self.backend.stream(book, notes):
+                        await generation.publish(chunk)
+            except TimeoutError:
+                raise GenerationUnavailable("Review template generation timed out")
+            finally:
+                self._slots.release()
+            self.cache.set(key, "".join(generation.chunks))
+            TEMPLATE_REQUESTS.inc("generated")
+            await generation.publish(done=True)
+        except Exception as exc:
+            if not isinstance(exc, GenerationUnavailable):
+                logger.exception("Review template backend failed")
+            TEMPLATE_REQUESTS.inc("error")
+            await generation.publish(done=True, error=exc)
+        finally:
+            self._in_flight.pop(key, None)
+
+
+def _create_backend(name: str = AI_REVIEW_BACKEND) -> ReviewTemplateBackend:
+    if name == "openai":
+        return OpenAIBackend()
+    if name == "stub":
+        return StubBackend()
+    raise RuntimeError(f"Unknown AI_REVIEW_BACKEND {name!r}, expected 'stub' or 'openai'")
+
+
+_service: ReviewTemplateService | None = None
+
+
+def get_review_template_service() -> ReviewTemplateService:
+    """The process-wide service, created on first use (FastAPI dependency; override it in tests)."""
+    global _service
+    if _service is None:
+        _service = ReviewTemplateService(_create_backend())
+    return _service
+
+
+async def load_book_context(db: AsyncSession, book_id: UUID) -> BookContext:
+    """
+    Fetch the book fields the prompt needs.
+
+    Raises:
+        HTTPException(404): If the book does not exist.
+    """
+    book = models.Book
+    row = (await db.execute(
+        select(book.id, book.title, book.author, book.genre, book.description).where(book.id == book_id)
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    return BookContext(*row)
@@ -0,0 +1,185 @@
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app import models
+from app.main import app
+from app.models import SessionLocal
+from app.services import auth_service, book_duplicates
+from app.services.book_duplicates import DuplicateIndex, author_key, title_key
+
+
+# (value, expected key); the SQL functions the bulk import dedupes by must agree
+TITLE_KEYS = [
+    ("The Hobbit", "hobbit"), ("Hobbit, The", "hobbit"), ("the HOBBIT!", "hobbit"), ("  Hobbit ,  the ", "hobbit"),
+    ("A Wizard of Earthsea", "wizard of earthsea"), ("Wizard of Earthsea, A", "wizard of earthsea"),
+    ("The Lord of the Rings: Fellowship", "lord of the rings fellowship"), ("Theory", "theory"), ("The", "the"),
+    ("", ""), (None, ""),
+]
+AUTHOR_KEYS = [
+    ("J.R.R. Tolkien", "jrr tolkien"), ("Tolkien, J. R. R.", "jrr tolkien"), ("JRR TOLKIEN", "jrr tolkien"),
+    ("Le Guin, Ursula K.", "guin k le ursula"), ("Ursula K. Le Guin", "guin k le ursula"),
+    ("Frank Herbert", "frank herbert"), ("", ""), (None, ""),
+]
+
+
+def test_keys_ignore_articles_casing_and_name_order():
+    assert [title_key(title) for title, _ in TITLE_KEYS] == [key for _, key in TITLE_KEYS]
+    assert [author_key(author) for author, _ in AUTHOR_KEYS] == [key for _, key in AUTHOR_KEYS]
+
+
+@pytest.mark.skipif(models.engine.dialect.name != "postgresql", reason="The SQL keys need Postgres (set TEST_DATABASE_URL)")
+def test_sql_keys_match_the_python_keys():
+    with SessionLocal() as db:
+        for title, key in TITLE_KEYS:
+            assert db.execute(text("SELECT shelfsense.book_title_key(:title)"), {"title": title}).scalar_one() == key
+        for author, key in AUTHOR_KEYS:
+            assert db.execute(text("SELECT shelfsense.book_author_key(:author)"), {"author": author}).scalar_one() == key
+        norm_key = db.execute(text("SELECT shelfsense.book_norm_key('Hobbit, The', 'Tolkien, J. R. R.')")).scalar_one()
+    assert norm_key == f"{title_key('The Hobbit')}|{author_key('J.R.R. Tolkien')}"
+
+
+def test_index_matches_near_duplicates_only():
+    index = DuplicateIndex()
+    hobbit, volume_one = uuid.uuid4(), uuid.uuid4()
+    index.add(hobbit, "The Hobbit", "J.R.R. Tolkien")
+    index.add(volume_one, "Chronicles Volume 1", "Ann Author")
+    index.add(uuid.uuid4(), "The Silmarillion", "J.R.R. Tolkien")
+
+    assert index.match("Hobbit, The", "tolkien, j.r.r.").book_id == hobbit
+    # A typo in the author is found through the title, and judged by the threshold
+    assert index.match("The Hobbit", "J.R.R. Tolkein") is None
+    assert index.match("The Hobbit", "J.R.R. Tolkein", threshold=0.5).book_id == hobbit
+    assert index.match("Chronicles Volume 2", "Ann Author") is None
+    assert index.match("Unfinished Tales", "J.R.R. Tolkien") is None
+
+    index.discard(hobbit)
+    assert index.match("The Hobbit", "J.R.R. Tolkien") is None
+    assert len(index) == 2
+
+
+def test_stale_index_is_refreshed_off_the_calling_thread(monkeypatch):
+    refreshed_on = []
+    done = threading.Event()
+
+    def refresh(self, db):
+        refreshed_on.append(threading.current_thread())
+        done.set()
+        return 0
+
+    monkeypatch.setattr(DuplicateIndex, "refresh", refresh)
+    stale = time.monotonic() - book_duplicates.BOOK_DUPLICATE_INDEX_REFRESH_SECONDS - 1
+    monkeypatch.setattr(book_duplicates.duplicate_index, "refreshed_at", stale)
+    # The caller gets the current snapshot right away
+    assert book_duplicates.get_duplicate_index() is book_duplicates.duplicate_index
+    assert done.wait(timeout=5)
+    assert refreshed_on == [refreshed_on[0]] and refreshed_on[0] is not threading.current_thread()
+    with book_duplicates._build_lock:
+        pass
+
+
+@pytest.fixture
+def reader():
+    db = SessionLocal()
+    user = models.User(email=f"dupes-{uuid.uuid4().hex}@example.com", username="dupes", password_hash="x" * 60)
+    db.add(user)
+    db.commit()
+    context = {"user_id": user.id, "headers": {"Authorization": f"Bearer {auth_service.create_access_token(user)}"}}
+    db.close()
+    yield context
+    db = SessionLocal()
+    db.query(models.User).filter(models.User.id == context["user_id"]).delete()
+    db.commit()
+    db.close()
+
+
+def test_create_book_rejects_merges_or_creates_duplicates(reader):
+    marker = uuid.uuid4().hex[:12]
+    created_ids = []
+    try:
+        with TestClient(app) as client:
+            response = client.post("/books", json={"title": f"The Quiet {marker}", "author": "Ann Leckie", "genre": "sci-fi"}, headers=reader["headers"])
+            assert response.status_code == 201
+            book = response.json()
+            created_ids.append(uuid.UUID(book["id"]))
+            assert book["genre"] == "Science Fiction" and book["genre_id"] is not None
+
+            duplicate = {"title": f"Quiet {marker}, The", "author": "LECKIE, ANN"}
+            response = client.post("/books", json=duplicate, headers=reader["headers"])
+            assert response.status_code == 409
+            assert response.json()["duplicate_of"]["id"] == book["id"] and response.json()["similarity"] == 1.0
+
+            response = client.post("/books", params={"on_duplicate": "merge"}, json=duplicate, headers=reader["headers"])
+            assert response.status_code == 200 and response.json()["id"] == book["id"]
+
+            response = client.post("/books", params={"on_duplicate": "create"}, json=duplicate, headers=reader["headers"])
+            assert response.status_code == 201
+            created_ids.append(uuid.UUID(response.json()["id"]))
+
+            assert client.post("/books", json=duplicate).status_code == 401
+    finally:
+        with SessionLocal() as db:
+            db.query(models.Book).filter(models.Book.id.in_(created_ids)).delete()
+            db.commit()
+
+
+def test_merge_moves_library_entries_and_recommendations(reader):
+    user_id = reader["user_id"]
+    with SessionLocal() as db:
+        other = models.User(email=f"dupes-{uuid.uuid4().hex}@example.com", username="dupes", password_hash="x" * 60)
+        survivor = models.Book(title="The Left Hand of Darkness", author="Ursula K. Le Guin", genre="Science Fiction")
+        duplicate = models.Book(title="Left Hand of Darkness, The", author="le guin, ursula k.", genre="Science Fiction")
+        db.add_all([other, survivor, duplicate])
+        db.flush()
+        # The reader has both books, reviewed only the duplicate; the other user only has the duplicate
+        kept_entry = models.UserLibraryEntry(user_id=user_id, book_id=survivor.id)
+        dropped_entry = models.UserLibraryEntry(user_id=user_id, book_id=duplicate.id)
+        moved_entry = models.UserLibraryEntry(user_id=other.id, book_id=duplicate.id)
+        db.add_all([kept_entry, dropped_entry, moved_entry])
+        db.flush()
+        db.add(models.Review(user_library_entry_id=dropped_entry.id, review_text="Still great"))
+        kept_recommendation = models.Recommendation(user_id=user_id, recommended_book_id=survivor.id)
+        dropped_recommendation = models.Recommendation(user_id=user_id, recommended_book_id=duplicate.id)
+        db.add_all([kept_recommendation, dropped_recommendation])
+        db.flush()
+        db.add(models.RecommendationRating(recommendation_id=dropped_recommendation.id, user_id=user_id, rating=Decimal("4.5")))
+        db.commit()
+        ids = {
+            "other": other.id, "survivor": survivor.id, "duplicate": duplicate.id,
+            "kept_entry": kept_entry.id, "moved_entry": moved_entry.id, "kept_recommendation": kept_recommendation.id,
+        }
+
+    try:
+        with SessionLocal() as db:
+            # Created in one transaction, so which one is older (the survivor) comes down to the id
+            clusters = book_duplicates.find_duplicate_clusters(db)
+            assert clusters.get(ids["survivor"]) == [ids["duplicate"]] or clusters.get(ids["duplicate"]) == [ids["survivor"]]
+            stats = book_duplicates.merge_clusters(db, {ids["survivor"]: [ids["duplicate"]]})
+        assert (stats.books_merged, stats.library_entries_moved, stats.library_entries_dropped) == (1, 1, 1)
+        assert (stats.recommendations_moved, stats.recommendations_dropped, stats.users_affected) == (0, 1, 2)
+
+        with SessionLocal() as db:
+            assert db.get(models.Book, ids["duplicate"]) is None
+            entries = db.query(models.UserLibraryEntry).filter(models.UserLibraryEntry.book_id == ids["survivor"]).all()
+            assert {entry.id for entry in entries} == {ids["kept_entry"], ids["moved_entry"]}
+            review = db.query(models.Review).filter(models.Review.user_library_entry_id == ids["kept_entry"]).one()
+            assert review.review_text == "Still great"
+            rating = db.query(models.RecommendationRating).filter(
+                models.RecommendationRating.recommendation_id == ids["kept_recommendation"]
+            ).one()
+            assert rating.rating == Decimal("4.5")
+            stats_row = db.get(models.UserStats, user_id)
+            assert (stats_row.library_entries, stats_row.reviews, stats_row.ratings) == (1, 1, 1)
+    finally:
+        with SessionLocal() as db:
+            db.query(models.User).filter(models.User.id == ids["other"]).delete()
+            books = [ids["survivor"], ids["duplicate"]]
+            db.query(models.UserLibraryEntry).filter(models.UserLibraryEntry.book_id.in_(books)).delete()
+            db.query(models.Recommendation).filter(models.Recommendation.recommended_book_id.in_(books)).delete()
+            db.query(models.Book).filter(models.Book.id.in_(books)).delete()
+            db.commit()
@@ -0,0 +1,135 @@
+import io
+import json
+import os
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import dependencies, models
+from app.main import app
+from app.routers import admin
+from app.services import book_import
+from app.services.book_import import _validate, iter_records, normalize_isbn
+
+# The pipeline COPYs into a temporary table and calls shelfsense.book_norm_key(),
+# so it only runs against Postgres: point TEST_DATABASE_URL at a disposable one
+postgres_only = pytest.mark.skipif(
+    models.engine.dialect.name != "postgresql", reason="The bulk import needs Postgres (set TEST_DATABASE_URL)"
+)
+
+
+def test_normalize_isbn_strips_separators():
+    assert normalize_isbn("978-0-261-10235-4") == "9780261102354"
+    assert normalize_isbn("0 261 10235 x") == "026110235X"
+    assert normalize_isbn("") is None
+
+
+def test_iter_records_reads_csv_and_jsonl_lazily():
+    csv_stream = io.StringIO("title,author,isbn\nDune,Frank Herbert,978-0441013593\n")
+    assert list(iter_records(csv_stream, "csv")) == [
+        {"title": "Dune", "author": "Frank Herbert", "isbn": "978-0441013593"}
+    ]
+
+    jsonl_stream = io.StringIO('{"title": "Dune", "author": "Frank Herbert"}\n\nnot json\n')
+    assert list(iter_records(jsonl_stream, "jsonl")) == [{"title": "Dune", "author": "Frank Herbert"}, {}]
+
+
+def test_validate_treats_empty_cells_as_missing():
+    book = _validate({"title": "Dune", "author": "Frank Herbert", "isbn": "", "page_count": ""})
+    assert book.isbn is None
+    assert book.page_count is None
+
+
+@pytest.mark.parametrize("record", [{}, {"title": " ", "author": "Frank Herbert"}, {"title": "Dune", "author": "F", "isbn": "12345678901234"}])
+def test_validate_rejects_bad_rows(record):
+    with pytest.raises(ValueError):
+        _validate(record)
+
+
+def test_upload_checkpoints_are_keyed_by_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(admin, "BOOK_IMPORT_CHECKPOINT_DIR", str(tmp_path))
+    first, same, other = io.BytesIO(b"title,author\nDune,Frank Herbert\n"), io.BytesIO(b"title,author\nDune,Frank Herbert\n"), io.BytesIO(b"x")
+    path = admin.checkpoint_path_for(first)
+    assert path == admin.checkpoint_path_for(same) != admin.checkpoint_path_for(other)
+    assert os.path.dirname(path) == str(tmp_path)
+    # The upload is rewound for the import that follows
+    assert first.read().startswith(b"title,author")
+
+
+@pytest.fixture
+def marker():
+    """Tags the imported books (title suffix and ISBN prefix) so they can be found and removed."""
+    marker = f"{uuid.uuid4().int % 10**6:06d}"
+    yield marker
+    with models.SessionLocal() as db:
+        db.query(models.Book).filter(models.Book.title.like(f"% {marker}")).delete(synchronize_session=False)
+        db.commit()
+
+
+def _books(marker: str) -> dict[str, models.Book]:
+    with models.SessionLocal() as db:
+        return {book.title: book for book in db.query(models.Book).filter(models.Book.title.like(f"% {marker}"))}
+
+
+@postgres_only
+def test_import_inserts_new_books_and_skips_known_ones(marker):
+    rows = [
+        {"title": f"Dune {marker}", "author": "Frank Herbert", "isbn": f"978{marker}0001", "genre": "sci-fi"},
+        {"title": f"Emma {marker}", "author": "Jane Austen", "isbn": f"978{marker}0002"},
+        # Duplicates inside the file: by ISBN, and by normalized title+author
+        {"title": f"Dune Again {marker}", "author": "Frank Herbert", "isbn": f"978-{marker}-0001"},
+        {"title": f"EMMA! {marker}", "author": "jane austen"},
+        {"title": "", "author": "Nobody"},
+    ]
+    first = book_import.import_books(models.engine, io.StringIO("".join(json.dumps(row) + "\n" for row in rows)), "jsonl")
+    assert (first.rows_read, first.rows_inserted, first.rows_duplicate, first.rows_invalid) == (5, 2, 2, 1)
+    books = _books(marker)
+    assert set(books) == {f"Dune {marker}", f"Emma {marker}"}
+    assert books[f"Dune {marker}"].genre == "Science Fiction" and books[f"Dune {marker}"].genre_id is not None
+
+    # Importing again only adds what the catalog does not have yet
+    rows.append({"title": f"Persuasion {marker}", "author": "Jane Austen"})
+    second = book_import.import_books(models.engine, io.StringIO("".join(json.dumps(row) + "\n" for row in rows)), "jsonl")
+    assert (second.rows_inserted, second.rows_duplicate, second.rows_invalid) == (1, 4, 1)
+    assert set(_books(marker)) == {f"Dune {marker}", f"Emma {marker}", f"Persuasion {marker}"}
+
+
+@postgres_only
+def test_interrupted_import_resumes_from_its_checkpoint(marker, tmp_path):
+    lines = ["title,author\n"] + [f"Book {n} {marker},Author {n}\n" for n in range(250)]
+    checkpoint = str(tmp_path / "import.checkpoint")
+
+    def failing_stream():
+        # The connection to the source drops in the middle of the second batch
+        for number, line in enumerate(lines):
+            if number == 180:
+                raise OSError("source went away")
+            yield line
+
+    with pytest.raises(OSError):
+        book_import.import_books(models.engine, failing_stream(), "csv", batch_size=100, checkpoint_path=checkpoint)
+    with open(checkpoint) as saved:
+        assert json.load(saved) == {"rows_done": 100}
+    assert len(_books(marker)) == 100
+
+    stats = book_import.import_books(models.engine, io.StringIO("".join(lines)), "csv", batch_size=100, checkpoint_path=checkpoint)
+    assert (stats.resumed_from_row, stats.rows_inserted, stats.rows_duplicate) == (100, 150, 0)
+    assert len(_books(marker)) == 250
+    assert not os.path.exists(checkpoint)
+
+
+@postgres_only
+def test_admin_endpoint_imports_an_upload(marker, tmp_path, monkeypatch):
+    monkeypatch.setattr(dependencies, "ADMIN_API_TOKEN", "test-admin-token")
+    monkeypatch.setattr(admin, "BOOK_IMPORT_CHECKPOINT_DIR", str(tmp_path))
+    upload = f"title,author\nKindred {marker},Octavia Butler\n".encode()
+    with TestClient(app) as client:
+        assert client.post("/admin/books/import", files={"file": ("catalog.csv", upload)}).status_code == 403
+        response = client.post(
+            "/admin/books/import", files={"file": ("catalog.csv", upload)}, headers={"X-Admin-Token": "test-admin-token"}
+        )
+    assert response.status_code == 200
+    assert response.json()["rows_inserted"] == 1
+    # A finished import leaves no checkpoint behind
+    assert os.listdir(tmp_path) == []
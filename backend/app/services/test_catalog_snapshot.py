@@ -0,0 +1,71 @@
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+
+from app.services.catalog_snapshot import CatalogSnapshot, SnapshotFormatError, SnapshotWatcher, write_snapshot
+from app.services.recommendation_engine import BookText, CatalogIndex
+
+NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _books():
+    return [
+        BookText(uuid4(), "Dragon Empire", "Ann Author", "Fantasy", "Wizards and dragons battle for a crown", NOW),
+        BookText(uuid4(), "Dragon Reborn", "Bob Writer", "Fantasy", "A farm boy learns dragon magic", NOW),
+        BookText(uuid4(), "Orbital Mechanics", "Cé Noël", "Science Fiction", "Astronauts stranded on a station", NOW),
+        BookText(uuid4(), "Untitled", "Dee Penn", None, None, NOW),
+    ]
+
+
+def _write(path, books):
+    index = CatalogIndex()
+    index.add_or_update(books)
+    write_snapshot(str(path), books, index)
+    return index
+
+
+def test_snapshot_round_trip(tmp_path):
+    books = _books()
+    in_memory = _write(tmp_path / "catalog.snapshot", books)
+
+    snapshot = CatalogSnapshot(str(tmp_path / "catalog.snapshot"))
+
+    assert len(snapshot) == 4
+    assert list(snapshot.book_ids) == [book.id for book in books]
+    assert snapshot.row_of[books[2].id] == 2
+    assert uuid4() not in snapshot.row_of
+    assert snapshot.title(2) == "Orbital Mechanics"
+    assert snapshot.author(2) == "Cé Noël"
+    assert snapshot.genre(0) == "Fantasy" and snapshot.genre(3) is None
+    assert snapshot.watermark == NOW
+    assert snapshot.ids.flags.writeable is False
+
+    mapped = snapshot.index()
+    library = [books[0].id]
+    assert mapped.recommend("dragons", library, k=3) == in_memory.recommend("dragons", library, k=3)
+    with pytest.raises(RuntimeError):
+        mapped.add_or_update(books[:1])
+
+
+def test_watcher_swaps_to_new_snapshot(tmp_path):
+    path = tmp_path / "catalog.snapshot"
+    watcher = SnapshotWatcher(str(path), check_seconds=0)
+    assert watcher.get() is None
+
+    _write(path, _books()[:2])
+    first = watcher.get()
+    assert len(first) == 2
+    assert watcher.get() is first
+
+    _write(path, _books())
+    assert len(watcher.get()) == 4
+    # The old mapping stays usable for requests still holding it
+    assert first.recommend("dragons", [], k=2)
+
+
+def test_rejects_foreign_files(tmp_path):
+    path = tmp_path / "not-a-snapshot"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(SnapshotFormatError):
+        CatalogSnapshot(str(path))
@@ -0,0 +1,69 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app import models
+from app.main import app
+from app.models import SessionLocal
+from app.services.genres import GenreResolver, display_name, genre_key
+
+
+def test_genre_key_ignores_case_spacing_and_punctuation():
+    assert genre_key("Sci-Fi") == genre_key("sci fi") == genre_key(" SCIFI ") == "scifi"
+    assert genre_key("  ") == genre_key(None) == ""
+
+
+def test_display_name_prefers_canonical_names():
+    assert display_name("sci-fi") == "Science Fiction"
+    assert display_name("YA") == "Young Adult"
+    assert display_name("cozy   MYSTERY") == "cozy MYSTERY"
+    assert display_name("SPACE OPERA") == "Space Opera"
+
+
+def test_resolver_maps_spellings_onto_one_genre():
+    suffix = uuid.uuid4().hex[:8]
+    resolver = GenreResolver()
+    with SessionLocal() as db:
+        genres = resolver.resolve(db, ["Sci-Fi", "science fiction", f"solarpunk {suffix}", f"Solarpunk-{suffix}", "", None])
+        db.commit()
+        assert genres["Sci-Fi"] == genres["science fiction"]
+        assert genres["Sci-Fi"].name == "Science Fiction"
+        assert genres[f"solarpunk {suffix}"] == genres[f"Solarpunk-{suffix}"]
+        assert "" not in genres and None not in genres
+        # A fresh resolver (another process) reads back the same ids
+        assert GenreResolver().resolve(db, [f"SOLARPUNK {suffix}"])[f"SOLARPUNK {suffix}"] == genres[f"Solarpunk-{suffix}"]
+
+
+def test_genre_filter_accepts_aliases():
+    marker = uuid.uuid4().hex
+    title = f"Genre filter {marker}"
+    with SessionLocal() as db:
+        science_fiction = GenreResolver().resolve(db, ["Science Fiction"])["Science Fiction"]
+        db.add(models.Book(title=title, author="Author", genre=science_fiction.name, genre_id=science_fiction.id))
+        db.commit()
+    try:
+        with TestClient(app) as client:
+            for spelling in ("sci-fi", "Science Fiction", "SF"):
+                titles = [book["title"] for book in client.get("/books", params={"genre": spelling, "search": marker}).json()["items"]]
+                assert title in titles
+            assert title not in [book["title"] for book in client.get("/books", params={"genre": "Fantasy", "search": marker}).json()["items"]]
+            assert {"id": science_fiction.id, "name": "Science Fiction"} in client.get("/books/genres").json()
+    finally:
+        with SessionLocal() as db:
+            db.query(models.Book).filter(models.Book.title == title).delete()
+            db.commit()
+
+
+def test_rolled_back_caller_leaves_no_dangling_cached_genre():
+    name = f"Cli-Fi {uuid.uuid4().hex[:8]}"
+    resolver = GenreResolver()
+    with SessionLocal() as db:
+        created = resolver.resolve(db, [name])[name]
+        db.rollback()
+    with SessionLocal() as db:
+        # The genre was committed on its own, so the cached id is usable
+        assert db.get(models.Genre, created.id).name == created.name
+        db.add(models.Book(title=f"Book of {name}", author="Author", genre=created.name, genre_id=created.id))
+        db.commit()
+        db.query(models.Book).filter(models.Book.genre_id == created.id).delete()
+        db.commit()
@@ -0,0 +1,92 @@
+import asyncio
+import sqlite3
+
+from sqlalchemy.pool import QueuePool
+
+from app import models
+from app.services import health_service
+
+
+class FakeConnection:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def close(self):
+        self.engine.closed += 1
+
+    async def execute(self, statement):
+        self.engine.queries += 1
+
+
+class FakeAsyncConnection(FakeConnection):
+    def __await__(self):
+        return self._start().__await__()
+
+    async def _start(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.engine.closed += 1
+
+    async def close(self):
+        self.engine.closed += 1
+
+
+class FakeEngine:
+    """Hands out connections until the `fail_at`-th one, which fails to connect."""
+
+    connection_class = FakeConnection
+
+    def __init__(self, fail_at: int | None = None):
+        self.pool = QueuePool(lambda: sqlite3.connect(":memory:"))
+        self.fail_at = fail_at
+        self.opened = self.closed = self.queries = 0
+
+    def connect(self):
+        if self.fail_at is not None and self.opened + 1 >= self.fail_at:
+            raise OSError("connection refused")
+        self.opened += 1
+        return self.connection_class(self)
+
+
+class FakeAsyncEngine(FakeEngine):
+    connection_class = FakeAsyncConnection
+
+
+def test_a_failed_warm_up_closes_what_it_opened(monkeypatch):
+    engine, async_engine = FakeEngine(fail_at=3), FakeAsyncEngine()
+    monkeypatch.setattr(models, "engine", engine)
+    monkeypatch.setattr(models, "async_engine", async_engine)
+    asyncio.run(health_service.warm_pools(connections=4))
+    assert (engine.opened, engine.closed) == (2, 2)
+    # The async pool is not warmed once the database turned out to be unreachable
+    assert async_engine.opened == 0
+
+    engine, async_engine = FakeEngine(), FakeAsyncEngine(fail_at=4)
+    monkeypatch.setattr(models, "engine", engine)
+    monkeypatch.setattr(models, "async_engine", async_engine)
+    asyncio.run(health_service.warm_pools(connections=4))
+    assert (engine.opened, engine.closed) == (4, 4)
+    assert (async_engine.opened, async_engine.closed) == (3, 3)
+
+
+def test_database_check_is_shared_and_cached(monkeypatch):
+    engine = FakeAsyncEngine()
+    monkeypatch.setattr(models, "async_engine", engine)
+    monkeypatch.setattr(health_service, "_last_check", (0.0, False, None))
+    monkeypatch.setattr(health_service, "_check_lock", asyncio.Lock())
+
+    async def burst():
+        return await asyncio.gather(*(health_service.check_database() for _ in range(10)))
+
+    assert asyncio.run(burst()) == [(True, None)] * 10
+    assert asyncio.run(health_service.check_database()) == (True, None)
+    assert engine.queries == 1
+
+    # Once the result expires the database is asked again, and a failure is reported by type
+    monkeypatch.setattr(health_service, "HEALTH_CHECK_CACHE_SECONDS", 0)
+    engine.fail_at = 0
+    assert asyncio.run(health_service.check_database()) == (False, "OSError")
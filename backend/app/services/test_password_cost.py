@@ -0,0 +1,27 @@
+from passlib.context import CryptContext
+
+from app.services import password_cost
+
+
+def test_calibration_extrapolates_from_the_probe(monkeypatch):
+    # 10 ms at the minimum cost: each extra round doubles it, so 250 ms allows 4 more
+    monkeypatch.setattr(password_cost, "measure_hash_seconds", lambda rounds: 0.010)
+    assert password_cost.calibrate_rounds(0.25, min_rounds=10, max_rounds=16) == 14
+
+
+def test_calibration_is_clamped(monkeypatch):
+    monkeypatch.setattr(password_cost, "measure_hash_seconds", lambda rounds: 0.5)
+    assert password_cost.calibrate_rounds(0.25, min_rounds=10, max_rounds=16) == 10
+    monkeypatch.setattr(password_cost, "measure_hash_seconds", lambda rounds: 0.0001)
+    assert password_cost.calibrate_rounds(0.25, min_rounds=10, max_rounds=16) == 16
+
+
+def test_context_wants_any_other_cost_rehashed():
+    context = password_cost.build_context(5)
+    cheaper = CryptContext(schemes=["bcrypt"]).hash("Password123", rounds=4)
+    dearer = CryptContext(schemes=["bcrypt"]).hash("Password123", rounds=6)
+    current = context.hash("Password123")
+    assert password_cost.hash_rounds(current) == 5
+    assert context.needs_update(cheaper) and context.needs_update(dearer)
+    assert not context.needs_update(current)
+    assert password_cost.hash_rounds("not-a-hash") is None
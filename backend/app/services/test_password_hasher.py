@@ -0,0 +1,41 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.password_hasher import HashingQueueFull, PasswordHasher
+
+
+def test_run_returns_result_and_records_stats():
+    hasher = PasswordHasher(max_workers=2, max_pending=4)
+    result = asyncio.run(hasher.run(lambda a, b: a + b, 2, 3))
+    assert result == 5
+    stats = hasher.stats()
+    assert stats["completed"] == 1
+    assert stats["pending"] == 0
+    assert stats["hash_seconds_total"] >= 0
+    hasher.shutdown()
+
+
+def test_rejects_when_queue_is_full():
+    hasher = PasswordHasher(max_workers=1, max_pending=2, retry_after=3)
+    release = threading.Event()
+
+    async def scenario():
+        # Fill the queue with calls that block until released
+        blocked = [asyncio.create_task(hasher.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert hasher.stats()["pending"] == 2
+        # The next call is rejected immediately instead of queueing
+        with pytest.raises(HashingQueueFull) as exc_info:
+            await hasher.run(lambda: None)
+        assert exc_info.value.retry_after == 3
+        release.set()
+        await asyncio.gather(*blocked)
+
+    asyncio.run(scenario())
+    stats = hasher.stats()
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+    assert stats["pending"] == 0
+    hasher.shutdown()
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from scipy import sparse
+
+from app.services.recommendation_engine import BookText, CatalogIndex
+
+NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _book(title, genre, description, minutes=0):
+    return BookText(uuid4(), title, "Author", genre, description, NOW + timedelta(minutes=minutes))
+
+
+def _catalog():
+    return [
+        _book("Dragon Empire", "Fantasy", "Wizards and dragons battle for an ancient crown"),
+        _book("The Dragon Reborn", "Fantasy", "A farm boy learns he can channel magic"),
+        _book("Orbital Mechanics", "Science Fiction", "Astronauts stranded on a distant space station"),
+        _book("Murder at the Harbor", "Mystery", "A detective investigates a dockside murder"),
+    ]
+
+
+def test_recommends_books_matching_preferences():
+    index = CatalogIndex()
+    books = _catalog()
+    index.add_or_update(books)
+
+    results = index.recommend("I love space stations and astronauts", [], k=2)
+
+    assert results[0][0] == books[2].id
+    assert 0 < results[0][1] <= 1.0001
+
+
+def test_excludes_library_and_already_recommended_books():
+    index = CatalogIndex()
+    fantasy, dragon, space, mystery = _catalog()
+    index.add_or_update([fantasy, dragon, space, mystery])
+
+    results = index.recommend(None, [fantasy.id], exclude_book_ids=[dragon.id], k=10)
+
+    returned = {book_id for book_id, _ in results}
+    assert fantasy.id not in returned and dragon.id not in returned
+
+
+def test_batch_top_k_matches_single_user_scoring():
+    index = CatalogIndex()
+    index.add_or_update(_catalog())
+
+    profiles = sparse.vstack([index.profile("dragons", []), index.profile("detective murder", [])], format="csr")
+    batch = index.top_k(profiles, [[], []], k=1)
+
+    assert batch[0] == index.recommend("dragons", [], k=1)
+    assert batch[1] == index.recommend("detective murder", [], k=1)
+
+
+def test_incremental_update_replaces_changed_books():
+    index = CatalogIndex()
+    books = _catalog()
+    index.add_or_update(books)
+
+    changed = books[3]._replace(description="Pirates sail the ocean for treasure", updated_at=NOW + timedelta(hours=1))
+    index.add_or_update([changed])
+
+    assert len(index) == 4
+    assert index.watermark == changed.updated_at
+    assert index.recommend("pirates treasure", [], k=1)[0][0] == changed.id
+
+
+def test_empty_profile_returns_nothing():
+    index = CatalogIndex()
+    index.add_or_update(_catalog())
+    assert index.recommend(None, [], k=5) == []
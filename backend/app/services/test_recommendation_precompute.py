@@ -0,0 +1,49 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from app.services import recommendation_precompute
+from app.services.recommendation_engine import BookText, CatalogIndex, UserSignals
+
+NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _index():
+    index = CatalogIndex()
+    index.add_or_update([
+        BookText(uuid4(), "Dragon Empire", None, "Fantasy", "Wizards and dragons battle for a crown", NOW),
+        BookText(uuid4(), "Dragon Reborn", None, "Fantasy", "A farm boy learns dragon magic", NOW),
+        BookText(uuid4(), "Orbital Mechanics", None, "Science Fiction", "Astronauts stranded on a station", NOW),
+    ])
+    return index
+
+
+def test_score_chunk_excludes_library_and_recommended(monkeypatch):
+    index = _index()
+    empire, reborn, orbital = index.book_ids
+    monkeypatch.setattr(recommendation_precompute, "_worker_index", index)
+    reader, astronaut = uuid4(), uuid4()
+
+    rows = recommendation_precompute.score_chunk(
+        [
+            (reader, UserSignals("dragons", [empire], [])),
+            (astronaut, UserSignals("astronauts", [], [orbital])),
+        ],
+        k=5,
+    )
+
+    assert {"user_id": reader, "recommended_book_id": reborn} in rows
+    assert all(row["recommended_book_id"] != empire for row in rows if row["user_id"] == reader)
+    assert all(row["recommended_book_id"] != orbital for row in rows if row["user_id"] == astronaut)
+
+
+def test_forked_workers_share_the_parent_index(monkeypatch):
+    monkeypatch.setattr(recommendation_precompute, "_worker_index", _index())
+    chunk = [(uuid4(), UserSignals("dragons", [], []))]
+
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+        forked = pool.submit(recommendation_precompute.score_chunk, chunk, 2).result()
+
+    assert forked == recommendation_precompute.score_chunk(chunk, 2)
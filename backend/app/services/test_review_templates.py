@@ -0,0 +1,110 @@
+import asyncio
+import sys
+from uuid import uuid4
+
+import pytest
+
+from app.routers.ai import _event_stream
+from app.services.review_templates import (
+    BookContext,
+    GenerationUnavailable,
+    ReviewTemplateService,
+    StubBackend,
+    _create_backend,
+    cache_key,
+)
+
+BOOK = BookContext(uuid4(), "Dune", "Frank Herbert", "Science Fiction", "Spice and sandworms")
+
+
+def test_stub_backend_is_deterministic():
+    async def run():
+        first = await ReviewTemplateService(StubBackend()).generate(BOOK, "Loved the desert")
+        second = await ReviewTemplateService(StubBackend()).generate(BOOK, "Loved the desert")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert "Dune" in first and "Loved the desert" in first
+
+
+def test_results_are_cached_per_book_and_normalized_notes():
+    backend = StubBackend()
+
+    async def run():
+        service = ReviewTemplateService(backend)
+        await service.generate(BOOK, "Loved  the DESERT")
+        return await service.generate(BOOK, " loved the desert ")
+
+    assert "desert" in asyncio.run(run()).lower()
+    assert backend.calls == 1
+    assert cache_key(BOOK.id, "A  b") == cache_key(BOOK.id, "a b")
+
+
+def test_identical_in_flight_requests_share_one_upstream_call():
+    backend = StubBackend(chunk_delay=0.001)
+
+    async def run():
+        service = ReviewTemplateService(backend)
+        return await asyncio.gather(*(service.generate(BOOK, None) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert backend.calls == 1
+    assert len(set(results)) == 1
+
+
+def test_stream_yields_chunks_before_completion():
+    async def run():
+        service = ReviewTemplateService(StubBackend())
+        return [chunk async for chunk in service.stream(BOOK, None)]
+
+    chunks = asyncio.run(run())
+    assert len(chunks) > 1
+
+
+def test_slow_backend_times_out():
+    async def run():
+        service = ReviewTemplateService(StubBackend(chunk_delay=0.05), timeout=0.01)
+        await service.generate(BOOK, None)
+
+    with pytest.raises(GenerationUnavailable):
+        asyncio.run(run())
+
+
+def test_saturated_backend_rejects_after_queue_timeout():
+    async def run():
+        service = ReviewTemplateService(StubBackend(chunk_delay=0.01), max_concurrency=1, queue_timeout=0.001)
+        other_book = BOOK._replace(id=uuid4())
+        return await asyncio.gather(service.generate(BOOK, None), service.generate(other_book, None), return_exceptions=True)
+
+    first, second = asyncio.run(run())
+    assert isinstance(first, str)
+    assert isinstance(second, GenerationUnavailable)
+
+
+class FailingBackend:
+    """Sends one chunk, then fails the way an upstream HTTP error would."""
+
+    async def stream(self, book, notes):
+        yield "# My review"
+        raise ConnectionError("upstream reset")
+
+
+def test_stream_ends_with_an_error_event_when_the_backend_fails():
+    async def run():
+        service = ReviewTemplateService(FailingBackend())
+        return [frame async for frame in _event_stream(service.stream(BOOK, None))]
+
+    frames = asyncio.run(run())
+    assert frames[0].startswith("event: token")
+    assert frames[-1].startswith("event: error") and "retry_after" in frames[-1]
+
+
+def test_backend_must_be_chosen_explicitly_and_be_installed(monkeypatch):
+    assert isinstance(_create_backend("stub"), StubBackend)
+    # A missing optional package fails when the backend is created (at startup), not per request
+    monkeypatch.setitem(sys.modules, "openai", None)
+    with pytest.raises(RuntimeError, match="openai package"):
+        _create_backend("openai")
+    with pytest.raises(RuntimeError, match="Unknown AI_REVIEW_BACKEND"):
+        _create_backend("gpt")
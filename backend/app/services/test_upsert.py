@@ -0,0 +1,48 @@
+import uuid
+
+import pytest
+
+from app import models, schemas
+from app.models import SessionLocal, engine
+from app.services import preferences_service
+from app.testing import count_queries
+
+
+@pytest.fixture
+def user_id():
+    # Create a throwaway user; its preferences cascade on delete
+    db = SessionLocal()
+    user = models.User(email=f"upsert-{uuid.uuid4().hex}@example.com", username="upsert", password_hash="x" * 60)
+    db.add(user)
+    db.commit()
+    created_id = user.id
+    db.close()
+    yield created_id
+    db = SessionLocal()
+    db.query(models.User).filter(models.User.id == created_id).delete()
+    db.commit()
+    db.close()
+
+
+def test_preferences_upsert_is_one_round_trip(user_id):
+    db = SessionLocal()
+    try:
+        # First call inserts
+        with count_queries(engine) as counter:
+            created = preferences_service.upsert_user_preferences(
+                db, user_id, schemas.PreferenceRequest(preferences_text="fantasy")
+            )
+        assert counter.count == 1
+        assert created.preferences_text == "fantasy"
+
+        # Second call updates the same row in place
+        with count_queries(engine) as counter:
+            updated = preferences_service.upsert_user_preferences(
+                db, user_id, schemas.PreferenceRequest(preferences_text="science fiction")
+            )
+        assert counter.count == 1
+        assert updated.id == created.id
+        assert updated.preferences_text == "science fiction"
+        assert updated.updated_at >= created.updated_at
+    finally:
+        db.close()
@@ -0,0 +1,160 @@
+import asyncio
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, literal, select
+
+from app import models, schemas, upsert
+from app.db_types import Timestamp
+from app.main import app
+from app.models import AsyncSessionLocal, SessionLocal, async_engine
+from app.services import auth_service, rating_service, review_service, user_stats
+from app.testing import assert_max_queries
+
+
+@pytest.fixture
+def reader():
+    # A user with three recommendations, and five books (two genres and one without) to add
+    db = SessionLocal()
+    user = models.User(email=f"stats-{uuid.uuid4().hex}@example.com", username="stats", password_hash="x" * 60)
+    genres = ["Fantasy", "Fantasy", "Mystery", None, "Fantasy"]
+    books = [models.Book(title=f"Stats {i}", author="Author", genre=genre) for i, genre in enumerate(genres)]
+    db.add(user)
+    db.add_all(books)
+    db.flush()
+    recommendations = [models.Recommendation(user_id=user.id, recommended_book_id=book.id) for book in books[:3]]
+    db.add_all(recommendations)
+    db.commit()
+    context = {
+        "user_id": user.id,
+        "headers": {"Authorization": f"Bearer {auth_service.create_access_token(user)}"},
+        "book_ids": [str(book.id) for book in books],
+        "recommendation_ids": [str(recommendation.id) for recommendation in recommendations],
+    }
+    db.close()
+    yield context
+    db = SessionLocal()
+    db.query(models.User).filter(models.User.id == context["user_id"]).delete()
+    db.query(models.Book).filter(models.Book.id.in_([book.id for book in books])).delete()
+    db.commit()
+    db.close()
+
+
+def test_writes_keep_stats_equal_to_a_rebuild(reader):
+    headers = reader["headers"]
+    with TestClient(app) as client:
+        empty = client.get("/users/me/stats", headers=headers).json()
+        assert empty == {
+            "library_entries": 0, "reviews": 0, "ratings": 0, "average_rating": None, "genres": {}, "updated_at": None
+        }
+
+        added = client.post(
+            "/users/me/library/batch", headers=headers, json={"items": [{"book_id": b} for b in reader["book_ids"][:4]]}
+        ).json()["results"]
+        # A duplicate adds nothing
+        client.post("/users/me/library/batch", headers=headers, json={"items": [{"book_id": reader["book_ids"][0]}]})
+        # Reviewing twice counts one review
+        for text in ("Good", "Even better on a re-read"):
+            client.put(f"/users/me/library/{added[0]['entry_id']}/review", headers=headers, json={"review_text": text})
+        first, second, third = reader["recommendation_ids"]
+        client.put(f"/users/me/recommendations/{first}/rating", headers=headers, json={"rating": 2.0})
+        client.post("/users/me/recommendations/ratings/batch", headers=headers, json={"items": [
+            {"recommendation_id": first, "rating": 4.0},
+            {"recommendation_id": second, "rating": 3.5},
+        ]})
+
+        with assert_max_queries(async_engine.sync_engine, 2):  # principal + primary-key lookup
+            stats = client.get("/users/me/stats", headers=headers).json()
+        assert stats["library_entries"] == 4
+        assert stats["reviews"] == 1
+        assert stats["ratings"] == 2 and stats["average_rating"] == 3.75
+        assert stats["genres"] == {"Fantasy": 2, "Mystery": 1}
+
+        with SessionLocal() as db:
+            assert user_stats.rebuild_user_stats(db, [reader["user_id"]]) == 1
+        rebuilt = client.get("/users/me/stats", headers=headers).json()
+    assert {key: value for key, value in rebuilt.items() if key != "updated_at"} == {
+        key: value for key, value in stats.items() if key != "updated_at"
+    }
+
+
+def test_concurrent_first_ratings_count_once(reader, monkeypatch):
+    user_id, recommendation_id = reader["user_id"], uuid.UUID(reader["recommendation_ids"][0])
+    read_previous = rating_service._lock_ratings
+    both_read = asyncio.Event()
+    readers = 0
+
+    async def lock_ratings_then_wait(db, *args):
+        # Give the other request every chance to read the old value too; if it is
+        # blocked on a lock instead, go ahead after a moment
+        nonlocal readers
+        previous = await read_previous(db, *args)
+        readers += 1
+        if readers == 2:
+            both_read.set()
+        try:
+            await asyncio.wait_for(both_read.wait(), timeout=0.5)
+        except asyncio.TimeoutError:
+            pass
+        return previous
+
+    monkeypatch.setattr(rating_service, "_lock_ratings", lock_ratings_then_wait)
+
+    async def rate(value: float):
+        async with AsyncSessionLocal() as db:
+            return await rating_service.upsert_rating(db, user_id, recommendation_id, schemas.RatingRequest(rating=value))
+
+    async def rate_concurrently():
+        await asyncio.gather(rate(2.0), rate(4.0))
+        async with AsyncSessionLocal() as db:
+            stats = await db.get(models.UserStats, user_id)
+            stored = (await db.execute(
+                select(models.RecommendationRating.rating).where(models.RecommendationRating.recommendation_id == recommendation_id)
+            )).scalar_one()
+        return stats, stored
+
+    stats, stored = asyncio.run(rate_concurrently())
+    assert stats.ratings == 1
+    assert stats.rating_sum == Decimal(str(stored))
+
+
+def test_a_rewrite_stamped_like_the_insert_is_not_a_new_review(reader, monkeypatch):
+    # Clock resolution (SQLite) or a shared transaction (Postgres) can give an
+    # update the very timestamp of the insert; pin the upsert's clock to it
+    instant = datetime(2024, 1, 1, 12, 0)
+    monkeypatch.setattr(upsert, "func", SimpleNamespace(now=lambda: literal(instant, Timestamp())))
+    user_id = reader["user_id"]
+    with SessionLocal() as db:
+        entry = models.UserLibraryEntry(user_id=user_id, book_id=uuid.UUID(reader["book_ids"][0]))
+        db.add(entry)
+        db.flush()
+        db.add(models.Review(user_library_entry_id=entry.id, review_text="First", created_at=instant, updated_at=instant))
+        db.commit()
+        entry_id = entry.id
+
+    async def rewrite():
+        async with AsyncSessionLocal() as db:
+            review = await review_service.upsert_review(db, user_id, entry_id, schemas.ReviewRequest(review_text="Second"))
+            assert review.review_text == "Second" and review.updated_at == review.created_at
+            return await db.get(models.UserStats, user_id)
+
+    stats = asyncio.run(rewrite())
+    assert stats is None or stats.reviews == 0
+
+
+def test_rebuild_covers_every_user(seeded_data):
+    spec, summary = seeded_data
+    with SessionLocal() as db:
+        db.query(models.UserStats).delete()
+        db.commit()
+        assert user_stats.rebuild_user_stats(db, chunk_size=7) >= spec.users
+        totals = db.query(
+            func.sum(models.UserStats.library_entries), func.sum(models.UserStats.ratings)
+        ).one()
+        entries = db.query(func.count(models.UserLibraryEntry.id)).scalar()
+        ratings = db.query(func.count(models.RecommendationRating.id)).scalar()
+    assert tuple(totals) == (entries, ratings)
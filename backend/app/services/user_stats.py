@@ -0,0 +1,166 @@
+# Per-user reading statistics, maintained incrementally by the writes that change them
+import logging
+from collections import Counter
+from decimal import Decimal
+from typing import Iterable, Mapping
+from uuid import UUID
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .. import models, schemas
+from ..upsert import build_increment, build_insert_ignore, dialect_name
+
+logger = logging.getLogger(__name__)
+
+_COUNTERS = ("library_entries", "reviews", "ratings", "rating_sum")
+
+
+async def record_changes(
+    db: AsyncSession,
+    user_id: UUID,
+    *,
+    library_entries: int = 0,
+    reviews: int = 0,
+    ratings: int = 0,
+    rating_sum: Decimal | float = 0,
+    genres: Mapping[str, int] | None = None,
+) -> None:
+    """
+    Adjusts the user's statistics by the given deltas, inside the caller's transaction.
+
+    Call it from the same transaction as the write it accounts for, before the
+    commit, so the statistics change atomically with the data. The counters
+    are added by one INSERT ... ON CONFLICT DO UPDATE, which also locks the row;
+    genre deltas are then merged into the histogram under that lock.
+
+    Args:
+        db: The async SQLAlchemy database session of the write.
+        user_id: Whose statistics changed.
+        library_entries, reviews, ratings: Rows added (negative: removed).
+        rating_sum: Change of the sum of the user's ratings.
+        genres: Library entries added per genre (negative: removed).
+    """
+    stats = models.UserStats
+    values = {
+        "user_id": user_id, "library_entries": library_entries, "reviews": reviews,
+        "ratings": ratings, "rating_sum": Decimal(str(rating_sum)), "genre_counts": {},
+    }
+    statement = build_increment(
+        dialect_name(db), stats, values, index_elements=["user_id"], increment_columns=_COUNTERS
+    ).returning(stats.genre_counts)
+    genre_counts = (await db.execute(statement)).scalar_one()
+    genre_deltas = {genre: count for genre, count in (genres or {}).items() if genre and count}
+    if genre_deltas:
+        merged = Counter(genre_counts)
+        merged.update(genre_deltas)
+        await db.execute(
+            update(stats).where(stats.user_id == user_id).values(genre_counts={g: n for g, n in merged.items() if n > 0})
+        )
+
+
+async def lock_user_stats(db: AsyncSession, user_id: UUID) -> None:
+    """
+    Locks the user's statistics row until the transaction ends, creating it if needed.
+
+    Writes that decide their deltas from what already exists (was this rating
+    new?) take it first: a row lock on the rating itself cannot cover one that
+    does not exist yet, so two first writes would both count as new. On SQLite
+    the INSERT takes the database write lock, which serializes them the same way.
+    """
+    stats = models.UserStats
+    await db.execute(build_insert_ignore(dialect_name(db), stats, [{"user_id": user_id}], index_elements=["user_id"]))
+    await db.execute(select(stats.user_id).where(stats.user_id == user_id).with_for_update())
+
+
+async def get_user_stats(db: AsyncSession, user_id: UUID) -> schemas.UserStatsResponse:
+    """
+    The user's statistics, read with one primary-key lookup.
+
+    A user without a row has not added, reviewed or rated anything yet.
+    """
+    stats = (await db.execute(select(models.UserStats).where(models.UserStats.user_id == user_id))).scalar_one_or_none()
+    if stats is None:
+        return schemas.UserStatsResponse(library_entries=0, reviews=0, ratings=0, average_rating=None, genres={})
+    return schemas.UserStatsResponse(
+        library_entries=stats.library_entries,
+        reviews=stats.reviews,
+        ratings=stats.ratings,
+        average_rating=round(float(stats.rating_sum) / stats.ratings, 2) if stats.ratings else None,
+        genres=dict(sorted(stats.genre_counts.items(), key=lambda item: (-item[1], item[0]))),
+        updated_at=stats.updated_at,
+    )
+
+
+def _user_id_chunks(db: Session, user_ids: Iterable[UUID] | None, chunk_size: int) -> Iterable[list[UUID]]:
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        for start in range(0, len(user_ids), chunk_size):
+            yield user_ids[start:start + chunk_size]
+        return
+    last_id = None
+    while True:
+        statement = select(models.User.id).order_by(models.User.id).limit(chunk_size)
+        if last_id is not None:
+            statement = statement.where(models.User.id > last_id)
+        chunk = db.execute(statement).scalars().all()
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]
+
+
+def rebuild_user_stats(db: Session, user_ids: Iterable[UUID] | None = None, chunk_size: int = 1_000) -> int:
+    """
+    Recomputes statistics from the source tables, for repair or after bulk loads.
+
+    Users are processed in chunks of `chunk_size`, each replaced in its own
+    transaction from three grouped queries, so a full rebuild never holds
+    locks for long. Writes to a chunk's users while it is being rebuilt can be
+    lost; run it while the users are idle, or run it again.
+
+    Args:
+        db: The SQLAlchemy session; it is committed per chunk.
+        user_ids: Only rebuild these users (default: everyone).
+        chunk_size: Users per transaction.
+
+    Returns:
+        The number of users rebuilt.
+    """
+    entry, review, rating, book = models.UserLibraryEntry, models.Review, models.RecommendationRating, models.Book
+    rebuilt = 0
+    for chunk in _user_id_chunks(db, user_ids, chunk_size):
+        rows = {
+            user_id: {
+                "user_id": user_id, "library_entries": 0, "reviews": 0,
+                "ratings": 0, "rating_sum": Decimal(0), "genre_counts": {},
+            }
+            for user_id in chunk
+        }
+        for user_id, entries, reviews in db.execute(
+            select(entry.user_id, func.count(entry.id), func.count(review.id))
+            .outerjoin(review, review.user_library_entry_id == entry.id)
+            .where(entry.user_id.in_(chunk))
+            .group_by(entry.user_id)
+        ):
+            rows[user_id].update(library_entries=entries, reviews=reviews)
+        for user_id, ratings, rating_sum in db.execute(
+            select(rating.user_id, func.count(rating.id), func.sum(rating.rating))
+            .where(rating.user_id.in_(chunk))
+            .group_by(rating.user_id)
+        ):
+            rows[user_id].update(ratings=ratings, rating_sum=Decimal(str(rating_sum)))
+        for user_id, genre, entries in db.execute(
+            select(entry.user_id, book.genre, func.count(entry.id))
+            .join(book, book.id == entry.book_id)
+            .where(entry.user_id.in_(chunk), book.genre.is_not(None))
+            .group_by(entry.user_id, book.genre)
+        ):
+            rows[user_id]["genre_counts"][genre] = entries
+        db.execute(delete(models.UserStats).where(models.UserStats.user_id.in_(chunk)))
+        db.execute(models.UserStats.__table__.insert(), list(rows.values()))
+        db.commit()
+        rebuilt += len(chunk)
+        logger.info("Rebuilt the statistics of %d users", rebuilt)
+    return rebuilt
@@ -0,0 +1,52 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.conditional import ConditionalRequest, etag_matches, weak_etag
+
+RESOURCE_ID = uuid.uuid4()
+UPDATED_AT = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def test_weak_etag_is_stable_and_changes_with_the_version():
+    etag = weak_etag("preferences", RESOURCE_ID, UPDATED_AT)
+    assert etag.startswith('W/"') and etag.endswith('"')
+    assert etag == weak_etag("preferences", RESOURCE_ID, UPDATED_AT)
+    assert etag != weak_etag("preferences", RESOURCE_ID, UPDATED_AT.replace(microsecond=1))
+    assert etag != weak_etag("review", RESOURCE_ID, UPDATED_AT)
+
+
+def test_etag_matches_lists_wildcards_and_weak_comparison():
+    etag = weak_etag("x", 1)
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    # Proxies may strip the weak prefix; the opaque tag still matches
+    assert etag_matches(etag[2:], etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches("*", None)
+
+
+def test_not_modified_only_when_the_client_holds_the_current_version():
+    etag = weak_etag("library", RESOURCE_ID, 3, UPDATED_AT)
+    response = ConditionalRequest(if_none_match=etag).not_modified(etag)
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.body == b""
+    assert ConditionalRequest(if_none_match=weak_etag("library", RESOURCE_ID, 4, UPDATED_AT)).not_modified(etag) is None
+    assert ConditionalRequest().not_modified(etag) is None
+
+
+def test_check_if_match_rejects_stale_and_missing_resources():
+    etag = weak_etag("preferences", RESOURCE_ID, UPDATED_AT)
+    ConditionalRequest(if_match=etag).check_if_match(etag)
+    ConditionalRequest().check_if_match(None)
+    with pytest.raises(HTTPException) as stale:
+        ConditionalRequest(if_match=weak_etag("preferences", RESOURCE_ID, "older")).check_if_match(etag)
+    assert stale.value.status_code == 412
+    assert stale.value.headers["ETag"] == etag
+    with pytest.raises(HTTPException) as missing:
+        ConditionalRequest(if_match="*").check_if_match(None)
+    assert missing.value.status_code == 412
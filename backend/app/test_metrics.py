@@ -0,0 +1,65 @@
+import re
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.main import app
+from app.metrics import TimedQueuePool
+
+# One line of the Prometheus text exposition format (version 0.0.4)
+_NAME = r"[a-zA-Z_:][a-zA-Z0-9_:]*"
+_LABELS = r'\{[a-zA-Z_][a-zA-Z0-9_]*="[^"\\\n]*"(?:,[a-zA-Z_][a-zA-Z0-9_]*="[^"\\\n]*")*\}'
+_SAMPLE_RE = re.compile(rf"^(?P<name>{_NAME})(?P<labels>{_LABELS})? (?P<value>[-+]?(?:\d+(?:\.\d*)?(?:e[-+]?\d+)?|Inf|NaN))$")
+_COMMENT_RE = re.compile(rf"^# (?:HELP {_NAME} .*|TYPE (?P<name>{_NAME}) (?P<type>counter|gauge|histogram|summary|untyped))$")
+
+
+def _parse(exposition: str) -> dict[str, float]:
+    """Validate a scrape and return its samples by name and labels, e.g. 'name{a="b"}'."""
+    assert exposition.endswith("\n")
+    types, samples = {}, {}
+    for line in exposition.splitlines():
+        comment = _COMMENT_RE.match(line)
+        if comment:
+            if comment["name"]:
+                assert comment["name"] not in types, f"duplicate TYPE for {comment['name']}"
+                types[comment["name"]] = comment["type"]
+            continue
+        sample = _SAMPLE_RE.match(line)
+        assert sample, f"not a valid sample line: {line!r}"
+        family = re.sub(r"_(bucket|sum|count)$", "", sample["name"]) if sample["name"] not in types else sample["name"]
+        assert family in types, f"sample before its TYPE: {line!r}"
+        key = sample["name"] + (sample["labels"] or "")
+        assert key not in samples, f"duplicate sample: {line!r}"
+        samples[key] = float(sample["value"])
+    return samples
+
+
+def test_metrics_are_valid_prometheus_text_with_per_route_query_counts(tmp_path):
+    # The app's engines only use the timed pools on Postgres; time a checkout on SQLite too
+    timed = create_engine(f"sqlite:///{tmp_path}/pool.db", poolclass=TimedQueuePool)
+    with timed.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    timed.dispose()
+    with TestClient(app) as client:
+        assert client.get("/books/genres").status_code == 200
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = _parse(response.text)
+
+    route = 'method="GET",route="/books/genres"'
+    assert samples[f'shelfsense_requests_total{{{route},status="200"}}'] >= 1
+    # The route ran at least one query, so none of its requests falls in the le="0" bucket
+    queries = samples[f"shelfsense_request_db_queries_count{{{route}}}"]
+    assert queries >= 1
+    assert samples[f'shelfsense_request_db_queries_bucket{{{route},le="0"}}'] == 0
+    assert samples[f'shelfsense_request_db_queries_bucket{{{route},le="+Inf"}}'] == queries
+    assert samples[f"shelfsense_request_db_queries_sum{{{route}}}"] >= queries
+
+    # Every pooled checkout is timed by the wait histogram
+    assert "# TYPE shelfsense_db_pool_checkout_wait_seconds histogram" in response.text.splitlines()
+    wait_count = samples["shelfsense_db_pool_checkout_wait_seconds_count"]
+    assert wait_count >= 1
+    assert samples['shelfsense_db_pool_checkout_wait_seconds_bucket{le="+Inf"}'] == wait_count
+    buckets = [value for key, value in samples.items() if key.startswith("shelfsense_db_pool_checkout_wait_seconds_bucket")]
+    assert buckets == sorted(buckets)
@@ -0,0 +1,39 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.pagination import SortKey, decode_cursor, encode_cursor, parse_datetime
+
+SORT_KEY = SortKey("created_at", (None, None), (parse_datetime, uuid.UUID), descending=True)
+
+
+def _cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trips():
+    values = [datetime(2024, 1, 1, 12, 30), uuid.uuid4()]
+    assert decode_cursor(SORT_KEY, encode_cursor(SORT_KEY, values)) == values
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    _cursor("created_at"),
+    _cursor(["created_at"]),
+    _cursor(["title", ["2024-01-01T00:00:00", str(uuid.uuid4())]]),
+    _cursor(["created_at", ["2024-01-01T00:00:00"]]),
+    _cursor(["created_at", "ab"]),
+    _cursor(["created_at", ["2024-01-01T00:00:00", 123]]),
+    _cursor(["created_at", ["2024-01-01T00:00:00", None]]),
+    _cursor(["created_at", [True, str(uuid.uuid4())]]),
+    _cursor(["created_at", [["2024-01-01"], {"id": 1}]]),
+    _cursor(["created_at", ["yesterday", "not-a-uuid"]]),
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(SORT_KEY, cursor)
+    assert error.value.status_code == 400
@@ -0,0 +1,35 @@
+from sqlalchemy import func, select
+
+from app import models
+from app.seed import SEED_PASSWORD, seed_email
+from app.services import auth_service
+
+
+def test_seed_counts_match_the_database(seeded_data):
+    spec, summary = seeded_data
+    assert summary.users == spec.users
+    assert summary.books == spec.books
+    assert summary.library_entries > 0 and summary.recommendations > 0
+    with models.SessionLocal() as db:
+        emails = db.execute(
+            select(func.count()).select_from(models.User).where(models.User.email.like(f"{spec.tag}-%"))
+        ).scalar_one()
+        assert emails == spec.users
+
+
+def test_seeded_libraries_are_skewed_towards_popular_books(seeded_data):
+    spec, summary = seeded_data
+    entry = models.UserLibraryEntry
+    with models.SessionLocal() as db:
+        per_book = db.execute(
+            select(func.count()).select_from(entry).group_by(entry.book_id).order_by(func.count().desc())
+        ).scalars().all()
+    # The most popular book is owned far more often than the average one
+    assert per_book[0] > 3 * summary.library_entries / len(per_book)
+
+
+def test_seeded_users_can_log_in(seeded_data):
+    spec, _ = seeded_data
+    with models.SessionLocal() as db:
+        user = auth_service.get_user_by_email(db, seed_email(spec.tag, 0))
+    assert auth_service.verify_password(SEED_PASSWORD, user.password_hash)
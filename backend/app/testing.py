@@ -0,0 +1,52 @@
+# Helpers shared by the test modules
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCounter:
+    """Collects the SQL statements sent to the database while active."""
+
+    def __init__(self):
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(engine: Engine) -> Iterator[QueryCounter]:
+    """
+    Count every statement executed on `engine` inside the `with` block.
+
+    Each execute is one client/server round trip, which makes this a
+    direct check on how chatty a service call is.
+    """
+    counter = QueryCounter()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@contextmanager
+def assert_max_queries(engine: Engine, budget: int) -> Iterator[QueryCounter]:
+    """
+    Fail the test if more than `budget` statements run on `engine` inside the block.
+
+    Use it around route calls to catch N+1 regressions: the failure message
+    lists every statement that was executed.
+    """
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > budget:
+        executed = "\n".join(f"  {index + 1}. {statement}" for index, statement in enumerate(counter.statements))
+        raise AssertionError(f"Expected at most {budget} queries, got {counter.count}:\n{executed}")
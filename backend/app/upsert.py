@@ -0,0 +1,123 @@
+# Single-statement "insert or update" helpers built on INSERT ... ON CONFLICT ... RETURNING
+from typing import Iterable, Optional, Type, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy import Select, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+SchemaT = TypeVar("SchemaT", bound=BaseModel)
+
+# Dialect-specific INSERT constructs that support ON CONFLICT
+_INSERT_BY_DIALECT = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def build_upsert(
+    dialect_name: str,
+    model,
+    *,
+    index_elements: Iterable[str],
+    update_columns: Iterable[str],
+    values: Optional[dict] = None,
+    from_select: Optional[tuple[list[str], Select]] = None,
+):
+    """
+    Build an INSERT ... ON CONFLICT (index_elements) DO UPDATE ... RETURNING statement.
+
+    Args:
+        dialect_name: Name of the database dialect (e.g. "postgresql").
+        model: The mapped ORM class to write to.
+        index_elements: Columns of the unique constraint that detects the conflict.
+        update_columns: Columns overwritten from the proposed row on conflict.
+        values: Column values for a single-row insert.
+        from_select: Alternatively, (column names, SELECT) to insert from. A SELECT
+            that returns no row makes the statement a no-op, which lets callers
+            fold an ownership check into the same round trip.
+
+    Returns:
+        The statement, returning every column of the table.
+    """
+    insert = _INSERT_BY_DIALECT[dialect_name](model)
+    if from_select is not None:
+        statement = insert.from_select(*from_select)
+    else:
+        statement = insert.values(**values)
+    set_ = {column: statement.excluded[column] for column in update_columns}
+    # The database trigger also maintains updated_at; setting it here keeps
+    # the returned row correct on databases without the trigger
+    set_["updated_at"] = func.now()
+    statement = statement.on_conflict_do_update(index_elements=list(index_elements), set_=set_)
+    return statement.returning(*model.__table__.columns)
+
+
+def dialect_name(db: Session | AsyncSession) -> str:
+    """Return the dialect name of the engine the session is bound to."""
+    return db.get_bind().dialect.name
+
+
+def execute_upsert(db: Session, statement, response_schema: Type[SchemaT]) -> Optional[SchemaT]:
+    """
+    Run an upsert statement, commit, and build the response schema from the returned row.
+
+    Returns:
+        The hydrated schema, or None if the statement wrote no row.
+    """
+    row = db.execute(statement).first()
+    db.commit()
+    return response_schema.model_validate(row, from_attributes=True) if row else None
+
+
+async def execute_upsert_async(db: AsyncSession, statement, response_schema: Type[SchemaT]) -> Optional[SchemaT]:
+    """Async variant of execute_upsert()."""
+    row = (await db.execute(statement)).first()
+    await db.commit()
+    return response_schema.model_validate(row, from_attributes=True) if row else None
+
+
+def build_insert_ignore(
+    dialect_name: str,
+    model,
+    rows: Optional[list[dict]] = None,
+    *,
+    index_elements: Iterable[str],
+    index_where=None,
+    from_select: Optional[tuple[list[str], Select]] = None,
+):
+    """
+    Build a multi-row INSERT ... ON CONFLICT (index_elements) DO NOTHING statement.
+
+    Rows that would violate the unique constraint are skipped, so the statement
+    can be re-run safely (e.g. by a batch job retrying a chunk). Pass
+    `index_where` to target a partial unique index. Instead of `rows`, pass
+    `from_select` (column names, SELECT) to insert only the rows a query finds;
+    with RETURNING, what is not returned was either filtered out or a conflict.
+    """
+    insert = _INSERT_BY_DIALECT[dialect_name](model)
+    insert = insert.from_select(*from_select) if from_select is not None else insert.values(rows)
+    return insert.on_conflict_do_nothing(index_elements=list(index_elements), index_where=index_where)
+
+
+def build_increment(
+    dialect_name: str,
+    model,
+    values: dict,
+    *,
+    index_elements: Iterable[str],
+    increment_columns: Iterable[str],
+):
+    """
+    Build an INSERT ... ON CONFLICT (index_elements) DO UPDATE SET col = col + excluded.col statement.
+
+    The first write of a key inserts `values`; later ones add them to the stored
+    counters. The update happens under the row lock the conflict takes, so
+    concurrent increments of the same row never lose each other.
+    """
+    insert = _INSERT_BY_DIALECT[dialect_name](model).values(**values)
+    table = model.__table__
+    set_ = {column: table.c[column] + insert.excluded[column] for column in increment_columns}
+    set_["updated_at"] = func.now()
+    return insert.on_conflict_do_update(index_elements=list(index_elements), set_=set_)
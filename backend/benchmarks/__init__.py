@@ -0,0 +1,2 @@
+# Benchmark scripts for the ShelfSense backend.
+# Run them from the backend directory, e.g. `python -m benchmarks.async_vs_sync_db`.
@@ -0,0 +1,106 @@
+"""
+Compare preference-read throughput of the sync (psycopg2 + threadpool) and
+async (asyncpg) database paths under high concurrency.
+
+The sync path mirrors how FastAPI runs blocking code: every call is pushed onto
+the shared AnyIO threadpool (40 threads by default). The async path awaits the
+query on the event loop through the AsyncSession.
+
+Usage (requires DATABASE_URL pointing at a database with the shelfsense schema):
+    python -m benchmarks.async_vs_sync_db --concurrency 100 --requests 5000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from starlette.concurrency import run_in_threadpool
+
+from app import models, schemas
+from app.services import preferences_service
+
+
+def _seed_user() -> uuid.UUID:
+    """Create a throwaway user with preferences and return its id."""
+    with models.SessionLocal() as db:
+        user = models.User(
+            email=f"bench-{uuid.uuid4().hex}@example.com",
+            username="bench",
+            password_hash="x" * 60,
+        )
+        db.add(user)
+        db.commit()
+        preferences_service.upsert_user_preferences(
+            db, user.id, schemas.PreferenceRequest(preferences_text="benchmark preferences")
+        )
+        return user.id
+
+
+def _delete_user(user_id: uuid.UUID) -> None:
+    with models.SessionLocal() as db:
+        db.query(models.User).filter(models.User.id == user_id).delete()
+        db.commit()
+
+
+def _sync_read(user_id: uuid.UUID) -> None:
+    with models.SessionLocal() as db:
+        preferences_service.get_user_preferences(db, user_id)
+
+
+async def _async_read(user_id: uuid.UUID) -> None:
+    async with models.AsyncSessionLocal() as db:
+        await preferences_service.get_user_preferences_async(db, user_id)
+
+
+async def _run(label: str, call, user_id: uuid.UUID, concurrency: int, total: int) -> dict:
+    """Issue `total` calls with at most `concurrency` in flight and collect latencies."""
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await call(user_id)
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "path": label,
+        "requests": total,
+        "concurrency": concurrency,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+async def main(concurrency: int, total: int) -> None:
+    user_id = _seed_user()
+    try:
+        # Warm both pools so connection setup is not part of the measurement
+        await _run("warmup-sync", lambda uid: run_in_threadpool(_sync_read, uid), user_id, concurrency, concurrency)
+        await _run("warmup-async", _async_read, user_id, concurrency, concurrency)
+
+        results = [
+            await _run("sync", lambda uid: run_in_threadpool(_sync_read, uid), user_id, concurrency, total),
+            await _run("async", _async_read, user_id, concurrency, total),
+        ]
+        for result in results:
+            print(result)
+    finally:
+        _delete_user(user_id)
+        await models.async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.requests))
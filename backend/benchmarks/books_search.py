@@ -0,0 +1,118 @@
+"""
+Latency benchmark for catalog search (GET /books) on a large synthetic catalog.
+
+Seeds `--books` synthetic rows directly in Postgres with generate_series (fast,
+no client round trips), runs a mix of full-text, fuzzy-author and genre queries
+through books_service.search_books, and reports p50/p95/p99 per query kind.
+The target is p95 < 50 ms at 1M books.
+
+Usage (requires DATABASE_URL and db/migrations applied, 001_books_search.sql and 008_genre_taxonomy.sql at least):
+    python -m benchmarks.books_search --books 1000000 --queries 200
+    python -m benchmarks.books_search --cleanup   # remove the synthetic rows
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from sqlalchemy import text
+
+from app import models
+from app.services import books_service
+
+# Synthetic rows are tagged through their ISBN so they can be removed again
+BENCH_ISBN_PREFIX = "BENCH"
+
+WORDS = [
+    "shadow", "river", "empire", "garden", "winter", "machine", "ocean", "silent", "crown", "forest",
+    "memory", "stars", "glass", "hunter", "city", "dragon", "secret", "light", "storm", "island",
+    "mirror", "kingdom", "fire", "journey", "night", "library", "clock", "wolf", "harbor", "desert",
+]
+SURNAMES = ["Tolkien", "Le Guin", "Asimov", "Atwood", "Pratchett", "Herbert", "Butler", "Gaiman", "Jemisin", "Banks"]
+GENRES = ["Fantasy", "Science Fiction", "Mystery", "Romance", "History", "Horror", "Biography", "Thriller"]
+
+SEED_SQL = text(f"""
+INSERT INTO shelfsense.books (title, author, isbn, genre, genre_id, description, page_count)
+SELECT
+    initcap(w1.word || ' ' || w2.word || ' ' || w3.word),
+    (ARRAY{SURNAMES!r})[1 + (n % {len(SURNAMES)})] || ' ' || n % 997,
+    '{BENCH_ISBN_PREFIX}' || lpad(n::text, 8, '0'),
+    g.name,
+    a.genre_id,
+    'A tale of ' || w2.word || ' and ' || w3.word || ' beyond the ' || w1.word || '.',
+    100 + n % 900
+FROM generate_series(:start, :stop) AS n
+CROSS JOIN LATERAL (SELECT (ARRAY{GENRES!r})[1 + (n % {len(GENRES)})] AS name) g
+LEFT JOIN shelfsense.genre_aliases a ON a.key = shelfsense.genre_key(g.name)
+CROSS JOIN LATERAL (SELECT (ARRAY{WORDS!r})[1 + (n % {len(WORDS)})] AS word) w1
+CROSS JOIN LATERAL (SELECT (ARRAY{WORDS!r})[1 + ((n / {len(WORDS)}) % {len(WORDS)})] AS word) w2
+CROSS JOIN LATERAL (SELECT (ARRAY{WORDS!r})[1 + ((n / {len(WORDS) ** 2}) % {len(WORDS)})] AS word) w3
+""")
+
+
+def seed(total: int, batch: int = 100_000) -> None:
+    with models.engine.begin() as connection:
+        existing = connection.execute(
+            text("SELECT count(*) FROM shelfsense.books WHERE isbn LIKE :prefix"), {"prefix": f"{BENCH_ISBN_PREFIX}%"}
+        ).scalar_one()
+    for start in range(existing, total, batch):
+        with models.engine.begin() as connection:
+            connection.execute(SEED_SQL, {"start": start, "stop": min(start + batch, total) - 1})
+        print(f"seeded {min(start + batch, total)} / {total}")
+    with models.engine.begin() as connection:
+        connection.execute(text("ANALYZE shelfsense.books"))
+
+
+def cleanup() -> None:
+    with models.engine.begin() as connection:
+        connection.execute(text("DELETE FROM shelfsense.books WHERE isbn LIKE :prefix"), {"prefix": f"{BENCH_ISBN_PREFIX}%"})
+
+
+def _query_mix(rng: random.Random) -> tuple[str, dict]:
+    kind = rng.choice(["fulltext", "fulltext_genre", "author_typo", "genre"])
+    if kind == "fulltext":
+        return kind, {"search": f"{rng.choice(WORDS)} {rng.choice(WORDS)}"}
+    if kind == "fulltext_genre":
+        return kind, {"search": rng.choice(WORDS), "genre": rng.choice(GENRES).lower()}
+    if kind == "author_typo":
+        name = rng.choice(SURNAMES)
+        # Swap two adjacent letters to simulate a typo
+        i = rng.randrange(len(name) - 1)
+        return kind, {"author": name[:i] + name[i + 1] + name[i] + name[i + 2:]}
+    return kind, {"genre": rng.choice(GENRES)}
+
+
+async def run(queries: int, seed_value: int) -> None:
+    rng = random.Random(seed_value)
+    latencies: dict[str, list[float]] = {}
+    async with models.AsyncSessionLocal() as db:
+        for _ in range(queries):
+            kind, params = _query_mix(rng)
+            started = time.perf_counter()
+            await books_service.search_books(db, **params, limit=20)
+            latencies.setdefault(kind, []).append((time.perf_counter() - started) * 1000)
+    await models.async_engine.dispose()
+
+    for kind, values in sorted(latencies.items()):
+        values.sort()
+        print(
+            f"{kind:15s} n={len(values):4d} p50={statistics.median(values):7.2f} ms "
+            f"p95={values[int(len(values) * 0.95) - 1]:7.2f} ms p99={values[int(len(values) * 0.99) - 1]:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--cleanup", action="store_true")
+    args = parser.parse_args()
+    if args.cleanup:
+        cleanup()
+    else:
+        if not args.skip_seed:
+            seed(args.books)
+        asyncio.run(run(args.queries, args.seed))
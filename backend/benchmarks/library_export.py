@@ -0,0 +1,79 @@
+"""
+Memory and time-to-first-byte of exporting one large library: streamed export vs one big page.
+
+Streamed: app.services.library_export, yield_per batches encoded as they arrive.
+One page: list_library_entries(limit=<all>) encoded in one piece, i.e. what
+clients had to do before the export endpoint existed.
+Peak memory is measured with tracemalloc (Python allocations only).
+
+Usage (the database defaults to a throwaway SQLite file):
+    python -m benchmarks.library_export --entries 100000
+    DATABASE_URL=postgresql+psycopg2://... python -m benchmarks.library_export --entries 100000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+
+async def _measure(generate) -> tuple[float, float, float, int]:
+    """(ms to first chunk, total ms, peak MiB, bytes) of consuming an async iterator of chunks."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    first_chunk_ms, size = None, 0
+    async for chunk in generate():
+        if first_chunk_ms is None:
+            first_chunk_ms = (time.perf_counter() - started) * 1000
+        size += len(chunk)
+    total_ms = (time.perf_counter() - started) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first_chunk_ms, total_ms, peak / 2**20, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/library_export.db")
+    # Imported only now: the engines are built from DATABASE_URL at import time
+    from sqlalchemy import insert
+
+    from app import models
+    from app.serialization import dumps
+    from app.services import library_export, library_service
+
+    models.create_schema()
+    user_id = uuid.uuid4()
+    with models.SessionLocal() as db:
+        db.execute(insert(models.User), [{"id": user_id, "email": f"{user_id}@example.com", "username": "export", "password_hash": "x"}])
+        book_ids = [uuid.uuid4() for _ in range(args.entries)]
+        db.execute(insert(models.Book), [
+            {"id": book_id, "title": f"Book {n}", "author": "Author", "description": "A description. " * 20}
+            for n, book_id in enumerate(book_ids)
+        ])
+        db.execute(insert(models.UserLibraryEntry), [{"user_id": user_id, "book_id": book_id} for book_id in book_ids])
+        db.commit()
+
+    async def one_page():
+        async with models.AsyncSessionLocal() as db:
+            yield dumps(await library_service.list_library_entries(db, user_id, limit=args.entries))
+
+    def streamed():
+        return library_export.stream_library_export(user_id, "ndjson", batch_size=args.batch_size)
+
+    for name, generate in (("one page", one_page), ("streamed", streamed)):
+        first_ms, total_ms, peak_mib, size = asyncio.run(_measure(generate))
+        print(
+            f"{name:<10} {args.entries} entries: first byte {first_ms:8.1f} ms, total {total_ms:8.1f} ms, "
+            f"peak {peak_mib:7.1f} MiB, {size / 2**20:.1f} MiB sent"
+        )
+
+
+if __name__ == "__main__":
+    main()
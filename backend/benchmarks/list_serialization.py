@@ -0,0 +1,116 @@
+"""
+Serialization cost of one 1000-item list page, old path vs fast path (no database needed).
+
+Old path: ORM-like objects -> Pydantic model_validate per item -> response_model
+validation -> jsonable_encoder -> json.dumps (what FastAPI did for the list endpoints).
+Fast path: row tuples -> plain dicts -> orjson (app.serialization).
+Both outputs are checked to decode to the same data before timing.
+
+Usage:
+    python -m benchmarks.list_serialization --items 1000 --repeat 200
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from fastapi.encoders import jsonable_encoder
+
+from app import schemas
+from app.serialization import dumps, page_payload, schema_fields
+
+BOOK_FIELDS = schema_fields(schemas.BookResponse)
+
+
+def _book_row(rng: random.Random) -> tuple:
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=rng.randint(0, 10**8))
+    values = {
+        "title": f"Book {rng.getrandbits(32)}",
+        "author": f"Author {rng.getrandbits(16)}",
+        "isbn": f"978{rng.randint(10**9, 10**10 - 1)}",
+        "genre": rng.choice(["Fantasy", "Mystery", "History", None]),
+        "description": "A long description of the book. " * 8,
+        "publication_date": date(1950, 1, 1) + timedelta(days=rng.randint(0, 25_000)),
+        "page_count": rng.randint(80, 900),
+        "id": uuid.UUID(int=rng.getrandbits(128)),
+        "created_at": now,
+        "updated_at": now,
+    }
+    return tuple(values[field] for field in BOOK_FIELDS)
+
+
+def _workloads(items: int, rng: random.Random):
+    """(name, old-path callable, fast-path callable) per list endpoint."""
+    now = datetime.now(timezone.utc)
+    library_rows = []
+    for _ in range(items):
+        book = _book_row(rng)
+        library_rows.append((uuid.UUID(int=rng.getrandbits(128)), book[BOOK_FIELDS.index("id")], now, *book))
+    recommendation_rows = [(uuid.UUID(int=rng.getrandbits(128)), now, *_book_row(rng)) for _ in range(items)]
+
+    def book_object(row) -> SimpleNamespace:
+        return SimpleNamespace(**dict(zip(BOOK_FIELDS, row)))
+
+    library_objects = [SimpleNamespace(id=r[0], book_id=r[1], created_at=r[2], book=book_object(r[3:])) for r in library_rows]
+    recommendation_objects = [
+        SimpleNamespace(id=r[0], created_at=r[1], recommended_book=book_object(r[2:])) for r in recommendation_rows
+    ]
+
+    def old(response_schema, item_schema, objects):
+        def run() -> bytes:
+            page = response_schema(
+                items=[item_schema.model_validate(item) for item in objects],
+                next_cursor="cursor", limit=items, total=None, total_is_estimate=False,
+            )
+            # FastAPI re-validates the returned model against response_model before encoding
+            validated = response_schema.model_validate(page.model_dump())
+            return json.dumps(jsonable_encoder(validated)).encode()
+        return run
+
+    def fast_library() -> bytes:
+        page = [{"id": r[0], "book_id": r[1], "created_at": r[2], "book": dict(zip(BOOK_FIELDS, r[3:]))} for r in library_rows]
+        return dumps(page_payload(page, "cursor", items, None, False))
+
+    def fast_recommendations() -> bytes:
+        page = [{"id": r[0], "created_at": r[1], "recommended_book": dict(zip(BOOK_FIELDS, r[2:]))} for r in recommendation_rows]
+        return dumps(page_payload(page, "cursor", items, None, False))
+
+    return [
+        ("library", old(schemas.LibraryEntryListResponse, schemas.LibraryEntryResponse, library_objects), fast_library),
+        (
+            "recommendations",
+            old(schemas.RecommendationListResponse, schemas.RecommendationResponse, recommendation_objects),
+            fast_recommendations,
+        ),
+    ]
+
+
+def _timings(run, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for name, old, fast in _workloads(args.items, random.Random(args.seed)):
+        if json.loads(old()) != json.loads(fast()):
+            raise SystemExit(f"{name}: fast path output differs from the Pydantic output")
+        old_ms, fast_ms = statistics.median(_timings(old, args.repeat)), statistics.median(_timings(fast, args.repeat))
+        print(f"{name:<16} {args.items} items: pydantic {old_ms:.2f} ms, orjson {fast_ms:.2f} ms ({old_ms / fast_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
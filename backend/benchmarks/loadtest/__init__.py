@@ -0,0 +1,12 @@
+"""
+End-to-end load tests: seeded data, scripted workload mixes and JSON reports.
+
+Virtual users drive the in-process ASGI app (`app.main.app`) through an async
+HTTP client, so a run needs no server and no outside services. By default the
+data lives in a SQLite file under benchmarks/results/; point DATABASE_URL at a
+throwaway Postgres to measure the production database path.
+
+Usage (from the backend directory):
+    python -m benchmarks.loadtest run --mix browse-heavy --scale small --concurrency 50 --duration 30
+    python -m benchmarks.loadtest compare benchmarks/results/old.json benchmarks/results/new.json
+"""
@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+MIX_NAMES = ("browse-heavy", "login-heavy", "write-heavy")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "results")
+
+
+def _run(args: argparse.Namespace) -> None:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    # Must be decided before the app (and its engines) is imported, so app modules are imported lazily
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(RESULTS_DIR, f'loadtest-{args.scale}.db')}")
+
+    from app.main import app
+
+    from .data import prepare_dataset
+    from .runner import app_client, build_report, query_totals, run_mix
+
+    data, seeded = prepare_dataset(args.scale, seed=args.seed)
+    if seeded is not None:
+        print(f"seeded {args.scale} dataset: {json.dumps(seeded.to_dict())}", file=sys.stderr)
+
+    async def run_all() -> list[dict]:
+        reports = []
+        async with app_client(app) as client:
+            for mix in args.mix:
+                before = query_totals()
+                recorder, elapsed = await run_mix(
+                    client, mix, data, args.concurrency, duration=args.duration, requests=args.requests, seed=args.seed
+                )
+                settings = {
+                    "mix": mix, "scale": args.scale, "concurrency": args.concurrency,
+                    "duration": args.duration, "requests": args.requests, "seed": args.seed,
+                }
+                reports.append(build_report(recorder, elapsed, before, query_totals(), settings))
+        return reports
+
+    reports = asyncio.run(run_all())
+    for report in reports:
+        totals, elapsed = report["totals"], report["meta"]["elapsed_seconds"]
+        print(
+            f"{report['meta']['mix']}: {totals['requests']} requests in {elapsed:.1f}s, "
+            f"{totals['throughput_rps']:.0f} req/s, p50 {totals['p50_ms']:.1f} ms, p95 {totals['p95_ms']:.1f} ms, "
+            f"p99 {totals['p99_ms']:.1f} ms, {totals['errors']} errors",
+            file=sys.stderr,
+        )
+        for route, stats in report["routes"].items():
+            queries = stats["queries_per_request"]
+            print(
+                f"  {route:<58} n={stats['requests']:<6} p95={stats['p95_ms']:7.1f} ms  "
+                f"queries/req={'-' if queries is None else f'{queries:.1f}'}",
+                file=sys.stderr,
+            )
+
+    output = args.output or os.path.join(
+        RESULTS_DIR,
+        f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{(reports[0]['meta']['commit'] or 'nogit')[:8]}.json",
+    )
+    with open(output, "w") as file:
+        json.dump({"runs": reports}, file, indent=2)
+    print(output)
+
+
+def _compare(args: argparse.Namespace) -> None:
+    from .runner import compare_reports
+
+    with open(args.baseline) as file:
+        baseline = {run["meta"]["mix"]: run for run in json.load(file)["runs"]}
+    with open(args.candidate) as file:
+        candidate = {run["meta"]["mix"]: run for run in json.load(file)["runs"]}
+    for mix in candidate:
+        if mix in baseline:
+            print("\n".join(compare_reports(baseline[mix], candidate[mix])))
+            print()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description=__package__ and __doc__)
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subcommands.add_parser("run", help="Run workload mixes and save a JSON report")
+    run_parser.add_argument("--mix", nargs="+", choices=MIX_NAMES, default=list(MIX_NAMES))
+    run_parser.add_argument("--scale", choices=["tiny", "small", "medium", "large"], default="small")
+    run_parser.add_argument("--concurrency", type=int, default=50, help="Virtual users")
+    run_parser.add_argument("--duration", type=float, default=30.0, help="Seconds per mix")
+    run_parser.add_argument("--requests", type=int, help="Stop after this many operations instead")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--output", help="Report path (default: benchmarks/results/<time>-<commit>.json)")
+    run_parser.set_defaults(handler=_run)
+
+    compare_parser = subcommands.add_parser("compare", help="Compare two reports route by route")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.set_defaults(handler=_compare)
+
+    args = parser.parse_args(argv)
+    if args.command == "run" and args.requests:
+        args.duration = None
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# Dataset for the load tests: seeded once per database, then sampled by the workloads
+from dataclasses import dataclass, replace
+
+from sqlalchemy import func, select
+
+from app import models
+from app.seed import GENRES, SeedSpec, SeedSummary, seed_database, seed_email
+
+TAG = "loadtest"
+
+# Dataset sizes; `large` takes a few minutes to seed on SQLite
+SCALES = {
+    "tiny": SeedSpec(users=50, books=1_000, library_per_user=10, recommendations_per_user=10, tag=TAG),
+    "small": SeedSpec(users=1_000, books=20_000, tag=TAG),
+    "medium": SeedSpec(users=10_000, books=200_000, tag=TAG),
+    "large": SeedSpec(users=100_000, books=1_000_000, library_per_user=40, tag=TAG),
+}
+
+
+@dataclass
+class WorkloadData:
+    """What the virtual users pick their requests from."""
+
+    emails: list[str]
+    search_terms: list[str]
+    author_fragments: list[str]
+    genres: list[str]
+
+
+def prepare_dataset(scale: str, seed: int = 42) -> tuple[WorkloadData, SeedSummary | None]:
+    """
+    Create the schema and seed the `scale` dataset unless the database already holds it.
+
+    Returns:
+        The workload inputs, and the seeding summary (None when the data was reused).
+
+    Raises:
+        SystemExit: If the database holds a load-test dataset of another scale.
+    """
+    spec = replace(SCALES[scale], seed=seed)
+    models.create_schema()
+    summary = None
+    with models.SessionLocal() as db:
+        existing = db.execute(
+            select(func.count()).select_from(models.User).where(models.User.email.like(f"{TAG}-%"))
+        ).scalar_one()
+        if existing == 0:
+            summary = seed_database(db, spec)
+        elif existing != spec.users:
+            raise SystemExit(
+                f"The database already holds a {existing}-user load-test dataset; "
+                f"use another DATABASE_URL for --scale {scale}"
+            )
+        books = models.Book
+        sample = db.execute(select(books.title, books.author).order_by(books.id).limit(2_000)).all()
+
+    return WorkloadData(
+        emails=[seed_email(TAG, number) for number in range(spec.users)],
+        # Single title words: common ones match many books, rare ones a handful
+        search_terms=sorted({word for title, _ in sample for word in title.split() if len(word) > 3}),
+        author_fragments=sorted({author.split()[0][:6] for _, author in sample}),
+        genres=GENRES,
+    ), summary
@@ -0,0 +1,179 @@
+# Drives a workload mix against the in-process app and turns the samples into a report
+import asyncio
+import platform
+import random
+import subprocess
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+import httpx
+
+from app import metrics, models
+
+from .data import WorkloadData
+from .workloads import MIXES, Recorder, VirtualUser
+
+
+async def run_mix(
+    client: httpx.AsyncClient,
+    mix: str,
+    data: WorkloadData,
+    concurrency: int,
+    duration: float | None = None,
+    requests: int | None = None,
+    seed: int = 42,
+) -> tuple[Recorder, float]:
+    """
+    Run `concurrency` virtual users through `mix` until `duration` seconds or `requests` operations.
+
+    Returns:
+        The recorded samples and the wall-clock seconds of the measured phase.
+    """
+    operations = list(MIXES[mix])
+    weights = list(MIXES[mix].values())
+    recorder = Recorder()
+    remaining = requests
+    users = [
+        VirtualUser(client, recorder, data, data.emails[number % len(data.emails)], random.Random(seed + number))
+        for number in range(concurrency)
+    ]
+    # Logging everyone in is set-up, not load; a few at a time, as bcrypt is throttled
+    logins = asyncio.Semaphore(2)
+
+    async def start(user: VirtualUser) -> None:
+        async with logins:
+            await user.start()
+
+    await asyncio.gather(*(start(user) for user in users))
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def drive(user: VirtualUser) -> None:
+        nonlocal remaining
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            if remaining is not None:
+                if remaining <= 0:
+                    return
+                remaining -= 1
+            operation = user.rng.choices(operations, weights=weights)[0]
+            await operation(user)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(drive(user) for user in users))
+    return recorder, time.perf_counter() - started
+
+
+@asynccontextmanager
+async def app_client(app) -> AsyncIterator[httpx.AsyncClient]:
+    """An HTTP client bound to the in-process app, with the app's lifespan (pool warm-up, job runner) around it."""
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+            yield client
+
+
+def query_totals() -> dict[str, tuple[int, float]]:
+    """Requests and queries issued so far per route, from the app's own metrics."""
+    return {f"{method} {route}": totals for (method, route), totals in metrics.REQUEST_QUERIES.totals().items()}
+
+
+def _percentile(sorted_values: list[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _latency_summary(samples: list[tuple[int, float]], elapsed: float) -> dict:
+    latencies = sorted(seconds * 1000 for _, seconds in samples)
+    statuses: dict[str, int] = {}
+    for status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": len(samples),
+        "errors": sum(count for status, count in statuses.items() if int(status) >= 400),
+        "statuses": statuses,
+        "throughput_rps": len(samples) / elapsed if elapsed else 0.0,
+        "mean_ms": sum(latencies) / len(latencies) if latencies else 0.0,
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+        "max_ms": latencies[-1] if latencies else 0.0,
+    }
+
+
+def _git_revision() -> dict:
+    def git(*args: str) -> str:
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def build_report(
+    recorder: Recorder,
+    elapsed: float,
+    queries_before: dict[str, tuple[int, float]],
+    queries_after: dict[str, tuple[int, float]],
+    settings: dict,
+) -> dict:
+    """
+    The JSON-serializable result of a run: settings, overall totals and per-route statistics.
+
+    Queries per request are the server-side counts of the run (metrics delta),
+    so they include the statements of every middleware and dependency.
+    """
+    routes = {}
+    for route, samples in sorted(recorder.samples.items()):
+        summary = _latency_summary(samples, elapsed)
+        count_after, queries_after_sum = queries_after.get(route, (0, 0.0))
+        count_before, queries_before_sum = queries_before.get(route, (0, 0.0))
+        served = count_after - count_before
+        summary["queries_per_request"] = (queries_after_sum - queries_before_sum) / served if served else None
+        summary["client_failures"] = recorder.failures.get(route, 0)
+        routes[route] = summary
+
+    all_samples = [sample for samples in recorder.samples.values() for sample in samples]
+    return {
+        "meta": {
+            **_git_revision(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "database": models.engine.dialect.name,
+            **settings,
+            "elapsed_seconds": elapsed,
+        },
+        "totals": {**_latency_summary(all_samples, elapsed), "client_failures": sum(recorder.failures.values())},
+        "routes": routes,
+    }
+
+
+def compare_reports(baseline: dict, candidate: dict) -> list[str]:
+    """Human-readable per-route differences between two reports (candidate vs baseline)."""
+
+    def change(old: float | None, new: float | None) -> str:
+        if not old or new is None:
+            return "n/a"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    lines = [
+        f"baseline  {baseline['meta'].get('commit') or '?'} ({baseline['meta']['mix']}, {baseline['meta']['database']})",
+        f"candidate {candidate['meta'].get('commit') or '?'} ({candidate['meta']['mix']}, {candidate['meta']['database']})",
+        f"{'route':<58} {'rps':>16} {'p50':>16} {'p95':>16} {'p99':>16} {'queries/req':>14}",
+    ]
+    rows = [("TOTAL", baseline["totals"], candidate["totals"])]
+    rows += [(route, baseline["routes"].get(route, {}), stats) for route, stats in candidate["routes"].items()]
+    for route, old, new in rows:
+        cells = [f"{new['throughput_rps']:.0f} ({change(old.get('throughput_rps'), new['throughput_rps'])})"]
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            cells.append(f"{new[key]:.1f} ({change(old.get(key), new[key])})")
+        queries = new.get("queries_per_request")
+        old_queries = old.get("queries_per_request")
+        cells.append("" if queries is None else f"{queries:.1f} (was {old_queries:.1f})" if old_queries is not None else f"{queries:.1f}")
+        lines.append(f"{route:<58} " + " ".join(f"{cell:>16}" for cell in cells[:4]) + f" {cells[4]:>14}")
+    return lines
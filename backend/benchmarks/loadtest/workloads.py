@@ -0,0 +1,171 @@
+# Virtual users and the scripted request mixes they follow
+import random
+import time
+import uuid
+from typing import Awaitable, Callable
+
+import httpx
+
+from app.seed import SEED_PASSWORD
+
+from .data import WorkloadData
+
+
+class Recorder:
+    """Collects (route, status, latency) for every request of a run."""
+
+    def __init__(self) -> None:
+        self.samples: dict[str, list[tuple[int, float]]] = {}
+        self.failures: dict[str, int] = {}
+
+    def record(self, route: str, status: int, seconds: float) -> None:
+        self.samples.setdefault(route, []).append((status, seconds))
+
+    def record_failure(self, route: str) -> None:
+        self.failures[route] = self.failures.get(route, 0) + 1
+
+
+class VirtualUser:
+    """
+    One simulated client: logs in as a seeded user and keeps what a frontend
+    would keep between requests (token, ETags, ids seen in its lists).
+
+    Requests are labelled "METHOD /path/template", the same route labels the
+    app's metrics use, so client latencies and server query counts line up.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, data: WorkloadData, email: str, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.data = data
+        self.email = email
+        self.rng = rng
+        self.token: str | None = None
+        self.etags: dict[str, str] = {}
+        self.entry_ids: list[str] = []
+        self.recommendation_ids: list[str] = []
+
+    @property
+    def auth(self) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    async def request(self, route: str, method: str, url: str, **kwargs) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except Exception:
+            self.recorder.record_failure(route)
+            return None
+        self.recorder.record(route, response.status_code, time.perf_counter() - started)
+        return response
+
+    async def start(self) -> None:
+        """Log in and load the ids the write operations need (not recorded)."""
+        response = await self.client.post("/auth/login", json={"email": self.email, "password": SEED_PASSWORD})
+        response.raise_for_status()
+        self.token = response.json()["token"]
+        library = await self.client.get("/users/me/library?limit=100", headers=self.auth)
+        self.entry_ids = [item["id"] for item in library.json()["items"]]
+        recommendations = await self.client.get("/users/me/recommendations?limit=100", headers=self.auth)
+        self.recommendation_ids = [item["id"] for item in recommendations.json()["items"]]
+
+    async def poll(self, route: str, url: str) -> None:
+        """GET like a polling frontend: send the last ETag and keep the new one."""
+        headers = {**self.auth}
+        if url in self.etags:
+            headers["If-None-Match"] = self.etags[url]
+        response = await self.request(route, "GET", url, headers=headers)
+        if response is not None and "etag" in response.headers:
+            self.etags[url] = response.headers["etag"]
+
+
+async def login(user: VirtualUser) -> None:
+    response = await user.request(
+        "POST /auth/login", "POST", "/auth/login", json={"email": user.email, "password": SEED_PASSWORD}
+    )
+    if response is not None and response.status_code == 200:
+        user.token = response.json()["token"]
+
+
+async def register(user: VirtualUser) -> None:
+    email = f"loadtest-new-{uuid.uuid4().hex}@example.com"
+    await user.request("POST /auth/register", "POST", "/auth/register", json={"email": email, "password": SEED_PASSWORD})
+
+
+async def browse_books(user: VirtualUser) -> None:
+    rng, data = user.rng, user.data
+    kind = rng.random()
+    if kind < 0.5:
+        params = {"search": rng.choice(data.search_terms)}
+    elif kind < 0.7:
+        params = {"author": rng.choice(data.author_fragments)}
+    elif kind < 0.9:
+        params = {"genre": rng.choice(data.genres), "sort": "title"}
+    else:
+        params = {"sort": "created_at"}
+    response = await user.request("GET /books", "GET", "/books", params=params)
+    # A third of the time the reader pages on
+    if response is not None and response.status_code == 200 and rng.random() < 0.33:
+        cursor = response.json()["next_cursor"]
+        if cursor:
+            await user.request("GET /books", "GET", "/books", params={**params, "cursor": cursor})
+
+
+async def view_library(user: VirtualUser) -> None:
+    await user.poll("GET /users/me/library", "/users/me/library")
+
+
+async def view_recommendations(user: VirtualUser) -> None:
+    await user.poll("GET /users/me/recommendations", "/users/me/recommendations")
+
+
+async def view_preferences(user: VirtualUser) -> None:
+    await user.poll("GET /users/me/preferences", "/users/me/preferences")
+
+
+async def update_preferences(user: VirtualUser) -> None:
+    text = " ".join(user.rng.sample(user.data.search_terms, min(8, len(user.data.search_terms))))
+    await user.request(
+        "PUT /users/me/preferences", "PUT", "/users/me/preferences",
+        headers=user.auth, json={"preferences_text": text},
+    )
+
+
+async def write_review(user: VirtualUser) -> None:
+    if not user.entry_ids:
+        return await view_library(user)
+    entry_id = user.rng.choice(user.entry_ids)
+    await user.request(
+        "PUT /users/me/library/{entry_id}/review", "PUT", f"/users/me/library/{entry_id}/review",
+        headers=user.auth, json={"review_text": f"Re-read it, still {user.rng.choice(['great', 'fine', 'slow'])}."},
+    )
+
+
+async def rate_recommendation(user: VirtualUser) -> None:
+    if not user.recommendation_ids:
+        return await view_recommendations(user)
+    recommendation_id = user.rng.choice(user.recommendation_ids)
+    await user.request(
+        "PUT /users/me/recommendations/{recommendation_id}/rating", "PUT",
+        f"/users/me/recommendations/{recommendation_id}/rating",
+        headers=user.auth, json={"rating": user.rng.randint(2, 10) / 2},
+    )
+
+
+async def refresh_recommendations(user: VirtualUser) -> None:
+    await user.request(
+        "POST /users/me/recommendations/refresh", "POST", "/users/me/recommendations/refresh", headers=user.auth
+    )
+
+
+Operation = Callable[[VirtualUser], Awaitable[None]]
+
+# Workload mix -> operation weights (relative frequencies); names match __main__.MIX_NAMES
+MIXES: dict[str, dict[Operation, int]] = {
+    "login-heavy": {login: 60, register: 5, view_preferences: 20, view_library: 15},
+    "browse-heavy": {browse_books: 40, view_library: 20, view_recommendations: 20, view_preferences: 15, login: 5},
+    "write-heavy": {
+        update_preferences: 25, write_review: 30, rate_recommendation: 30,
+        refresh_recommendations: 5, view_library: 10,
+    },
+}
@@ -0,0 +1,79 @@
+"""
+Per-user latency benchmark for the in-process recommendation engine.
+
+Builds a CatalogIndex over `--books` synthetic books (no database needed),
+then scores `--users` synthetic users, each with a preferences text and a
+small library, and reports index build time and p50/p95/p99 per user.
+The target is < 20 ms per user at 500k books on one core.
+
+Usage:
+    python -m benchmarks.recommendation_engine --books 500000 --users 200
+"""
+import argparse
+import itertools
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timezone
+
+from app.services.recommendation_engine import BookText, CatalogIndex
+
+GENRES = ["Fantasy", "Science Fiction", "Mystery", "Romance", "History", "Horror", "Biography", "Thriller"]
+
+
+def _vocabulary(size: int, rng: random.Random) -> list[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choices(letters, k=rng.randint(4, 9))) for _ in range(size)]
+
+
+def _books(count: int, vocabulary: list[str], rng: random.Random):
+    # Zipf-like word choice so a few terms are common and most are rare, as in real text
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(vocabulary))))
+    now = datetime.now(timezone.utc)
+    for _ in range(count):
+        yield BookText(
+            uuid.UUID(int=rng.getrandbits(128)),
+            " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=3)).title(),
+            " ".join(rng.choices(vocabulary, k=2)).title(),
+            rng.choice(GENRES),
+            " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=40)),
+            now,
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=500_000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--library-size", type=int, default=20)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = _vocabulary(30_000, rng)
+    index = CatalogIndex()
+
+    started = time.perf_counter()
+    index.add_or_update(_books(args.books, vocabulary, rng))
+    print(f"built index: {len(index)} books, {index.matrix.nnz} non-zeros in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    index.add_or_update(_books(1_000, vocabulary, rng))
+    print(f"incremental refresh of 1000 books: {time.perf_counter() - started:.2f}s")
+
+    timings = []
+    for _ in range(args.users):
+        preferences = " ".join(rng.choices(vocabulary[:5_000], k=15))
+        library = rng.sample(index.book_ids, args.library_size)
+        started = time.perf_counter()
+        index.recommend(preferences, library, k=args.k)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    quantiles = statistics.quantiles(timings, n=100)
+    print(f"per user (ms): p50={quantiles[49]:.1f} p95={quantiles[94]:.1f} p99={quantiles[98]:.1f}")
+
+
+if __name__ == "__main__":
+    main()
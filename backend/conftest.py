@@ -0,0 +1,35 @@
+# Shared pytest setup: every run gets its own throwaway database
+import os
+import tempfile
+
+import pytest
+
+# TEST_DATABASE_URL points the suite at a disposable Postgres; otherwise a fresh
+# SQLite file is used. DATABASE_URL (environment or .env) is deliberately
+# overridden before the app is imported, so tests never touch a real database.
+os.environ["DATABASE_URL"] = (
+    os.getenv("TEST_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp(prefix='shelfsense-tests-')}/shelfsense.db"
+)
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database_schema():
+    """Create all tables once per run."""
+    from app import models
+
+    models.create_schema()
+    yield
+    models.engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def seeded_data():
+    """A small but realistically skewed dataset (see app.seed), shared by the tests that read it."""
+    from app import models
+    from app.seed import SeedSpec, seed_database
+
+    spec = SeedSpec(users=20, books=500, library_per_user=10, recommendations_per_user=10, tag="fixture")
+    with models.SessionLocal() as db:
+        summary = seed_database(db, spec)
+    return spec, summary
@@ -0,0 +1,26 @@
+-- Catalog search support for GET /books
+--   * ranked full-text search over title/author/description (generated tsvector + GIN)
+--   * trigram fuzzy matching on author names (pg_trgm + GIN)
+--   * index-backed, case-insensitive genre filter
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Title matches weigh more than author matches, which weigh more than description matches
+ALTER TABLE shelfsense.books
+    ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(author, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_books_search_vector
+    ON shelfsense.books USING GIN (search_vector);
+
+CREATE INDEX IF NOT EXISTS idx_books_author_trgm
+    ON shelfsense.books USING GIN (author gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_books_genre_lower
+    ON shelfsense.books (lower(genre));
+
+ANALYZE shelfsense.books;
@@ -0,0 +1,20 @@
+-- Composite indexes backing keyset (cursor) pagination of the list endpoints.
+-- Each index matches the ORDER BY of its list query, so any page -
+-- however deep - is a single index seek followed by `limit` rows.
+
+-- GET /users/me/library (newest first)
+CREATE INDEX IF NOT EXISTS idx_user_library_entries_user_created
+    ON shelfsense.user_library_entries (user_id, created_at DESC, id DESC);
+
+-- GET /users/me/recommendations (newest first)
+CREATE INDEX IF NOT EXISTS idx_recommendations_user_created
+    ON shelfsense.recommendations (user_id, created_at DESC, id DESC);
+
+-- GET /books?sort=title and GET /books?sort=created_at
+CREATE INDEX IF NOT EXISTS idx_books_title_id
+    ON shelfsense.books (title, id);
+CREATE INDEX IF NOT EXISTS idx_books_created_id
+    ON shelfsense.books (created_at DESC, id DESC);
+
+-- Superseded by idx_books_title_id (same leading column)
+DROP INDEX IF EXISTS shelfsense.idx_books_title;
@@ -0,0 +1,22 @@
+-- Support for the bulk book import (app/services/book_import.py):
+-- a normalized title+author key and indexes to dedupe incoming rows against the catalog.
+
+-- Lower-cased, punctuation-free "title|author" key, e.g.
+--   ('The Lord of the Rings: Fellowship', 'J.R.R. Tolkien') -> 'the lord of the rings fellowship|j r r tolkien'
+CREATE OR REPLACE FUNCTION shelfsense.book_norm_key(title text, author text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT btrim(regexp_replace(lower(coalesce(title, '')), '[^a-z0-9]+', ' ', 'g'))
+        || '|' ||
+        btrim(regexp_replace(lower(coalesce(author, '')), '[^a-z0-9]+', ' ', 'g'))
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_books_norm_key
+    ON shelfsense.books (shelfsense.book_norm_key(title, author));
+
+CREATE INDEX IF NOT EXISTS idx_books_isbn
+    ON shelfsense.books (isbn)
+    WHERE isbn IS NOT NULL;
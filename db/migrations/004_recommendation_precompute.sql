@@ -0,0 +1,30 @@
+-- Support for the offline recommendation precompute job (app/services/recommendation_precompute.py).
+
+-- A book is recommended to a user at most once; the job relies on
+-- INSERT ... ON CONFLICT (user_id, recommended_book_id) DO NOTHING.
+DELETE FROM shelfsense.recommendations r
+USING shelfsense.recommendations older
+WHERE r.user_id = older.user_id
+  AND r.recommended_book_id = older.recommended_book_id
+  AND (older.created_at, older.id) < (r.created_at, r.id);
+
+ALTER TABLE shelfsense.recommendations
+    DROP CONSTRAINT IF EXISTS uq_recommendations_user_book;
+ALTER TABLE shelfsense.recommendations
+    ADD CONSTRAINT uq_recommendations_user_book UNIQUE (user_id, recommended_book_id);
+
+-- High-water marks of incremental batch jobs
+CREATE TABLE IF NOT EXISTS shelfsense.job_watermarks (
+    job_name varchar(100) PRIMARY KEY,
+    high_water timestamptz NOT NULL,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- "Which users changed since the last run?" scans these by updated_at
+CREATE INDEX IF NOT EXISTS idx_user_preferences_updated_at
+    ON shelfsense.user_preferences (updated_at);
+CREATE INDEX IF NOT EXISTS idx_user_library_entries_updated_at
+    ON shelfsense.user_library_entries (updated_at);
+CREATE INDEX IF NOT EXISTS idx_recommendation_ratings_updated_at
+    ON shelfsense.recommendation_ratings (updated_at);
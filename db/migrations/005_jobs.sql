@@ -0,0 +1,26 @@
+-- Persistent background jobs (app/services/job_queue.py), e.g. "refresh my recommendations".
+-- Queued work survives restarts; workers claim jobs with FOR UPDATE SKIP LOCKED.
+CREATE TABLE IF NOT EXISTS shelfsense.jobs (
+    id uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
+    kind varchar(50) NOT NULL,
+    user_id uuid NOT NULL REFERENCES shelfsense.users (id) ON DELETE CASCADE,
+    status varchar(20) NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+    attempts integer NOT NULL DEFAULT 0,
+    result jsonb,
+    error text,
+    started_at timestamptz,
+    finished_at timestamptz,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- One active job per user and kind: repeated "refresh" clicks coalesce into it
+CREATE UNIQUE INDEX IF NOT EXISTS uq_jobs_active_per_user
+    ON shelfsense.jobs (kind, user_id)
+    WHERE status IN ('queued', 'running');
+
+-- Claiming the oldest queued job
+CREATE INDEX IF NOT EXISTS idx_jobs_queued
+    ON shelfsense.jobs (created_at)
+    WHERE status = 'queued';
@@ -0,0 +1,21 @@
+-- A book is in a user's library at most once; batch adds (POST /users/me/library/batch)
+-- rely on INSERT ... ON CONFLICT (user_id, book_id) DO NOTHING.
+
+-- Of any duplicate entries keep one, preferring a reviewed one, then the oldest
+-- (the reviews of the others cascade away with them)
+WITH ranked AS (
+    SELECT e.id,
+           row_number() OVER (
+               PARTITION BY e.user_id, e.book_id
+               ORDER BY (r.id IS NULL), e.created_at, e.id
+           ) AS position
+    FROM shelfsense.user_library_entries e
+    LEFT JOIN shelfsense.reviews r ON r.user_library_entry_id = e.id
+)
+DELETE FROM shelfsense.user_library_entries
+WHERE id IN (SELECT id FROM ranked WHERE position > 1);
+
+ALTER TABLE shelfsense.user_library_entries
+    DROP CONSTRAINT IF EXISTS uq_user_library_entries_user_book;
+ALTER TABLE shelfsense.user_library_entries
+    ADD CONSTRAINT uq_user_library_entries_user_book UNIQUE (user_id, book_id);
@@ -0,0 +1,45 @@
+-- Per-user reading statistics for the profile (app/services/user_stats.py).
+-- Writes to library entries, reviews and ratings adjust the row in the same
+-- transaction, so profile reads are a primary-key lookup instead of aggregates.
+CREATE TABLE IF NOT EXISTS shelfsense.user_stats (
+    user_id uuid PRIMARY KEY REFERENCES shelfsense.users (id) ON DELETE CASCADE,
+    library_entries integer NOT NULL DEFAULT 0,
+    reviews integer NOT NULL DEFAULT 0,
+    ratings integer NOT NULL DEFAULT 0,
+    rating_sum numeric(12, 1) NOT NULL DEFAULT 0,
+    genre_counts jsonb NOT NULL DEFAULT '{}',
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- Backfill from the existing data (`python -m app.cli rebuild-user-stats` does the same later on)
+INSERT INTO shelfsense.user_stats (user_id, library_entries, reviews, ratings, rating_sum, genre_counts)
+SELECT u.id,
+       coalesce(l.entries, 0),
+       coalesce(l.reviews, 0),
+       coalesce(r.ratings, 0),
+       coalesce(r.rating_sum, 0),
+       coalesce(g.genre_counts, '{}')
+FROM shelfsense.users u
+LEFT JOIN (
+    SELECT e.user_id, count(*) AS entries, count(rv.id) AS reviews
+    FROM shelfsense.user_library_entries e
+    LEFT JOIN shelfsense.reviews rv ON rv.user_library_entry_id = e.id
+    GROUP BY e.user_id
+) l ON l.user_id = u.id
+LEFT JOIN (
+    SELECT user_id, count(*) AS ratings, sum(rating) AS rating_sum
+    FROM shelfsense.recommendation_ratings
+    GROUP BY user_id
+) r ON r.user_id = u.id
+LEFT JOIN (
+    SELECT user_id, jsonb_object_agg(genre, entries) AS genre_counts
+    FROM (
+        SELECT e.user_id, b.genre, count(*) AS entries
+        FROM shelfsense.user_library_entries e
+        JOIN shelfsense.books b ON b.id = e.book_id
+        WHERE b.genre IS NOT NULL
+        GROUP BY e.user_id, b.genre
+    ) per_genre
+    GROUP BY user_id
+) g ON g.user_id = u.id
+ON CONFLICT (user_id) DO NOTHING;
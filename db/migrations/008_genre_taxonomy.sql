@@ -0,0 +1,81 @@
+-- Canonical genre taxonomy (app/services/genres.py): books point at a small-integer
+-- genre id, so genre filters use a B-tree index instead of matching free text,
+-- and spellings like 'Sci-Fi' / 'science fiction' collapse into one genre.
+
+-- Spelling-insensitive genre key: lower-case letters and digits only ('Sci-Fi' -> 'scifi').
+-- Mirrors genre_key() in app/services/genres.py.
+CREATE OR REPLACE FUNCTION shelfsense.genre_key(name text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT left(regexp_replace(lower(coalesce(name, '')), '[^a-z0-9]+', '', 'g'), 100)
+$$;
+
+CREATE TABLE IF NOT EXISTS shelfsense.genres (
+    id integer GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    name varchar(100) NOT NULL UNIQUE,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS shelfsense.genre_aliases (
+    key varchar(100) PRIMARY KEY,
+    genre_id integer NOT NULL REFERENCES shelfsense.genres (id) ON DELETE CASCADE
+);
+
+-- The canonical genres and their aliases (keep in sync with CANONICAL_GENRES)
+INSERT INTO shelfsense.genres (name)
+VALUES ('Fantasy'), ('Science Fiction'), ('Mystery'), ('Thriller'), ('Romance'),
+       ('Historical Fiction'), ('Horror'), ('Biography'), ('History'), ('Poetry'),
+       ('Young Adult'), ('Nonfiction'), ('Classics'), ('Graphic Novel')
+ON CONFLICT (name) DO NOTHING;
+
+INSERT INTO shelfsense.genre_aliases (key, genre_id)
+SELECT shelfsense.genre_key(a.spelling), g.id
+FROM (
+    VALUES ('Sci-Fi', 'Science Fiction'), ('SF', 'Science Fiction'), ('SciFi', 'Science Fiction'),
+           ('Mysteries', 'Mystery'), ('Thrillers', 'Thriller'), ('Biographies', 'Biography'),
+           ('Poems', 'Poetry'), ('YA', 'Young Adult'), ('Classic', 'Classics'),
+           ('Graphic Novels', 'Graphic Novel')
+) AS a (spelling, name)
+JOIN shelfsense.genres g ON g.name = a.name
+ON CONFLICT (key) DO NOTHING;
+
+-- Every other genre already in the catalog becomes a genre of its own, named
+-- after its most common spelling
+WITH spellings AS (
+    SELECT shelfsense.genre_key(genre) AS key, btrim(regexp_replace(genre, '\s+', ' ', 'g')) AS spelling, count(*) AS books
+    FROM shelfsense.books
+    WHERE shelfsense.genre_key(genre) <> ''
+    GROUP BY 1, 2
+)
+INSERT INTO shelfsense.genres (name)
+SELECT DISTINCT ON (key) left(spelling, 100)
+FROM spellings
+WHERE key NOT IN (SELECT key FROM shelfsense.genre_aliases)
+ORDER BY key, books DESC, spelling
+ON CONFLICT (name) DO NOTHING;
+
+-- Every genre answers to its own name
+INSERT INTO shelfsense.genre_aliases (key, genre_id)
+SELECT shelfsense.genre_key(name), id FROM shelfsense.genres
+ON CONFLICT (key) DO NOTHING;
+
+ALTER TABLE shelfsense.books
+    ADD COLUMN IF NOT EXISTS genre_id integer REFERENCES shelfsense.genres (id);
+
+-- Point every book at its genre and rewrite the free text to the canonical name
+UPDATE shelfsense.books b
+SET genre_id = a.genre_id, genre = g.name
+FROM shelfsense.genre_aliases a
+JOIN shelfsense.genres g ON g.id = a.genre_id
+WHERE a.key = shelfsense.genre_key(b.genre)
+  AND (b.genre_id IS DISTINCT FROM a.genre_id OR b.genre IS DISTINCT FROM g.name);
+UPDATE shelfsense.books SET genre = NULL
+WHERE genre IS NOT NULL AND shelfsense.genre_key(genre) = '';
+
+-- Genre filters (GET /books?genre=...) with the default title ordering
+CREATE INDEX IF NOT EXISTS idx_books_genre_title
+    ON shelfsense.books (genre_id, title, id);
+DROP INDEX IF EXISTS shelfsense.idx_books_genre_lower;
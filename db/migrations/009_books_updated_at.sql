@@ -0,0 +1,6 @@
+-- Incremental refreshes of the in-process catalog indexes read only the books
+-- changed since their last pass (WHERE updated_at > :since): the duplicate
+-- index behind POST /books (app/services/book_duplicates.py) and the
+-- recommendation engine's catalog index (load_books(since=...)).
+CREATE INDEX IF NOT EXISTS idx_books_updated_at
+    ON shelfsense.books (updated_at);
@@ -0,0 +1,70 @@
+-- One title+author normalization for the bulk import and POST /books.
+-- book_norm_key() used to only lower-case and strip punctuation ('j r r tolkien'),
+-- while the duplicate check of POST /books (app/services/book_duplicates.py)
+-- also drops articles and sorts the author's names ('jrr tolkien'), so an
+-- import inserted a 'Hobbit, The' the API would reject. Both now use the keys below.
+
+-- Lower-cased, punctuation-free title without its article:
+-- 'The Hobbit', 'Hobbit, The' and 'the hobbit!' -> 'hobbit'.
+-- Mirrors title_key() in app/services/book_duplicates.py.
+CREATE OR REPLACE FUNCTION shelfsense.book_title_key(title text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT regexp_replace(
+        btrim(regexp_replace(
+            regexp_replace(lower(coalesce(title, '')), ',\s*(the|a|an)\s*$', ''),
+            '[^a-z0-9]+', ' ', 'g'
+        )),
+        '^(the|a|an)\s+', ''
+    )
+$$;
+
+-- Lower-cased author name, words sorted and initials run together:
+-- 'J.R.R. Tolkien', 'Tolkien, J. R. R.' and 'JRR TOLKIEN' -> 'jrr tolkien'.
+-- Mirrors author_key() in app/services/book_duplicates.py.
+CREATE OR REPLACE FUNCTION shelfsense.book_author_key(author text)
+RETURNS text
+LANGUAGE plpgsql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+DECLARE
+    word text;
+    words text[] := '{}';
+    initials text := '';
+BEGIN
+    FOREACH word IN ARRAY regexp_split_to_array(lower(coalesce(author, '')), '[^a-z0-9]+') LOOP
+        IF word = '' THEN
+            CONTINUE;
+        ELSIF length(word) = 1 THEN
+            initials := initials || word;
+            CONTINUE;
+        END IF;
+        IF initials <> '' THEN
+            words := words || initials;
+            initials := '';
+        END IF;
+        words := words || word;
+    END LOOP;
+    IF initials <> '' THEN
+        words := words || initials;
+    END IF;
+    RETURN array_to_string(ARRAY(SELECT w FROM unnest(words) AS w ORDER BY w COLLATE "C"), ' ');
+END
+$$;
+
+-- "title key|author key", e.g. ('Hobbit, The', 'Tolkien, J. R. R.') -> 'hobbit|jrr tolkien'
+CREATE OR REPLACE FUNCTION shelfsense.book_norm_key(title text, author text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT shelfsense.book_title_key(title) || '|' || shelfsense.book_author_key(author)
+$$;
+
+-- The expression index still holds keys computed by the old definition
+REINDEX INDEX shelfsense.idx_books_norm_key;